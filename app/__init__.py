@@ -9,8 +9,17 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def create_app():
+def create_app(run_scheduler=False):
+    """
+    Args:
+        run_scheduler: jalankan thread scheduler di proses ini jika SCHEDULER_ENABLED.
+            Hanya entry point web (run.py) yang memakai True; CLI (python -m app.*)
+            tidak ikut leader election supaya job tidak terputus saat CLI selesai.
+    """
     app = Flask(__name__)
+    # File upload di-stream langsung ke UPLOAD_FOLDER/tmp - lihat app/uploads.py
+    from .uploads import UploadRequest
+    app.request_class = UploadRequest
     # Fix: Gunakan SECRET_KEY dengan default value
     secret_key = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
     app.config['SECRET_KEY'] = secret_key
@@ -23,28 +32,53 @@ def create_app():
     app.config['UPLOAD_FOLDER'] = upload_folder
     app.config['MAX_CONTENT_LENGTH'] = 8 * 1024 * 1024  # 8 MB
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Cache disk untuk download file Google Drive
+    drive_cache_dir = os.path.join(os.path.dirname(__file__), '..', 'instance', 'drive_cache')
+    app.config['DRIVE_CACHE_DIR'] = os.getenv('DRIVE_CACHE_DIR', os.path.abspath(drive_cache_dir))
+    app.config['DRIVE_CACHE_MAX_BYTES'] = int(os.getenv('DRIVE_CACHE_MAX_MB', '1024')) * 1024 * 1024
+    # Cache thumbnail bukti transfer (lihat app/derivatives.py)
+    derivative_dir = os.path.join(os.path.dirname(__file__), '..', 'instance', 'derivatives')
+    app.config['DERIVATIVE_DIR'] = os.getenv('DERIVATIVE_DIR', os.path.abspath(derivative_dir))
+    app.config['DRIVE_API_BASE'] = os.getenv('DRIVE_API_BASE', 'https://www.googleapis.com/drive/v3/files')
+
+    # PRAGMA SQLite (WAL, synchronous, cache, mmap, busy_timeout) - lihat app/storage.py
+    from .storage import load_sqlite_config, configure_sqlite
+    load_sqlite_config(app)
 
     from .models import db
     db.init_app(app)
 
     with app.app_context():
+        configure_sqlite(app, db)
         # ensure upload folder exists
         try:
             os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
         except Exception:
             pass
-        db.create_all()
+        # create_all() + migrasi hanya jika sidik skema berubah - lihat app/migrations.py
+        from .migrations import DB_AUTO_MIGRATE, ensure_schema, check_schema
+        app.config.setdefault('DB_AUTO_MIGRATE', DB_AUTO_MIGRATE)
+        if app.config['DB_AUTO_MIGRATE']:
+            ensure_schema(db)
+        else:
+            check_schema(db)
+
+    # Session di server, cookie hanya berisi sid - lihat app/session_store.py
+    from .session_store import init_session_store
+    init_session_store(app)
 
     from .routes import main
     app.register_blueprint(main)
     
-    # Jalankan Google Drive sync worker (optional)
-    # Uncomment untuk mengaktifkan auto-sync
-    # try:
-    #     from .tasks import start_background_sync_worker
-    #     start_background_sync_worker()
-    #     logger.info("Google Drive sync worker started")
-    # except Exception as e:
-    #     logger.warning(f"Could not start sync worker: {str(e)}")
+    # Job periodik (Drive sync, reindex, GC upload, purge session, warm cache).
+    # Aman untuk banyak worker: hanya satu proses leader - lihat app/scheduler.py
+    from .scheduler import SCHEDULER_ENABLED
+    app.config.setdefault('SCHEDULER_ENABLED', SCHEDULER_ENABLED)
+    if run_scheduler and app.config['SCHEDULER_ENABLED']:
+        try:
+            from .scheduler import start_scheduler
+            start_scheduler(app)
+        except Exception as e:
+            logger.warning(f"Could not start scheduler: {str(e)}")
 
     return app
\ No newline at end of file
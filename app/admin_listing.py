@@ -0,0 +1,177 @@
+"""
+Admin Listing
+Daftar peserta untuk halaman admin dengan keyset pagination (tanpa OFFSET),
+sorting, dan hitungan per status dari satu query GROUP BY
+"""
+
+import json
+import base64
+import logging
+from datetime import datetime
+from sqlalchemy import func, tuple_
+from sqlalchemy.orm import joinedload
+from .models import db, Peserta
+
+logger = logging.getLogger(__name__)
+
+# Nilai filter di URL -> status_pembayaran
+STATUS_FILTERS = {
+    'belum': 'Belum',
+    'menunggu': 'Menunggu',
+    'lunas': 'Lunas',
+    'ditolak': 'Ditolak'
+}
+
+# Status yang tampil di halaman verifikasi pembayaran
+PAYMENT_STATUSES = ['Menunggu', 'Lunas', 'Ditolak']
+
+# Kolom yang boleh dipakai untuk sorting - hanya kolom yang punya index urutan:
+# 'tanggal' -> ix_peserta_tanggal_id / ix_peserta_status_tanggal (dengan filter status),
+# 'nama' -> ix_peserta_nama_id / ix_peserta_status_nama, 'id' -> primary key (rowid).
+# Kolom baru di sini wajib diberi index lewat migrasi (cek: python -m app.migrations)
+SORT_COLUMNS = {
+    'tanggal': Peserta.tanggal_daftar,
+    'nama': Peserta.nama,
+    'id': Peserta.id
+}
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+PAGE_SIZE_OPTIONS = (25, 50, 100, 200)
+
+
+def parse_page_size(value, default=DEFAULT_PAGE_SIZE):
+    """Ukuran halaman dari query string, dibatasi 1..MAX_PAGE_SIZE"""
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def encode_cursor(sort, row):
+    """Cursor = (nilai kolom sort, id) dari row batas halaman"""
+    value = getattr(row, SORT_COLUMNS[sort].key)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([value, row.id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(sort, cursor):
+    """Kebalikan encode_cursor, None jika cursor tidak valid"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        value, row_id = json.loads(raw)
+        if sort == 'tanggal' and value is not None:
+            value = datetime.fromisoformat(value)
+        return value, int(row_id)
+    except (ValueError, TypeError):
+        logger.warning(f"Invalid pagination cursor: {cursor[:50]}")
+        return None
+
+
+def apply_search(query, search):
+    if search:
+        query = query.filter(
+            (Peserta.nama.ilike(f'%{search}%')) |
+            (Peserta.whatsapp.ilike(f'%{search}%'))
+        )
+    return query
+
+
+def apply_status(query, statuses):
+    if statuses is None:
+        return query
+    if len(statuses) == 1:
+        return query.filter(Peserta.status_pembayaran == statuses[0])
+    return query.filter(Peserta.status_pembayaran.in_(statuses))
+
+
+def count_by_status(search='', statuses=None):
+    """
+    Jumlah peserta per status_pembayaran dalam satu query GROUP BY
+
+    Returns:
+        dict: {'Belum': n, 'Menunggu': n, ..., 'total': n}
+    """
+    query = db.session.query(Peserta.status_pembayaran, func.count(Peserta.id))
+    query = apply_status(apply_search(query, search), statuses)
+    counts = dict(query.group_by(Peserta.status_pembayaran).all())
+    result = {status: counts.get(status, 0) for status in STATUS_FILTERS.values()}
+    result['total'] = sum(counts.values())
+    return result
+
+
+def paginate_peserta(statuses=None, search='', sort='tanggal', order='desc',
+                     after=None, before=None, per_page=DEFAULT_PAGE_SIZE):
+    """
+    Satu halaman peserta dengan keyset pagination
+
+    Args:
+        statuses (list): status_pembayaran yang ditampilkan (None = semua)
+        search (str): cari di nama / whatsapp
+        sort (str): key SORT_COLUMNS
+        order (str): 'asc' atau 'desc'
+        after (str): cursor halaman berikutnya
+        before (str): cursor halaman sebelumnya
+        per_page (int): ukuran halaman
+
+    Returns:
+        dict: {'items', 'next_cursor', 'prev_cursor', 'sort', 'order', 'per_page'}
+    """
+    if sort not in SORT_COLUMNS:
+        sort = 'tanggal'
+    if order not in ('asc', 'desc'):
+        order = 'desc'
+    per_page = parse_page_size(per_page)
+
+    column = SORT_COLUMNS[sort]
+    key = tuple_(column, Peserta.id) if sort != 'id' else None
+    # Grup ikut dimuat dalam query yang sama (LEFT JOIN batch_id), bukan per row
+    query = apply_status(apply_search(Peserta.query.options(joinedload(Peserta.grup)), search), statuses)
+
+    after_key = decode_cursor(sort, after)
+    before_key = decode_cursor(sort, before) if after_key is None else None
+    descending = order == 'desc'
+    # Halaman sebelumnya = ambil ke arah sebaliknya lalu dibalik
+    backwards = before_key is not None
+    scan_desc = descending != backwards
+
+    boundary = after_key or before_key
+    if boundary is not None:
+        value, row_id = boundary
+        if key is None:
+            query = query.filter(Peserta.id < row_id if scan_desc else Peserta.id > row_id)
+        else:
+            query = query.filter(key < (value, row_id) if scan_desc else key > (value, row_id))
+
+    if scan_desc:
+        query = query.order_by(column.desc(), Peserta.id.desc())
+    else:
+        query = query.order_by(column.asc(), Peserta.id.asc())
+
+    # Ambil satu row lebih untuk tahu apakah masih ada halaman berikutnya
+    rows = query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if has_more or backwards:
+            next_cursor = encode_cursor(sort, rows[-1])
+        if boundary is not None and (has_more or not backwards):
+            prev_cursor = encode_cursor(sort, rows[0])
+
+    return {
+        'items': rows,
+        'next_cursor': next_cursor,
+        'prev_cursor': prev_cursor,
+        'sort': sort,
+        'order': order,
+        'per_page': per_page
+    }
@@ -0,0 +1,177 @@
+"""
+Auth
+Decorator login/admin untuk blueprint dan principal (peserta yang sedang login)
+yang di-resolve sekali per request ke flask.g, dengan cache identitas ber-TTL
+pendek supaya halaman peserta tidak query primary key di setiap request
+"""
+
+import os
+import time
+import logging
+import threading
+from functools import wraps
+from flask import g, session, request, redirect, jsonify
+from .models import db, Peserta
+
+logger = logging.getLogger(__name__)
+
+# Umur snapshot peserta di cache (detik): batas keterlambatan perubahan dari proses worker lain
+IDENTITY_CACHE_TTL = int(os.getenv('IDENTITY_CACHE_TTL', '30'))
+IDENTITY_CACHE_SIZE = int(os.getenv('IDENTITY_CACHE_SIZE', '10000'))
+
+# Kolom yang tidak ikut disimpan di snapshot
+EXCLUDED_FIELDS = {'password_hash'}
+
+
+class Principal:
+    """
+    Snapshot read-only data peserta (tanpa password_hash)
+
+    Atributnya sama dengan kolom Peserta, jadi bisa langsung dipakai template
+    (peserta.nama, peserta.batch, peserta.status_pembayaran, ...)
+    """
+
+    def __init__(self, values):
+        self.__dict__.update(values)
+
+    @classmethod
+    def from_peserta(cls, peserta):
+        return cls({
+            column.key: getattr(peserta, column.key)
+            for column in Peserta.__table__.columns
+            if column.key not in EXCLUDED_FIELDS
+        })
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Principal is read-only')
+
+    def __repr__(self):
+        return f"<Principal {self.id} {self.nama}>"
+
+
+class IdentityCache:
+    """
+    Cache user_id -> Principal di memori proses
+
+    - Entry kadaluarsa setelah ttl detik
+    - invalidate() dipanggil setelah data peserta diubah (admin atau peserta sendiri)
+    """
+
+    def __init__(self, ttl=IDENTITY_CACHE_TTL, maxsize=IDENTITY_CACHE_SIZE):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = {}  # user_id -> (expires_at, principal)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id):
+        """Principal untuk user_id, None jika peserta tidak ada"""
+        entry = self._entries.get(user_id)
+        if entry is not None and entry[0] > time.monotonic():
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        peserta = db.session.get(Peserta, user_id)
+        if peserta is None:
+            self._entries.pop(user_id, None)
+            return None
+
+        principal = Principal.from_peserta(peserta)
+        with self._lock:
+            if len(self._entries) >= self.maxsize:
+                self._prune()
+            self._entries[user_id] = (time.monotonic() + self.ttl, principal)
+        return principal
+
+    def _prune(self):
+        now = time.monotonic()
+        expired = [user_id for user_id, entry in self._entries.items() if entry[0] <= now]
+        for user_id in expired:
+            del self._entries[user_id]
+        if len(self._entries) >= self.maxsize:
+            self._entries.clear()
+
+    def invalidate(self, user_ids=None):
+        """Hapus snapshot peserta tertentu, None = hapus semua"""
+        if user_ids is None:
+            self._entries.clear()
+            return
+        for user_id in user_ids:
+            self._entries.pop(user_id, None)
+
+    def get_stats(self):
+        return {'cached': len(self._entries), 'hits': self.hits, 'misses': self.misses, 'ttl': self.ttl}
+
+
+IDENTITY_CACHE = IdentityCache()
+
+
+def invalidate_principals(user_ids=None):
+    """Panggil setelah commit yang mengubah data peserta"""
+    IDENTITY_CACHE.invalidate(None if user_ids is None else list(user_ids))
+
+
+# === Per request ===
+def load_principal():
+    """before_request: baca identitas dari session (tanpa query database)"""
+    g.user_id = session.get('user_id')
+    g.is_admin = bool(session.get('admin'))
+
+
+def current_peserta():
+    """
+    Principal peserta yang sedang login, di-resolve sekali per request
+
+    Returns:
+        Principal atau None (belum login / peserta sudah dihapus)
+    """
+    if 'peserta' not in g:
+        user_id = g.get('user_id')
+        g.peserta = IDENTITY_CACHE.get(user_id) if user_id is not None else None
+    return g.peserta
+
+
+def _unauthorized(api, login_url, payload):
+    if api:
+        return jsonify(payload), 401
+    return redirect(login_url)
+
+
+def login_required(view=None, api=False):
+    """
+    Route khusus peserta yang sudah login
+
+    @login_required             -> redirect ke /login
+    @login_required(api=True)   -> JSON 401
+    """
+    if view is None:
+        return lambda func: login_required(func, api=api)
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if g.get('user_id') is None:
+            return _unauthorized(api, '/login', {'error': 'Unauthorized'})
+        return view(*args, **kwargs)
+
+    return wrapper
+
+
+def admin_required(view=None, api=False):
+    """
+    Route khusus admin
+
+    @admin_required             -> redirect ke /admin
+    @admin_required(api=True)   -> JSON 401
+    """
+    if view is None:
+        return lambda func: admin_required(func, api=api)
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not g.get('is_admin'):
+            return _unauthorized(api, '/admin', {'success': False, 'error': 'Unauthorized'})
+        return view(*args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,382 @@
+"""
+Blob Store
+Bukti transfer disimpan content-addressed di UPLOAD_FOLDER/blobs/<ab>/<cd>/<sha256>.<ext>:
+upload ulang file yang sama tidak menambah file baru. Setiap blob punya
+ref_count (tabel upload_blob) dari Peserta.payment_proof; blob tanpa
+referensi dihapus garbage collector di worker background.
+
+Normalisasi gambar tidak mengubah blob di tempat (nama file = hash isi): hasilnya
+disimpan sebagai blob baru lalu referensi peserta dipindah ke sana (rekey_blob).
+"""
+
+import os
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.dialects.sqlite import insert
+from .models import db, Peserta, UploadBlob
+from .uploads import spool_upload, detect_type, UPLOAD_TMP_DIR, UPLOAD_PROCESSOR
+from .derivatives import file_digest
+from .auth import invalidate_principals
+
+logger = logging.getLogger(__name__)
+
+BLOB_DIR = 'blobs'
+
+BLOB_EXTENSIONS = {
+    'png': 'png',
+    'jpeg': 'jpg',
+    'pdf': 'pdf'
+}
+
+# Blob/file sementara tanpa referensi baru dihapus setelah umur ini (detik),
+# supaya upload yang sedang berjalan tidak ikut terhapus
+UPLOAD_GC_GRACE = int(os.getenv('UPLOAD_GC_GRACE', '3600'))
+UPLOAD_GC_INTERVAL = int(os.getenv('UPLOAD_GC_INTERVAL', '3600'))
+
+_last_gc = 0.0
+_gc_lock = threading.Lock()
+
+
+def blob_path(digest, file_type):
+    """'blobs/ab/cd/<sha256>.<ext>' (relatif ke UPLOAD_FOLDER)"""
+    return '/'.join([BLOB_DIR, digest[:2], digest[2:4], f"{digest}.{BLOB_EXTENSIONS[file_type]}"])
+
+
+def is_blob_path(path):
+    return bool(path) and path.startswith(f"{BLOB_DIR}/")
+
+
+def acquire_blob(digest, path, size, count=1):
+    """ref_count + count (buat row jika belum ada); ikut transaksi db.session pemanggil"""
+    now = datetime.utcnow()
+    stmt = insert(UploadBlob).values(
+        sha256=digest, path=path, ukuran=size, ref_count=count,
+        tanggal_dibuat=now, tanggal_diupdate=now
+    )
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=[UploadBlob.sha256],
+        set_={'ref_count': UploadBlob.ref_count + count, 'tanggal_diupdate': now}
+    ))
+
+
+def release_blobs(paths, count=1):
+    """ref_count - count untuk blob yang dirujuk paths (path lama di luar blob store diabaikan)"""
+    paths = [path for path in paths if is_blob_path(path)]
+    if not paths:
+        return 0
+    result = db.session.execute(
+        update(UploadBlob)
+        .where(UploadBlob.path.in_(paths))
+        .values(ref_count=UploadBlob.ref_count - count, tanggal_diupdate=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+def store_proof(file, filename, upload_folder):
+    """
+    Simpan bukti transfer ke blob store dan tambah ref_count (belum commit)
+
+    Returns:
+        dict: {'path', 'sha256', 'size', 'type', 'created'} - created False jika
+        isi file sama dengan blob yang sudah ada (file upload dibuang)
+    """
+    stream, file_type = spool_upload(file, filename, upload_folder)
+    try:
+        digest = stream.hexdigest()
+        path = blob_path(digest, file_type)
+        acquire_blob(digest, path, stream.size)
+        created = _ensure_blob_file(os.path.join(upload_folder, path), stream.commit_to)
+    finally:
+        stream.close()
+
+    logger.info(f"Stored proof {path} ({stream.size} bytes, {'new' if created else 'dedup'})")
+    return {'path': path, 'sha256': digest, 'size': stream.size, 'type': file_type, 'created': created}
+
+
+def _ensure_blob_file(full_path, write):
+    """
+    Pastikan file blob ada, tulis lewat write(full_path) jika belum
+
+    Wajib dipanggil setelah acquire_blob di transaksi yang sama: upsert itu
+    mengambil write lock SQLite, dan GC hanya menghapus file sambil memegang
+    lock yang sama, jadi file yang terlihat di sini tidak hilang sebelum commit.
+
+    Returns:
+        bool: True jika file baru ditulis
+    """
+    if os.path.exists(full_path):
+        return False
+    write(full_path)
+    return True
+
+
+def _move_file(source):
+    def write(full_path):
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        os.replace(source, full_path)
+    return write
+
+
+def rekey_blob(upload_folder, old_path, file_type, normalized):
+    """
+    Simpan hasil normalisasi sebagai blob baru (hash isi baru) dan pindahkan
+    semua referensi peserta dari old_path ke sana
+
+    Blob lama tidak diubah; ref_count-nya turun dan dihapus GC jika tidak dirujuk lagi.
+
+    Returns:
+        str: path blob yang sekarang dirujuk (old_path jika isinya sama)
+    """
+    digest, size = file_digest(normalized), os.path.getsize(normalized)
+    path = blob_path(digest, file_type)
+    peserta_ids = db.session.execute(
+        select(Peserta.id).where(Peserta.payment_proof == old_path)
+    ).scalars().all()
+    if path == old_path or not peserta_ids:
+        # Isi sama, atau bukti sudah diganti lagi sebelum normalisasi selesai
+        os.remove(normalized)
+        return old_path
+
+    try:
+        moved = db.session.execute(
+            update(Peserta)
+            .where(Peserta.id.in_(peserta_ids), Peserta.payment_proof == old_path)
+            .values(payment_proof=path)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if moved:
+            acquire_blob(digest, path, size, count=moved)
+            release_blobs([old_path], count=moved)
+            _ensure_blob_file(os.path.join(upload_folder, path), _move_file(normalized))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        if os.path.exists(normalized):
+            os.remove(normalized)
+    invalidate_principals(peserta_ids)
+    logger.info(f"Rekeyed {old_path} -> {path} ({moved} references)")
+    return path
+
+
+def normalize_blob(app, stored, then=None):
+    """
+    Normalisasi blob baru di worker upload, lalu rekey ke hash hasil normalisasi
+
+    Args:
+        stored (dict): hasil store_proof()
+        then: callable(full_path) untuk blob akhir (mis. warm thumbnail)
+    """
+    upload_folder = app.config['UPLOAD_FOLDER']
+
+    def adopt(result):
+        path = stored['path']
+        if result.get('output'):
+            with app.app_context():
+                path = rekey_blob(upload_folder, path, stored['type'], result['output'])
+        if then is not None:
+            then(os.path.join(upload_folder, path))
+
+    UPLOAD_PROCESSOR.submit(os.path.join(upload_folder, stored['path']), stored['type'], then=adopt)
+
+
+# === Garbage collection ===
+def _remove_if_old(full_path, cutoff):
+    try:
+        if os.path.getmtime(full_path) < cutoff:
+            os.remove(full_path)
+            return True
+    except FileNotFoundError:
+        pass
+    return False
+
+
+def _remove_unreferenced(digest, full_path, cutoff_date=None):
+    """
+    Hapus row blob tanpa referensi beserta file-nya dalam satu transaksi
+
+    DELETE mengambil write lock SQLite sebelum file dihapus; store_proof/rekey_blob
+    yang bersamaan menunggu lock itu dan baru memeriksa file setelah GC commit.
+    File hanya dihapus jika sesudah DELETE tidak ada row lagi (tidak ada referensi).
+
+    Returns:
+        bool: True jika file dihapus
+    """
+    conditions = [UploadBlob.sha256 == digest, UploadBlob.ref_count <= 0]
+    if cutoff_date is not None:
+        conditions.append(UploadBlob.tanggal_diupdate < cutoff_date)
+    try:
+        db.session.execute(delete(UploadBlob).where(*conditions))
+        referenced = db.session.execute(
+            select(UploadBlob.sha256).where(UploadBlob.sha256 == digest)
+        ).first() is not None
+        removed = False
+        if not referenced:
+            try:
+                os.remove(full_path)
+                removed = True
+            except FileNotFoundError:
+                pass
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return removed
+
+
+def collect_garbage(upload_folder, grace=UPLOAD_GC_GRACE):
+    """
+    Hapus blob dengan ref_count <= 0, file blob tanpa row dan file sementara lama
+
+    Returns:
+        dict: {'blobs_removed', 'orphans_removed', 'tmp_removed', 'bytes_freed'}
+    """
+    cutoff_time = time.time() - grace
+    cutoff_date = datetime.utcnow() - timedelta(seconds=grace)
+    stats = {'blobs_removed': 0, 'orphans_removed': 0, 'tmp_removed': 0, 'bytes_freed': 0}
+
+    candidates = db.session.execute(
+        select(UploadBlob.sha256, UploadBlob.path, UploadBlob.ukuran)
+        .where(UploadBlob.ref_count <= 0, UploadBlob.tanggal_diupdate < cutoff_date)
+    ).all()
+    for sha256, path, ukuran in candidates:
+        # Dicek ulang di transaksi penghapusan (upload baru bisa menaikkan ref_count)
+        if _remove_unreferenced(sha256, os.path.join(upload_folder, path), cutoff_date):
+            stats['blobs_removed'] += 1
+            stats['bytes_freed'] += ukuran
+
+    # File blob tanpa row (mis. proses mati sebelum commit, .part normalisasi yang tertinggal)
+    known = set(db.session.execute(select(UploadBlob.sha256)).scalars())
+    blob_root = os.path.join(upload_folder, BLOB_DIR)
+    for root, _dirs, files in os.walk(blob_root):
+        for name in files:
+            digest = name.split('.', 1)[0]
+            full_path = os.path.join(root, name)
+            try:
+                if digest in known or os.path.getmtime(full_path) >= cutoff_time:
+                    continue
+                size = os.path.getsize(full_path)
+            except FileNotFoundError:
+                continue
+            if _remove_unreferenced(digest, full_path):
+                stats['orphans_removed'] += 1
+                stats['bytes_freed'] += size
+
+    tmp_dir = os.path.join(upload_folder, UPLOAD_TMP_DIR)
+    if os.path.isdir(tmp_dir):
+        for name in os.listdir(tmp_dir):
+            if _remove_if_old(os.path.join(tmp_dir, name), cutoff_time):
+                stats['tmp_removed'] += 1
+
+    if any(stats.values()):
+        logger.info(f"Upload GC: {stats}")
+    return stats
+
+
+def maybe_collect_garbage(app):
+    """Jadwalkan GC di worker upload paling sering sekali per UPLOAD_GC_INTERVAL"""
+    global _last_gc
+    now = time.monotonic()
+    with _gc_lock:
+        if _last_gc and now - _last_gc < UPLOAD_GC_INTERVAL:
+            return False
+        _last_gc = now
+
+    def run():
+        with app.app_context():
+            collect_garbage(app.config['UPLOAD_FOLDER'])
+
+    UPLOAD_PROCESSOR.submit_task(run)
+    return True
+
+
+# === Migrasi file lama ===
+def migrate_legacy_uploads(upload_folder, delete_unreferenced=False):
+    """
+    Pindahkan bukti transfer lama (peserta_<id>_<ts>_<nama>) ke blob store
+
+    File lama yang tidak dirujuk peserta mana pun hanya dihapus jika delete_unreferenced.
+
+    Returns:
+        dict: {'migrated', 'missing', 'unreferenced', 'deleted'}
+    """
+    stats = {'migrated': 0, 'missing': 0, 'unreferenced': 0, 'deleted': 0}
+    rows = db.session.execute(
+        select(Peserta.id, Peserta.payment_proof)
+        .where(Peserta.payment_proof.isnot(None), ~Peserta.payment_proof.startswith(f"{BLOB_DIR}/"))
+    ).all()
+
+    for peserta_id, old_path in rows:
+        full_old = os.path.join(upload_folder, old_path)
+        if not os.path.isfile(full_old):
+            stats['missing'] += 1
+            continue
+        with open(full_old, 'rb') as f:
+            file_type = detect_type(f.read(16))
+        if file_type is None:
+            stats['missing'] += 1
+            continue
+
+        digest, size = file_digest(full_old), os.path.getsize(full_old)
+        path = blob_path(digest, file_type)
+        acquire_blob(digest, path, size)
+        _ensure_blob_file(os.path.join(upload_folder, path), _move_file(full_old))
+        db.session.execute(
+            update(Peserta).where(Peserta.id == peserta_id).values(payment_proof=path)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        if os.path.exists(full_old):
+            # Isi sama dengan blob yang sudah ada
+            os.remove(full_old)
+        stats['migrated'] += 1
+
+    # Sisa file di luar blobs/ dan tmp/ tidak dirujuk siapa pun lagi
+    for root, dirs, files in os.walk(upload_folder):
+        if root == upload_folder:
+            dirs[:] = [d for d in dirs if d not in (BLOB_DIR, UPLOAD_TMP_DIR)]
+        for name in files:
+            stats['unreferenced'] += 1
+            if delete_unreferenced:
+                os.remove(os.path.join(root, name))
+                stats['deleted'] += 1
+
+    logger.info(f"Legacy upload migration: {stats}")
+    return stats
+
+
+def get_stats():
+    row = db.session.execute(
+        select(
+            func.count(UploadBlob.sha256),
+            func.coalesce(func.sum(UploadBlob.ukuran), 0),
+            func.coalesce(func.sum(UploadBlob.ref_count), 0)
+        )
+    ).one()
+    return {'blobs': row[0], 'bytes': row[1], 'references': row[2]}
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Blob store bukti transfer')
+    parser.add_argument('command', choices=['stats', 'gc', 'migrate'])
+    parser.add_argument('--grace', type=int, default=UPLOAD_GC_GRACE, help='umur minimal file yang dihapus GC (detik)')
+    parser.add_argument('--delete-unreferenced', action='store_true',
+                        help='migrate: hapus file lama yang tidak dirujuk peserta')
+    args = parser.parse_args()
+
+    from . import create_app
+    app = create_app()
+    with app.app_context():
+        folder = app.config['UPLOAD_FOLDER']
+        if args.command == 'gc':
+            print(collect_garbage(folder, args.grace))
+        elif args.command == 'migrate':
+            print(migrate_legacy_uploads(folder, args.delete_unreferenced))
+        print(get_stats())
@@ -0,0 +1,226 @@
+"""
+Bulk Operations
+Perubahan massal data peserta dengan satu UPDATE per operasi (bukan loop ORM),
+dalam satu transaksi, mengembalikan jumlah row yang berubah
+"""
+
+import logging
+from sqlalchemy import update, select
+from .models import db, Peserta, Batch
+from .session_store import sync_user_sessions
+from .auth import invalidate_principals
+
+logger = logging.getLogger(__name__)
+
+PAYMENT_STATUS_VALUES = ['Belum', 'Menunggu', 'Lunas', 'Ditolak']
+
+# Batas parameter SQLite untuk IN (...) - id dipecah per potongan
+ID_CHUNK_SIZE = 500
+
+# Maksimal item per request verifikasi massal
+MAX_BULK_ITEMS = 1000
+
+
+class BulkOperationError(ValueError):
+    """Input operasi massal tidak valid"""
+    pass
+
+
+def _parse_ids(peserta_ids):
+    try:
+        ids = sorted({int(peserta_id) for peserta_id in peserta_ids})
+    except (TypeError, ValueError):
+        raise BulkOperationError('ID peserta tidak valid')
+    if not ids:
+        raise BulkOperationError('Tidak ada peserta yang dipilih')
+    return ids
+
+
+def _update_peserta(ids, values):
+    """UPDATE peserta SET ... WHERE id IN (...) per potongan, return jumlah row"""
+    affected = 0
+    for start in range(0, len(ids), ID_CHUNK_SIZE):
+        chunk = ids[start:start + ID_CHUNK_SIZE]
+        result = db.session.execute(
+            update(Peserta)
+            .where(Peserta.id.in_(chunk))
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        affected += result.rowcount
+    return affected
+
+
+def _existing_ids(ids):
+    found = set()
+    for start in range(0, len(ids), ID_CHUNK_SIZE):
+        chunk = ids[start:start + ID_CHUNK_SIZE]
+        found.update(db.session.execute(select(Peserta.id).where(Peserta.id.in_(chunk))).scalars())
+    return found
+
+
+class BulkOperations:
+    """Operasi massal untuk halaman admin (semua commit/rollback di sini)"""
+
+    @staticmethod
+    def set_group_access(batch_id, akses=None):
+        """
+        Ubah akses_workshop_default grup dan terapkan ke semua peserta grup
+
+        Args:
+            batch_id (int): id Batch
+            akses (bool): nilai baru, None = toggle
+
+        Returns:
+            dict: {'batch', 'akses_workshop', 'peserta_updated'}
+        """
+        try:
+            grup = Batch.query.get(batch_id)
+            if grup is None:
+                raise BulkOperationError('Grup tidak ditemukan')
+
+            if akses is None:
+                akses = not grup.akses_workshop_default
+            grup.akses_workshop_default = akses
+
+            result = db.session.execute(
+                update(Peserta)
+                .where(Peserta.batch_id == grup.id)
+                .values(akses_workshop=akses)
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        # Session peserta yang sedang login ikut diperbarui
+        sync_user_sessions(
+            db.session.execute(select(Peserta.id).where(Peserta.batch_id == grup.id)).scalars(),
+            akses_workshop=akses
+        )
+        logger.info(f"Group access for {grup.nama} set to {akses}: {result.rowcount} peserta updated")
+        return {'batch': grup.nama, 'akses_workshop': akses, 'peserta_updated': result.rowcount}
+
+    @staticmethod
+    def reassign_batch(peserta_ids, batch_id, apply_access=True):
+        """
+        Pindahkan peserta ke grup lain
+
+        Args:
+            peserta_ids (list): id peserta
+            batch_id (int): id Batch tujuan
+            apply_access (bool): ikut set akses_workshop ke default grup tujuan
+
+        Returns:
+            dict: {'batch', 'peserta_updated'}
+        """
+        ids = _parse_ids(peserta_ids)
+        try:
+            grup = Batch.query.get(batch_id)
+            if grup is None:
+                raise BulkOperationError('Grup tidak ditemukan')
+
+            values = {'batch_id': grup.id, 'batch': grup.nama}
+            if apply_access:
+                values['akses_workshop'] = grup.akses_workshop_default
+            affected = _update_peserta(ids, values)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        if apply_access:
+            sync_user_sessions(ids, akses_workshop=grup.akses_workshop_default)
+        else:
+            invalidate_principals(ids)
+        logger.info(f"Reassigned {affected} peserta to {grup.nama}")
+        return {'batch': grup.nama, 'peserta_updated': affected}
+
+    @staticmethod
+    def set_payment_status(peserta_ids, status):
+        """
+        Set status_pembayaran untuk banyak peserta sekaligus
+
+        Returns:
+            dict: {'status', 'peserta_updated'}
+        """
+        if status not in PAYMENT_STATUS_VALUES:
+            raise BulkOperationError('Status tidak valid!')
+        ids = _parse_ids(peserta_ids)
+        try:
+            affected = _update_peserta(ids, {'status_pembayaran': status})
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        invalidate_principals(ids)
+        logger.info(f"Payment status set to {status} for {affected} peserta")
+        return {'status': status, 'peserta_updated': affected}
+
+    @staticmethod
+    def set_access(peserta_ids, akses):
+        """Set akses_workshop untuk peserta terpilih"""
+        ids = _parse_ids(peserta_ids)
+        try:
+            affected = _update_peserta(ids, {'akses_workshop': bool(akses)})
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        sync_user_sessions(ids, akses_workshop=bool(akses))
+        return {'akses_workshop': bool(akses), 'peserta_updated': affected}
+
+    @staticmethod
+    def verify_payments(items):
+        """
+        Verifikasi banyak pembayaran sekaligus (status boleh berbeda per peserta)
+
+        Semua item divalidasi dulu; jika ada yang tidak valid tidak ada yang diubah.
+        Satu UPDATE per status, semua dalam satu transaksi.
+
+        Args:
+            items (list): [{'id': int, 'status': str}]
+
+        Returns:
+            dict: {'updated', 'by_status', 'not_found'}
+        """
+        if not isinstance(items, list) or not items:
+            raise BulkOperationError('Tidak ada item untuk diverifikasi')
+        if len(items) > MAX_BULK_ITEMS:
+            raise BulkOperationError(f'Maksimal {MAX_BULK_ITEMS} item per request')
+
+        # id -> status (item terakhir menang jika id sama)
+        targets = {}
+        for item in items:
+            try:
+                peserta_id = int(item['id'])
+                status = item['status']
+            except (TypeError, KeyError, ValueError):
+                raise BulkOperationError('Format item tidak valid')
+            if status not in PAYMENT_STATUS_VALUES:
+                raise BulkOperationError(f'Status tidak valid: {status}')
+            targets[peserta_id] = status
+
+        by_status = {}
+        try:
+            found = _existing_ids(sorted(targets))
+            grouped = {}
+            for peserta_id, status in targets.items():
+                if peserta_id in found:
+                    grouped.setdefault(status, []).append(peserta_id)
+
+            for status, ids in grouped.items():
+                by_status[status] = _update_peserta(sorted(ids), {'status_pembayaran': status})
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        invalidate_principals(found)
+        not_found = sorted(set(targets) - found)
+        updated = sum(by_status.values())
+        logger.info(f"Bulk payment verification: {updated} updated, {len(not_found)} not found")
+        return {'updated': updated, 'by_status': by_status, 'not_found': not_found}
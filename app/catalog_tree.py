@@ -0,0 +1,210 @@
+"""
+Catalog Tree
+Pohon folder dokumen (dokumen_bengkel.db + static/docs_catalog.json) di memori,
+dipakai bersama oleh semua request tanpa query database
+"""
+
+import os
+import json
+import logging
+import threading
+from .dokumen_db import DOKUMEN_DB
+
+logger = logging.getLogger(__name__)
+
+CATALOG_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..', 'static', 'docs_catalog.json')
+)
+
+# Key kategori di docs_catalog.json -> (folder ID Google Drive, nama tampilan)
+CATALOG_ROOTS = {
+    'EBOOKS': ('12ffd7GqHAiy3J62Vu65LbVt6-ultog5Z', 'EBOOKS'),
+    'pengetahuan': ('1Y2SLCbyHoB53BaQTTwRta2T6dv_drRll', 'Pengetahuan'),
+    'service_manual_1': ('1CHz8UWZXfJtXlcjp9-FPAo-t_KkfTztW', 'Service Manual 1'),
+    'service_manual_2': ('1_SsZ7SkaZxvXUZ6RUAA_o7WR_GAtgEwT', 'Service Manual 2')
+}
+
+
+class CatalogNode:
+    """Satu file/folder; size folder = total ukuran semua file di dalamnya (bytes)"""
+
+    __slots__ = ('id', 'name', 'parent_id', 'is_directory', 'mime_type', 'size', 'children')
+
+    def __init__(self, id, name, parent_id=None, is_directory=False, mime_type=None, size=None):
+        self.id = id
+        self.name = name
+        self.parent_id = parent_id
+        self.is_directory = is_directory
+        self.mime_type = mime_type
+        self.size = size
+        self.children = [] if is_directory else None
+
+    def __getitem__(self, key):
+        # Kompatibel dengan akses row['name'] dari sqlite3.Row
+        return getattr(self, key)
+
+
+class CatalogTree:
+    """Index id -> node, dibangun sekali dari database dan katalog JSON"""
+
+    def __init__(self, nodes):
+        self.nodes = nodes
+
+    def __contains__(self, node_id):
+        return node_id in self.nodes
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def get(self, node_id):
+        return self.nodes.get(node_id)
+
+    def list_folder(self, folder_id):
+        """
+        Isi folder (sudah urut: folder dulu, lalu nama)
+
+        Returns:
+            tuple: (items, file_count)
+        """
+        node = self.nodes.get(folder_id)
+        items = node.children if node and node.is_directory else []
+        file_count = sum(1 for item in items if not item.is_directory)
+        return items, file_count
+
+    def breadcrumbs(self, node_id):
+        """Daftar node dari root sampai node_id"""
+        trail = []
+        seen = set()
+        node = self.nodes.get(node_id)
+        while node and node.id not in seen:
+            seen.add(node.id)
+            trail.append(node)
+            node = self.nodes.get(node.parent_id)
+        return list(reversed(trail))
+
+    @staticmethod
+    def build(db_rows, catalog):
+        """
+        Bangun pohon dari row tabel files dan isi docs_catalog.json
+
+        Args:
+            db_rows (list): row dengan key id, name, parent_id, is_directory, mime_type (size opsional)
+            catalog (dict): {kategori: [{'name', 'file_id', 'size_mb'}, ...]}
+        """
+        nodes = {}
+        for row in db_rows:
+            keys = row.keys()
+            nodes[row['id']] = CatalogNode(
+                row['id'],
+                row['name'],
+                row['parent_id'],
+                bool(row['is_directory']),
+                row['mime_type'],
+                row['size'] if 'size' in keys else None
+            )
+
+        for key, files in catalog.items():
+            if key not in CATALOG_ROOTS:
+                continue
+            root_id, display = CATALOG_ROOTS[key]
+            if root_id not in nodes:
+                nodes[root_id] = CatalogNode(root_id, display, is_directory=True)
+
+            for item in files:
+                size = int(item['size_mb'] * 1024 * 1024) if item.get('size_mb') is not None else None
+                node = nodes.get(item['file_id'])
+                if node is None:
+                    nodes[item['file_id']] = CatalogNode(
+                        item['file_id'], item['name'], root_id, False, 'application/pdf', size
+                    )
+                elif node.size is None:
+                    node.size = size
+
+        # Hubungkan children
+        for node in nodes.values():
+            parent = nodes.get(node.parent_id)
+            if parent is not None and parent.is_directory and parent is not node:
+                parent.children.append(node)
+
+        # Urutan sama dengan query lama: folder dulu, lalu nama
+        for node in nodes.values():
+            if node.is_directory:
+                node.children.sort(key=lambda child: (not child.is_directory, child.name))
+
+        CatalogTree._aggregate_sizes(nodes)
+        return CatalogTree(nodes)
+
+    @staticmethod
+    def _aggregate_sizes(nodes):
+        """Hitung ukuran total folder (iteratif, post-order)"""
+        roots = [
+            node for node in nodes.values()
+            if node.is_directory and node.parent_id not in nodes
+        ]
+        done = set()
+        for root in roots:
+            stack = [(root, False)]
+            while stack:
+                node, expanded = stack.pop()
+                if node.id in done:
+                    continue
+                if not expanded:
+                    stack.append((node, True))
+                    stack.extend((child, False) for child in node.children if child.is_directory)
+                    continue
+                node.size = sum(child.size or 0 for child in node.children)
+                done.add(node.id)
+
+
+class CatalogTreeCache:
+    """
+    Pohon katalog yang dimuat saat pertama kali dipakai dan dimuat ulang
+    jika mtime dokumen_bengkel.db atau docs_catalog.json berubah
+    """
+
+    def __init__(self, dokumen_db=DOKUMEN_DB, catalog_path=CATALOG_PATH):
+        self.dokumen_db = dokumen_db
+        self.catalog_path = catalog_path
+        self._lock = threading.Lock()
+        self._tree = None
+        self._version = None
+
+    def _current_version(self):
+        version = []
+        for path in (self.dokumen_db.path, self.catalog_path):
+            try:
+                st = os.stat(path)
+                version.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                version.append(None)
+        return tuple(version)
+
+    def _load(self):
+        db_rows = self.dokumen_db.read_all() if self.dokumen_db.available() else []
+
+        catalog = {}
+        if os.path.exists(self.catalog_path):
+            try:
+                with open(self.catalog_path, 'r', encoding='utf-8') as f:
+                    catalog = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not read {self.catalog_path}: {str(e)}")
+
+        return CatalogTree.build(db_rows, catalog)
+
+    def get(self):
+        """Ambil pohon katalog (dimuat ulang jika file sumber berubah)"""
+        version = self._current_version()
+        tree = self._tree
+        if tree is not None and version == self._version:
+            return tree
+
+        with self._lock:
+            if self._tree is None or version != self._version:
+                self._tree = self._load()
+                self._version = version
+                logger.info(f"Catalog tree loaded: {len(self._tree)} nodes")
+            return self._tree
+
+
+CATALOG_TREE = CatalogTreeCache()
@@ -0,0 +1,373 @@
+"""
+Columnar Export
+Dump tabel Peserta, Batch, Jadwal dan Document ke format kolom biner yang ringkas
+(tanpa pyarrow), untuk kebutuhan laporan/analitik
+
+Format file (.stnc):
+    MAGIC
+    row group 1: blok kolom 1, blok kolom 2, ...
+    row group 2: ...
+    footer JSON (schema + offset/panjang/codec setiap blok)
+    panjang footer (uint32 little-endian)
+    MAGIC
+
+Tipe kolom dipertahankan:
+    int64     -> int64 little-endian
+    float64   -> float64 little-endian
+    bool      -> 1 byte per row
+    timestamp -> int64 mikrodetik sejak epoch (UTC, tanpa strftime)
+    string    -> offset uint64 (rows + 1) + data UTF-8 (versi 1: offset uint32)
+
+Kolom yang boleh NULL punya bitmap validitas (1 byte per row) jika ada NULL.
+Setiap blok dikompres sendiri-sendiri (zlib / lzma / none, bisa per kolom).
+"""
+
+import os
+import sys
+import json
+import lzma
+import zlib
+import struct
+import logging
+from array import array
+from datetime import datetime, timedelta
+from sqlalchemy import select, Integer, Float, Boolean, DateTime
+from .models import db, Peserta, Batch, Jadwal, Document
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'STNCOL1\n'
+FORMAT_VERSION = 2
+# Tipe offset kolom string per versi format: uint32 di versi 1 membatasi data
+# string per blok < 4 GiB, versi 2 memakai uint64
+STRING_OFFSET_TYPECODES = {1: 'I', 2: 'Q'}
+ROW_GROUP_SIZE = 65536
+DEFAULT_CODEC = 'zlib'
+
+EXPORT_TABLES = {
+    'peserta': Peserta,
+    'batch': Batch,
+    'jadwal': Jadwal,
+    'document': Document
+}
+
+# Kolom yang tidak pernah ikut diexport
+EXCLUDED_COLUMNS = {
+    'peserta': {'password_hash'}
+}
+
+EPOCH = datetime(1970, 1, 1)
+ONE_MICROSECOND = timedelta(microseconds=1)
+
+
+class ColumnarFormatError(Exception):
+    """File bukan format kolom yang valid"""
+    pass
+
+
+# === Codec ===
+def compress(data, codec):
+    if codec == 'zlib':
+        return zlib.compress(data, 6)
+    if codec == 'lzma':
+        return lzma.compress(data, preset=6)
+    if codec == 'none':
+        return data
+    raise ValueError(f"Unknown codec: {codec}")
+
+
+def decompress(data, codec):
+    if codec == 'zlib':
+        return zlib.decompress(data)
+    if codec == 'lzma':
+        return lzma.decompress(data)
+    if codec == 'none':
+        return data
+    raise ColumnarFormatError(f"Unknown codec: {codec}")
+
+
+def _le_bytes(values, typecode):
+    arr = array(typecode, values)
+    if sys.byteorder == 'big':
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def _from_le_bytes(data, typecode):
+    arr = array(typecode)
+    arr.frombytes(data)
+    if sys.byteorder == 'big':
+        arr.byteswap()
+    return arr
+
+
+# === Encoding per tipe ===
+def column_type(column):
+    """Tipe kolom export dari tipe SQLAlchemy"""
+    if isinstance(column.type, Boolean):
+        return 'bool'
+    if isinstance(column.type, Integer):
+        return 'int64'
+    if isinstance(column.type, Float):
+        return 'float64'
+    if isinstance(column.type, DateTime):
+        return 'timestamp'
+    return 'string'
+
+
+def encode_values(values, col_type):
+    """Encode list nilai (None sudah diganti nilai default) ke bytes"""
+    if col_type == 'int64':
+        return _le_bytes(values, 'q')
+    if col_type == 'float64':
+        return _le_bytes(values, 'd')
+    if col_type == 'bool':
+        return bytes(1 if value else 0 for value in values)
+    if col_type == 'timestamp':
+        return _le_bytes(((value - EPOCH) // ONE_MICROSECOND for value in values), 'q')
+
+    offsets = [0]
+    parts = []
+    total = 0
+    for value in values:
+        raw = value.encode('utf-8')
+        parts.append(raw)
+        total += len(raw)
+        offsets.append(total)
+    return _le_bytes(offsets, STRING_OFFSET_TYPECODES[FORMAT_VERSION]) + b''.join(parts)
+
+
+def decode_values(data, col_type, rows, version=FORMAT_VERSION):
+    if col_type == 'int64':
+        return list(_from_le_bytes(data, 'q'))
+    if col_type == 'float64':
+        return list(_from_le_bytes(data, 'd'))
+    if col_type == 'bool':
+        return [bool(b) for b in data]
+    if col_type == 'timestamp':
+        return [EPOCH + timedelta(microseconds=v) for v in _from_le_bytes(data, 'q')]
+
+    typecode = STRING_OFFSET_TYPECODES.get(version)
+    if typecode is None:
+        raise ColumnarFormatError(f"Unsupported format version: {version}")
+    offset_size = (rows + 1) * array(typecode).itemsize
+    offsets = _from_le_bytes(data[:offset_size], typecode)
+    body = data[offset_size:]
+    return [body[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(rows)]
+
+
+NULL_PLACEHOLDER = {
+    'int64': 0,
+    'float64': 0.0,
+    'bool': False,
+    'timestamp': EPOCH,
+    'string': ''
+}
+
+
+# === Writer ===
+class ColumnarWriter:
+    """
+    Tulis satu tabel ke file kolom, satu row group per batch row
+
+    Args:
+        fileobj: file biner yang sudah dibuka untuk ditulis
+        columns (list): [(nama, tipe)]
+        codecs (dict): {nama kolom: codec}, kolom lain memakai default_codec
+    """
+
+    def __init__(self, fileobj, table, columns, codecs=None, default_codec=DEFAULT_CODEC):
+        self.fileobj = fileobj
+        self.table = table
+        self.columns = columns
+        self.codecs = {name: (codecs or {}).get(name, default_codec) for name, _ in columns}
+        self.row_groups = []
+        self.rows = 0
+        self.position = 0
+        self._write(MAGIC)
+
+    def _write(self, data):
+        self.fileobj.write(data)
+        self.position += len(data)
+
+    def _write_block(self, data, codec):
+        block = compress(data, codec)
+        offset = self.position
+        self._write(block)
+        return {'offset': offset, 'length': len(block), 'raw_length': len(data)}
+
+    def write_rows(self, rows):
+        """Tulis satu row group dari list row (tuple sesuai urutan columns)"""
+        if not rows:
+            return
+        group = {'rows': len(rows), 'columns': []}
+
+        for index, (name, col_type) in enumerate(self.columns):
+            codec = self.codecs[name]
+            values = [row[index] for row in rows]
+            meta = {}
+
+            if any(value is None for value in values):
+                validity = bytes(0 if value is None else 1 for value in values)
+                meta['validity'] = self._write_block(validity, codec)
+                placeholder = NULL_PLACEHOLDER[col_type]
+                values = [placeholder if value is None else value for value in values]
+
+            meta['data'] = self._write_block(encode_values(values, col_type), codec)
+            group['columns'].append(meta)
+
+        self.row_groups.append(group)
+        self.rows += len(rows)
+
+    def close(self):
+        footer = json.dumps({
+            'version': FORMAT_VERSION,
+            'table': self.table,
+            'rows': self.rows,
+            'schema': [
+                {'name': name, 'type': col_type, 'codec': self.codecs[name]}
+                for name, col_type in self.columns
+            ],
+            'row_groups': self.row_groups,
+            'created': datetime.utcnow().isoformat()
+        }).encode('utf-8')
+        self._write(footer)
+        self._write(struct.pack('<I', len(footer)))
+        self._write(MAGIC)
+
+
+# === Reader ===
+def read_footer(fileobj):
+    fileobj.seek(0, os.SEEK_END)
+    size = fileobj.tell()
+    tail = len(MAGIC) + 4
+    if size < len(MAGIC) + tail:
+        raise ColumnarFormatError("File too small")
+
+    fileobj.seek(size - tail)
+    footer_len = struct.unpack('<I', fileobj.read(4))[0]
+    if fileobj.read(len(MAGIC)) != MAGIC:
+        raise ColumnarFormatError("Invalid trailing magic")
+
+    fileobj.seek(size - tail - footer_len)
+    return json.loads(fileobj.read(footer_len).decode('utf-8'))
+
+
+def read_table(path, columns=None):
+    """
+    Baca file kolom (hanya kolom yang diminta)
+
+    Returns:
+        tuple: (footer, {nama kolom: [nilai]})
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ColumnarFormatError(f"{path} is not a columnar export")
+        footer = read_footer(f)
+
+        schema = footer['schema']
+        version = footer.get('version', 1)
+        wanted = [i for i, col in enumerate(schema) if columns is None or col['name'] in columns]
+        result = {schema[i]['name']: [] for i in wanted}
+
+        def read_block(meta, codec):
+            f.seek(meta['offset'])
+            return decompress(f.read(meta['length']), codec)
+
+        for group in footer['row_groups']:
+            rows = group['rows']
+            for i in wanted:
+                col = schema[i]
+                meta = group['columns'][i]
+                values = decode_values(read_block(meta['data'], col['codec']), col['type'], rows, version)
+                if 'validity' in meta:
+                    validity = read_block(meta['validity'], col['codec'])
+                    values = [value if valid else None for value, valid in zip(values, validity)]
+                result[col['name']].extend(values)
+
+    return footer, result
+
+
+# === Export tabel ===
+def export_columns(table_name):
+    model = EXPORT_TABLES[table_name]
+    excluded = EXCLUDED_COLUMNS.get(table_name, set())
+    return [column for column in model.__table__.columns if column.name not in excluded]
+
+
+def export_table(table_name, path, codecs=None, default_codec=DEFAULT_CODEC, row_group_size=ROW_GROUP_SIZE):
+    """
+    Export satu tabel dalam satu kali baca (yield_per per row group)
+
+    Returns:
+        dict: {'table', 'path', 'rows', 'bytes'}
+    """
+    columns = export_columns(table_name)
+    stmt = select(*columns).order_by(columns[0]).execution_options(yield_per=row_group_size)
+
+    tmp_path = f"{path}.part"
+    with open(tmp_path, 'wb') as f:
+        writer = ColumnarWriter(
+            f, table_name,
+            [(column.name, column_type(column)) for column in columns],
+            codecs=codecs, default_codec=default_codec
+        )
+        result = db.session.execute(stmt)
+        for partition in result.partitions(row_group_size):
+            writer.write_rows(partition)
+        writer.close()
+    os.replace(tmp_path, path)
+
+    info = {'table': table_name, 'path': path, 'rows': writer.rows, 'bytes': os.path.getsize(path)}
+    logger.info(f"Exported {info['rows']} rows from {table_name} to {path} ({info['bytes']} bytes)")
+    return info
+
+
+def export_tables(output_dir, tables=None, codecs=None, default_codec=DEFAULT_CODEC):
+    """
+    Export beberapa tabel ke output_dir/<tabel>.stnc
+
+    Args:
+        codecs (dict): {'tabel.kolom': codec} untuk kompresi per kolom
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    results = []
+    for table_name in tables or EXPORT_TABLES:
+        if table_name not in EXPORT_TABLES:
+            raise ValueError(f"Unknown table: {table_name}")
+        table_codecs = {
+            key.split('.', 1)[1]: codec
+            for key, codec in (codecs or {}).items()
+            if key.startswith(f"{table_name}.")
+        }
+        path = os.path.join(output_dir, f"{table_name}.stnc")
+        results.append(export_table(table_name, path, table_codecs, default_codec))
+    return results
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Export tabel ke format kolom (.stnc)')
+    parser.add_argument('--out', default='exports', help='folder output')
+    parser.add_argument('--tables', default=','.join(EXPORT_TABLES), help='daftar tabel, pisahkan dengan koma')
+    parser.add_argument('--codec', default=DEFAULT_CODEC, choices=['zlib', 'lzma', 'none'])
+    parser.add_argument('--column-codec', action='append', default=[], metavar='TABEL.KOLOM=CODEC',
+                        help='codec khusus per kolom, mis. document.konten_search=lzma')
+    args = parser.parse_args(argv)
+
+    codecs = {}
+    for item in args.column_codec:
+        key, _, codec = item.partition('=')
+        codecs[key] = codec
+
+    from . import create_app
+    app = create_app()
+    with app.app_context():
+        tables = [name.strip() for name in args.tables.split(',') if name.strip()]
+        for info in export_tables(args.out, tables, codecs, args.codec):
+            print(f"{info['table']}: {info['rows']} rows -> {info['path']} ({info['bytes']} bytes)")
+
+
+if __name__ == '__main__':
+    main()
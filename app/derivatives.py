@@ -0,0 +1,232 @@
+"""
+Derivative Service
+Thumbnail JPEG/WebP untuk bukti transfer (gambar dan halaman pertama PDF),
+dibuat di worker pool terbatas dan di-cache di disk berdasarkan hash isi file
+sumber, sehingga halaman verifikasi bisa menampilkan banyak bukti sekaligus
+"""
+
+import os
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+import subprocess
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Sisi terpanjang thumbnail (pixel) per ukuran
+THUMBNAIL_SIZES = {
+    'sm': 160,
+    'md': 480
+}
+DEFAULT_SIZE = 'sm'
+
+THUMBNAIL_FORMATS = {
+    'webp': ('WEBP', 'image/webp'),
+    'jpeg': ('JPEG', 'image/jpeg')
+}
+THUMBNAIL_QUALITY = 80
+
+DERIVATIVE_WORKERS = int(os.getenv('DERIVATIVE_WORKERS', '2'))
+# Batas waktu request menunggu thumbnail dibuat (detik)
+DERIVATIVE_WAIT_SECONDS = 20
+PDF_RENDER_TIMEOUT = 15
+
+CHUNK_SIZE = 64 * 1024
+DIGEST_MEMO_SIZE = 4096
+
+
+class DerivativeError(Exception):
+    """Thumbnail tidak bisa dibuat"""
+    pass
+
+
+def file_digest(path):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def _save_image(image, path, fmt):
+    """Simpan atomik (temp di folder yang sama lalu os.replace)"""
+    pil_format = THUMBNAIL_FORMATS[fmt][0]
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            image.convert('RGB').save(out, pil_format, quality=THUMBNAIL_QUALITY, optimize=True)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def render_image_thumbnail(source, target, max_edge, fmt):
+    from PIL import Image, ImageOps
+
+    with Image.open(source) as image:
+        image.draft('RGB', (max_edge, max_edge))  # JPEG: decode langsung di resolusi kecil
+        thumb = ImageOps.exif_transpose(image)
+        thumb.thumbnail((max_edge, max_edge), Image.LANCZOS)
+        _save_image(thumb, target, fmt)
+
+
+def render_pdf_placeholder(target, max_edge, fmt):
+    """Kartu 'PDF' jika pdftoppm tidak tersedia"""
+    from PIL import Image, ImageDraw
+
+    width, height = int(max_edge * 0.75), max_edge
+    image = Image.new('RGB', (width, height), (245, 245, 245))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle([0, 0, width - 1, height - 1], outline=(200, 200, 200))
+    draw.rectangle([0, height // 2 - height // 10, width, height // 2 + height // 10], fill=(211, 47, 47))
+    draw.text((width // 2, height // 2), 'PDF', fill=(255, 255, 255), anchor='mm')
+    _save_image(image, target, fmt)
+
+
+def render_pdf_thumbnail(source, target, max_edge, fmt):
+    """Halaman pertama PDF lewat pdftoppm (poppler-utils), fallback ke placeholder"""
+    pdftoppm = shutil.which('pdftoppm')
+    if pdftoppm is None:
+        render_pdf_placeholder(target, max_edge, fmt)
+        return
+
+    from PIL import Image
+
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(target)) as tmp_dir:
+        prefix = os.path.join(tmp_dir, 'page')
+        try:
+            subprocess.run(
+                [pdftoppm, '-f', '1', '-l', '1', '-singlefile', '-scale-to', str(max_edge), '-png', source, prefix],
+                check=True, capture_output=True, timeout=PDF_RENDER_TIMEOUT
+            )
+        except (subprocess.SubprocessError, OSError) as e:
+            logger.warning(f"pdftoppm failed for {source}: {str(e)}")
+            render_pdf_placeholder(target, max_edge, fmt)
+            return
+        with Image.open(f"{prefix}.png") as page:
+            _save_image(page, target, fmt)
+
+
+class DerivativeService:
+    """
+    Thumbnail per (hash isi file, ukuran, format) di cache_dir/<ab>/<hash>_<ukuran>.<format>
+
+    - File yang isinya sama (mis. upload ulang) memakai thumbnail yang sama
+    - Pembuatan thumbnail dibatasi worker pool; request yang meminta
+      thumbnail sama saat sedang dibuat menunggu job yang sama
+    """
+
+    def __init__(self, cache_dir, workers=DERIVATIVE_WORKERS):
+        self.cache_dir = cache_dir
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='derivative')
+        self._lock = threading.Lock()
+        self._pending = {}  # (digest, size, fmt) -> Future
+        self._digests = OrderedDict()  # (path, mtime_ns, size) -> digest
+        self.metrics = {'hits': 0, 'generated': 0, 'failed': 0}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def source_digest(self, path):
+        """Hash isi file sumber (dimemo per path + mtime + ukuran)"""
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            digest = self._digests.get(key)
+            if digest is not None:
+                self._digests.move_to_end(key)
+                return digest
+
+        digest = file_digest(path)
+        with self._lock:
+            self._digests[key] = digest
+            while len(self._digests) > DIGEST_MEMO_SIZE:
+                self._digests.popitem(last=False)
+        return digest
+
+    def derivative_path(self, digest, size, fmt):
+        return os.path.join(self.cache_dir, digest[:2], f"{digest}_{size}.{fmt}")
+
+    def _render(self, source, target, size, fmt):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        max_edge = THUMBNAIL_SIZES[size]
+        if source.lower().endswith('.pdf'):
+            render_pdf_thumbnail(source, target, max_edge, fmt)
+        else:
+            render_image_thumbnail(source, target, max_edge, fmt)
+        self.metrics['generated'] += 1
+        return target
+
+    def submit(self, source, size=DEFAULT_SIZE, fmt='webp'):
+        """
+        Jadwalkan pembuatan thumbnail (tidak menunggu)
+
+        Returns:
+            tuple: (digest, Future atau None jika sudah ada di cache)
+        """
+        if size not in THUMBNAIL_SIZES or fmt not in THUMBNAIL_FORMATS:
+            raise DerivativeError(f"Unknown thumbnail {size}/{fmt}")
+
+        digest = self.source_digest(source)
+        target = self.derivative_path(digest, size, fmt)
+        if os.path.exists(target):
+            self.metrics['hits'] += 1
+            return digest, None
+
+        key = (digest, size, fmt)
+        with self._lock:
+            future = self._pending.get(key)
+            created = future is None
+            if created:
+                future = self._executor.submit(self._render, source, target, size, fmt)
+                self._pending[key] = future
+        if created:
+            # Di luar lock: callback langsung jalan jika job sudah selesai
+            future.add_done_callback(lambda _f, key=key: self._done(key))
+        return digest, future
+
+    def _done(self, key):
+        with self._lock:
+            future = self._pending.pop(key, None)
+        if future is not None and future.exception() is not None:
+            self.metrics['failed'] += 1
+            logger.error(f"Failed to render thumbnail {key}: {future.exception()}")
+
+    def get(self, source, size=DEFAULT_SIZE, fmt='webp', timeout=DERIVATIVE_WAIT_SECONDS):
+        """
+        Path thumbnail (dibuat dulu jika belum ada)
+
+        Returns:
+            tuple: (path, digest)
+        """
+        digest, future = self.submit(source, size, fmt)
+        if future is not None:
+            try:
+                future.result(timeout=timeout)
+            except ImportError:
+                raise DerivativeError('Pillow not installed')
+            except Exception as e:
+                raise DerivativeError(str(e))
+        return self.derivative_path(digest, size, fmt), digest
+
+    def warm(self, source, sizes=(DEFAULT_SIZE,)):
+        """Buat thumbnail di background (dipanggil setelah upload selesai diproses)"""
+        for size in sizes:
+            for fmt in THUMBNAIL_FORMATS:
+                self.submit(source, size, fmt)
+
+    def get_stats(self):
+        return {**self.metrics, 'pending': len(self._pending)}
+
+
+def get_derivative_service(app):
+    """Instance bersama untuk aplikasi (dibuat sekali per proses)"""
+    service = app.extensions.get('derivatives')
+    if service is None:
+        service = DerivativeService(app.config['DERIVATIVE_DIR'])
+        app.extensions['derivatives'] = service
+    return service
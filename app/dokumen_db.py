@@ -0,0 +1,55 @@
+"""
+Dokumen Bengkel DB
+Akses read-only ke static/dokumen_bengkel.db
+
+Isi database hanya dibaca utuh oleh pohon katalog (app/catalog_tree.py) yang
+melayani listing folder dari memori, jadi tidak ada query per request di sini
+"""
+
+import os
+import sqlite3
+
+DOKUMEN_DB_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..', 'static', 'dokumen_bengkel.db')
+)
+
+
+class DokumenDatabase:
+    """
+    Database dokumen bengkel read-only
+
+    Koneksi dibuka dengan URI mode=ro (dan immutable=1 karena file statis: tanpa
+    lock/cek WAL), satu koneksi baru per pemuatan supaya file yang diganti ikut terbaca
+    """
+
+    def __init__(self, path=DOKUMEN_DB_PATH, immutable=True):
+        self.path = path
+        self.immutable = immutable
+
+    def available(self):
+        return os.path.exists(self.path)
+
+    def _uri(self):
+        uri = f"file:{self.path}?mode=ro"
+        if self.immutable:
+            uri += "&immutable=1"
+        return uri
+
+    def _connect(self):
+        conn = sqlite3.connect(self._uri(), uri=True)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def read_all(self):
+        """Semua row tabel files"""
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT * FROM files").fetchall()
+        finally:
+            conn.close()
+
+
+DOKUMEN_DB = DokumenDatabase(
+    DOKUMEN_DB_PATH,
+    immutable=os.getenv('DOKUMEN_DB_IMMUTABLE', 'True').lower() == 'true'
+)
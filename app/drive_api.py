@@ -0,0 +1,278 @@
+"""
+Drive API Client
+Wrapper Google Drive API bersama: discovery document di-cache, budget request
+(token bucket), retry dengan exponential backoff + jitter, dan metrik per call
+"""
+
+import os
+import time
+import random
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+SCOPES = ['https://www.googleapis.com/auth/drive.readonly']
+
+# Budget request ke Drive API (per proses)
+DRIVE_API_RATE = float(os.getenv('DRIVE_API_RATE', '20'))  # request per detik
+DRIVE_API_BURST = int(os.getenv('DRIVE_API_BURST', '100'))
+
+# Backoff untuk 403 rate limit / 429 / 5xx
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 32.0
+
+# Drive membatasi 100 request per batch
+BATCH_LIMIT = 100
+
+RATE_LIMIT_REASONS = ('rateLimitExceeded', 'userRateLimitExceeded')
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+
+
+class TokenBucket:
+    """Token bucket thread-safe untuk membatasi laju request"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """Tunggu sampai token tersedia, return lama menunggu (detik)"""
+        # Request lebih besar dari kapasitas (batch) menunggu bucket penuh,
+        # lalu saldo boleh negatif sehingga request berikutnya ikut tertahan
+        needed = min(tokens, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= needed:
+                    self.tokens -= tokens
+                    return waited
+                delay = (needed - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class DriveApiMetrics:
+    """Latency dan pemakaian kuota per jenis call"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = {}
+
+    def record(self, name, seconds, quota=1, retries=0, error=False, throttled=0.0):
+        with self._lock:
+            stat = self.calls.setdefault(name, {
+                'count': 0,
+                'quota_units': 0,
+                'errors': 0,
+                'retries': 0,
+                'total_seconds': 0.0,
+                'max_seconds': 0.0,
+                'throttled_seconds': 0.0
+            })
+            stat['count'] += 1
+            stat['quota_units'] += quota
+            stat['retries'] += retries
+            stat['errors'] += 1 if error else 0
+            stat['total_seconds'] += seconds
+            stat['max_seconds'] = max(stat['max_seconds'], seconds)
+            stat['throttled_seconds'] += throttled
+
+    def snapshot(self):
+        with self._lock:
+            result = {}
+            for name, stat in self.calls.items():
+                result[name] = dict(stat)
+                result[name]['avg_seconds'] = round(stat['total_seconds'] / stat['count'], 4)
+            return result
+
+
+# Dipakai bersama oleh sync worker dan proxy download
+RATE_LIMITER = TokenBucket(DRIVE_API_RATE, DRIVE_API_BURST)
+METRICS = DriveApiMetrics()
+
+
+def backoff_delay(attempt):
+    """Exponential backoff dengan full jitter"""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+def is_retryable_status(status, content=b''):
+    """429/5xx selalu di-retry, 403 hanya jika alasannya rate limit"""
+    status = int(status or 0)
+    if status in RETRYABLE_STATUS:
+        return True
+    if status == 403:
+        if isinstance(content, bytes):
+            content = content.decode('utf-8', errors='ignore')
+        return any(reason in (content or '') for reason in RATE_LIMIT_REASONS)
+    return False
+
+
+def _is_retryable_error(error):
+    resp = getattr(error, 'resp', None)
+    if resp is None:
+        return False
+    return is_retryable_status(getattr(resp, 'status', None), getattr(error, 'content', b''))
+
+
+def call_with_backoff(name, func, quota=1, is_retryable=_is_retryable_error, retry_result=None):
+    """
+    Jalankan func() dengan budget token bucket, retry + backoff, dan catat metrik
+
+    Args:
+        name (str): nama call untuk metrik (mis. 'files.list')
+        func (callable): fungsi yang melakukan request
+        quota (int): jumlah unit kuota yang dipakai (request dalam batch)
+        is_retryable (callable): cek apakah exception boleh di-retry
+        retry_result (callable): cek apakah hasil (mis. response HTTP) perlu di-retry
+    """
+    retries = 0
+    throttled = 0.0
+    start = time.perf_counter()
+    while True:
+        throttled += RATE_LIMITER.acquire(quota)
+        try:
+            result = func()
+        except Exception as e:
+            if retries < MAX_RETRIES and is_retryable(e):
+                delay = backoff_delay(retries)
+                logger.warning(f"[DRIVE] {name} throttled ({str(e)[:100]}), retry in {delay:.1f}s")
+                retries += 1
+                time.sleep(delay)
+                continue
+            METRICS.record(name, time.perf_counter() - start, quota, retries, error=True, throttled=throttled)
+            raise
+
+        if retry_result and retries < MAX_RETRIES and retry_result(result):
+            delay = backoff_delay(retries)
+            logger.warning(f"[DRIVE] {name} throttled, retry in {delay:.1f}s")
+            retries += 1
+            time.sleep(delay)
+            continue
+
+        METRICS.record(name, time.perf_counter() - start, quota, retries, throttled=throttled)
+        return result
+
+
+# === Credentials & discovery (di-cache per proses) ===
+_credentials = {}
+_discovery_doc = None
+_cache_lock = threading.Lock()
+
+
+def get_credentials(creds_path):
+    """Credentials service account, dibuat sekali per file credentials"""
+    with _cache_lock:
+        creds = _credentials.get(creds_path)
+        if creds is None:
+            from google.oauth2 import service_account
+            creds = service_account.Credentials.from_service_account_file(creds_path, scopes=SCOPES)
+            _credentials[creds_path] = creds
+        return creds
+
+
+def get_auth_headers(creds_path):
+    """Header Authorization, token hanya di-refresh jika sudah kadaluarsa"""
+    from google.auth.transport.requests import Request as AuthRequest
+
+    creds = get_credentials(creds_path)
+    with _cache_lock:
+        if not creds.valid:
+            creds.refresh(AuthRequest())
+        return {'Authorization': f'Bearer {creds.token}'}
+
+
+def _get_discovery_doc():
+    global _discovery_doc
+    with _cache_lock:
+        if _discovery_doc is None:
+            from googleapiclient import discovery_cache
+            _discovery_doc = discovery_cache.get_static_doc('drive', 'v3')
+        return _discovery_doc
+
+
+def build_drive_service(creds_path):
+    """Buat client Drive dari discovery document yang sudah di-cache (tanpa request jaringan)"""
+    from googleapiclient.discovery import build, build_from_document
+
+    creds = get_credentials(creds_path)
+    doc = _get_discovery_doc()
+    if doc:
+        return build_from_document(doc, credentials=creds)
+    return build('drive', 'v3', credentials=creds, cache_discovery=False)
+
+
+class DriveClient:
+    """
+    Client Drive bersama untuk sync worker
+
+    - Satu service per thread (httplib2 tidak thread-safe), dibuat lewat service_factory
+    - Semua request lewat call_with_backoff (budget + retry + metrik)
+    """
+
+    def __init__(self, service_factory):
+        self.service_factory = service_factory
+        self._local = threading.local()
+
+    def service(self):
+        service = getattr(self._local, 'service', None)
+        if service is None:
+            service = self.service_factory()
+            if service is None:
+                raise RuntimeError("Google Drive service not available")
+            self._local.service = service
+        return service
+
+    def execute(self, name, request):
+        """Jalankan satu request API (hasil dari service.files().list(...) dsb.)"""
+        return call_with_backoff(name, request.execute)
+
+    def batch_get_metadata(self, file_ids, fields='id, name, mimeType, modifiedTime, size, parents'):
+        """
+        Ambil metadata banyak file lewat endpoint batch Drive (maks 100 per batch)
+
+        Returns:
+            dict: {file_id: metadata} - file yang gagal diambil tidak dimasukkan
+        """
+        service = self.service()
+        results = {}
+        file_ids = list(file_ids)
+
+        for start in range(0, len(file_ids), BATCH_LIMIT):
+            chunk = file_ids[start:start + BATCH_LIMIT]
+            pending = set(chunk)
+
+            for attempt in range(MAX_RETRIES + 1):
+                throttled = set()
+
+                def callback(request_id, response, exception):
+                    if exception is None:
+                        results[request_id] = response
+                        pending.discard(request_id)
+                    elif _is_retryable_error(exception):
+                        throttled.add(request_id)
+                    else:
+                        pending.discard(request_id)
+                        logger.warning(f"[DRIVE] files.get {request_id} failed: {str(exception)[:100]}")
+
+                batch = service.new_batch_http_request(callback=callback)
+                for file_id in pending:
+                    batch.add(
+                        service.files().get(fileId=file_id, fields=fields, supportsAllDrives=True),
+                        request_id=file_id
+                    )
+                call_with_backoff('files.get[batch]', batch.execute, quota=len(pending))
+
+                if not throttled:
+                    break
+                time.sleep(backoff_delay(attempt))
+
+        return results
@@ -0,0 +1,420 @@
+"""
+Drive Download Cache
+Cache disk (LRU, dibatasi ukuran) untuk file Google Drive yang sering diunduh
+"""
+
+import os
+import re
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from .drive_api import call_with_backoff, is_retryable_status
+
+logger = logging.getLogger(__name__)
+
+# Base URL Drive API - bisa diarahkan ke server lokal pengganti (lihat app/drive_stub.py)
+DEFAULT_DRIVE_API_BASE = 'https://www.googleapis.com/drive/v3/files'
+
+CHUNK_SIZE = 64 * 1024
+METADATA_TTL = 60  # detik
+# Jumlah maksimal metadata file di memori (LRU)
+METADATA_MAX_ENTRIES = 1024
+# Batas total menunggu byte pertama dari download yang sedang berjalan, dan
+# batas menunggu byte berikutnya saat streaming (detik)
+FILL_WAIT_TIMEOUT = 30
+FILL_STALL_TIMEOUT = 60
+
+
+class DriveCacheError(Exception):
+    """Gagal mengambil file dari Google Drive"""
+
+    def __init__(self, message, status_code=502):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _drive_get(name, url, **kwargs):
+    """GET ke Drive API lewat budget + retry bersama (403 rate limit / 429 / 5xx)"""
+    # Import saat download pertama: requests + certifi memperlambat boot worker
+    import requests
+
+    def should_retry(response):
+        if response.status_code < 400:
+            return False
+        if is_retryable_status(response.status_code, response.content):
+            response.close()
+            return True
+        return False
+
+    return call_with_backoff(
+        name,
+        lambda: requests.get(url, **kwargs),
+        is_retryable=lambda e: isinstance(e, (requests.ConnectionError, requests.Timeout)),
+        retry_result=should_retry
+    )
+
+
+class _Fill:
+    """Status satu proses download yang sedang berjalan (single-flight)"""
+
+    def __init__(self, part_path, final_path):
+        self.part_path = part_path
+        self.final_path = final_path
+        self.cond = threading.Condition()
+        self.written = 0
+        self.done = False
+        self.error = None
+
+
+class DriveDownloadCache:
+    """
+    Cache file Drive di disk, key = file ID + modifiedTime
+
+    - Ukuran total dibatasi max_bytes, entry tertua (mtime) dihapus lebih dulu
+    - Request bersamaan untuk file yang belum ada di cache hanya memicu
+      satu download ke Drive; request lain membaca (tail) file .part yang sama
+    - Cache hit dilayani langsung dari disk lewat send_file; entry yang sedang
+      dikirim di-pin (lihat release()) sehingga tidak dihapus evict()
+    """
+
+    def __init__(self, cache_dir, max_bytes, api_base=DEFAULT_DRIVE_API_BASE):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.api_base = api_base.rstrip('/')
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._metadata = OrderedDict()  # file_id -> (waktu ambil, metadata)
+        self._pins = {}  # path entry -> jumlah request yang sedang mengirim
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    # === Key & path ===
+    def _entry_name(self, file_id, modified_time):
+        safe_id = re.sub(r'[^A-Za-z0-9_-]', '_', file_id)
+        version = hashlib.sha1((modified_time or '').encode('utf-8')).hexdigest()[:16]
+        return f"{safe_id}.{version}"
+
+    def _entry_path(self, file_id, modified_time):
+        return os.path.join(self.cache_dir, self._entry_name(file_id, modified_time) + '.bin')
+
+    # === Metadata ===
+    def get_metadata(self, file_id, headers=None):
+        """Ambil metadata file (modifiedTime, mimeType, size) dengan cache singkat"""
+        now = time.time()
+        with self._lock:
+            cached = self._metadata.get(file_id)
+            if cached and now - cached[0] < METADATA_TTL:
+                self._metadata.move_to_end(file_id)
+                return cached[1]
+
+        response = _drive_get(
+            'files.get',
+            f"{self.api_base}/{file_id}",
+            params={'fields': 'id,name,mimeType,modifiedTime,size', 'supportsAllDrives': 'true'},
+            headers=headers or {},
+            timeout=15
+        )
+        if response.status_code != 200:
+            raise DriveCacheError(
+                f"Failed to get metadata (status {response.status_code})",
+                status_code=404 if response.status_code == 404 else 502
+            )
+
+        meta = response.json()
+        with self._lock:
+            self._metadata[file_id] = (now, meta)
+            self._metadata.move_to_end(file_id)
+            while len(self._metadata) > METADATA_MAX_ENTRIES:
+                self._metadata.popitem(last=False)
+        return meta
+
+    # === Lookup & pin ===
+    def lookup(self, file_id, modified_time):
+        """Return path file di cache jika ada (dan tandai sebagai baru dipakai)"""
+        path = self._entry_path(file_id, modified_time)
+        try:
+            os.utime(path, None)
+        except OSError:
+            return None
+        return path
+
+    def _pin(self, path):
+        # Dipanggil dengan self._lock dipegang
+        self._pins[path] = self._pins.get(path, 0) + 1
+
+    def release(self, path):
+        """Lepas pin entry setelah selesai dikirim (pasangan dari hasil 'hit' open())"""
+        with self._lock:
+            count = self._pins.get(path, 0) - 1
+            if count > 0:
+                self._pins[path] = count
+            else:
+                self._pins.pop(path, None)
+
+    def open(self, file_id, modified_time, headers=None, size=None):
+        """
+        Ambil file dari cache atau Drive
+
+        Returns:
+            tuple: ('hit', path) jika file sudah di cache - path di-pin, panggil
+                   release(path) setelah response selesai dikirim,
+                   ('stream', generator) jika file sedang/baru diunduh,
+                   ('bypass', generator) jika file lebih besar dari kapasitas cache
+        """
+        with self._lock:
+            path = self.lookup(file_id, modified_time)
+            if path:
+                self._pin(path)
+                return 'hit', path
+
+        if size is not None and int(size) > self.max_bytes:
+            return 'bypass', self._passthrough(file_id, headers)
+
+        final_path = self._entry_path(file_id, modified_time)
+        try:
+            fill = self._get_or_start_fill(file_id, modified_time, headers)
+            if fill is None:
+                # Download lain baru saja selesai (entry sudah di-pin)
+                return 'hit', final_path
+
+            # Tunggu byte pertama supaya error dari Drive bisa dikembalikan sebagai status HTTP
+            deadline = time.monotonic() + FILL_WAIT_TIMEOUT
+            with fill.cond:
+                while fill.written == 0 and not fill.done:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise DriveCacheError("Timed out waiting for Drive download", status_code=504)
+                    fill.cond.wait(timeout=remaining)
+            if fill.error and fill.written == 0:
+                raise fill.error
+            return 'stream', self._tail(fill)
+        except Exception:
+            self.release(final_path)
+            raise
+
+    # === Single-flight fill ===
+    def _get_or_start_fill(self, file_id, modified_time, headers):
+        """
+        Download yang sedang berjalan untuk entry ini, atau mulai yang baru
+
+        Entry final langsung di-pin untuk pemanggil (sebelum download selesai),
+        supaya evict() setelah download tidak menghapusnya sebelum sempat dibaca
+        """
+        key = self._entry_name(file_id, modified_time)
+        final_path = self._entry_path(file_id, modified_time)
+        with self._lock:
+            self._pin(final_path)
+            fill = self._inflight.get(key)
+            if fill:
+                return fill
+
+            if os.path.exists(final_path):
+                return None
+
+            part_path = os.path.join(self.cache_dir, f"{key}.{os.getpid()}.part")
+            open(part_path, 'wb').close()
+            fill = _Fill(part_path, final_path)
+            self._inflight[key] = fill
+
+        thread = threading.Thread(
+            target=self._run_fill,
+            args=(key, fill, file_id, modified_time, headers),
+            daemon=True
+        )
+        thread.start()
+        return fill
+
+    def _run_fill(self, key, fill, file_id, modified_time, headers):
+        """Download file dari Drive ke .part, lalu rename atomik ke entry cache"""
+        try:
+            with _drive_get(
+                'files.get[media]',
+                f"{self.api_base}/{file_id}",
+                params={'alt': 'media', 'supportsAllDrives': 'true'},
+                headers=headers or {},
+                stream=True,
+                timeout=60
+            ) as response:
+                if response.status_code != 200:
+                    raise DriveCacheError(f"Failed to download (status {response.status_code})")
+
+                with open(fill.part_path, 'r+b') as f:
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        if not chunk:
+                            continue
+                        f.write(chunk)
+                        f.flush()
+                        with fill.cond:
+                            fill.written += len(chunk)
+                            fill.cond.notify_all()
+
+            os.replace(fill.part_path, fill.final_path)
+            self._remove_old_versions(file_id, fill.final_path)
+            logger.info(f"[CACHE] Stored {file_id} ({fill.written} bytes)")
+
+        except Exception as e:
+            logger.error(f"[CACHE] Fill failed for {file_id}: {str(e)}")
+            fill.error = e if isinstance(e, DriveCacheError) else DriveCacheError(str(e))
+            try:
+                os.remove(fill.part_path)
+            except OSError:
+                pass
+
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            with fill.cond:
+                fill.done = True
+                fill.cond.notify_all()
+
+        if not fill.error:
+            self.evict()
+
+    def _tail(self, fill):
+        """
+        Baca file .part mengikuti progres download (untuk semua request yang menunggu)
+
+        Pin entry final dari _get_or_start_fill dilepas saat generator selesai
+        """
+        # Handle tetap valid walaupun file di-rename setelah dibuka (POSIX)
+        try:
+            f = open(fill.part_path, 'rb')
+        except FileNotFoundError:
+            if fill.error:
+                raise fill.error
+            f = open(fill.final_path, 'rb')
+
+        def generate():
+            position = 0
+            try:
+                while True:
+                    deadline = time.monotonic() + FILL_STALL_TIMEOUT
+                    with fill.cond:
+                        while fill.written <= position and not fill.done:
+                            remaining = deadline - time.monotonic()
+                            if remaining <= 0:
+                                raise DriveCacheError("Drive download stalled", status_code=504)
+                            fill.cond.wait(timeout=remaining)
+                        available = fill.written
+                        done = fill.done
+
+                    if fill.error:
+                        raise fill.error
+
+                    while position < available:
+                        chunk = f.read(min(CHUNK_SIZE, available - position))
+                        if not chunk:
+                            break
+                        position += len(chunk)
+                        yield chunk
+
+                    if done and position >= available:
+                        break
+            finally:
+                f.close()
+                self.release(fill.final_path)
+
+        return generate()
+
+    def _passthrough(self, file_id, headers):
+        """Stream langsung dari Drive tanpa menyimpan ke cache"""
+        response = _drive_get(
+            'files.get[media]',
+            f"{self.api_base}/{file_id}",
+            params={'alt': 'media', 'supportsAllDrives': 'true'},
+            headers=headers or {},
+            stream=True,
+            timeout=60
+        )
+        if response.status_code != 200:
+            response.close()
+            raise DriveCacheError(f"Failed to download (status {response.status_code})")
+
+        def generate():
+            with response:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    if chunk:
+                        yield chunk
+
+        return generate()
+
+    # === Eviction ===
+    def _remove_old_versions(self, file_id, keep_path):
+        """Hapus versi lama (modifiedTime berbeda) dari file yang sama"""
+        prefix = re.sub(r'[^A-Za-z0-9_-]', '_', file_id) + '.'
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.startswith(prefix) and name.endswith('.bin') and path != keep_path:
+                with self._lock:
+                    if path in self._pins:
+                        continue
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+
+    def evict(self):
+        """
+        Hapus entry yang paling lama tidak dipakai sampai total ukuran <= max_bytes
+
+        Entry yang sedang dikirim (di-pin) dilewati
+        """
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.bin'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+
+        entries.sort()
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            with self._lock:
+                if path in self._pins:
+                    continue
+                try:
+                    os.remove(path)
+                    total -= size
+                    removed += 1
+                except OSError:
+                    pass
+
+        if removed:
+            logger.info(f"[CACHE] Evicted {removed} file(s), size now {total} bytes")
+        return removed
+
+    def get_stats(self):
+        """Statistik cache untuk monitoring"""
+        files = [n for n in os.listdir(self.cache_dir) if n.endswith('.bin')]
+        total = sum(
+            os.path.getsize(os.path.join(self.cache_dir, n)) for n in files
+        )
+        return {
+            'files': len(files),
+            'size_bytes': total,
+            'max_bytes': self.max_bytes,
+            'inflight': len(self._inflight),
+            'pinned': len(self._pins)
+        }
+
+
+def get_drive_cache(app):
+    """Ambil instance cache bersama untuk aplikasi (dibuat sekali per proses)"""
+    cache = app.extensions.get('drive_cache')
+    if cache is None:
+        cache = DriveDownloadCache(
+            app.config['DRIVE_CACHE_DIR'],
+            app.config['DRIVE_CACHE_MAX_BYTES'],
+            app.config['DRIVE_API_BASE']
+        )
+        app.extensions['drive_cache'] = cache
+    return cache
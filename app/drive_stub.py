@@ -0,0 +1,98 @@
+"""
+Drive Stub Server
+Server HTTP lokal pengganti Google Drive API untuk testing tanpa internet
+
+Melayani file dari satu folder lokal dengan endpoint yang sama seperti Drive v3:
+    GET /files/<file_id>?fields=...   -> metadata JSON
+    GET /files/<file_id>?alt=media    -> isi file
+
+Jalankan:
+    python -m app.drive_stub /path/ke/folder 8765
+lalu set DRIVE_API_BASE=http://127.0.0.1:8765/files
+"""
+
+import os
+import sys
+import json
+import mimetypes
+import threading
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, unquote
+
+
+def _make_handler(root_dir):
+    class DriveStubHandler(BaseHTTPRequestHandler):
+        # Hitung request per file untuk verifikasi single-flight di test
+        request_counts = {}
+
+        def do_GET(self):
+            parsed = urlparse(self.path)
+            if not parsed.path.startswith('/files/'):
+                self.send_error(404)
+                return
+
+            file_id = unquote(parsed.path[len('/files/'):])
+            path = os.path.join(root_dir, os.path.basename(file_id))
+            if not os.path.isfile(path):
+                self.send_error(404)
+                return
+
+            params = parse_qs(parsed.query)
+            mime_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+            if params.get('alt') == ['media']:
+                key = ('media', file_id)
+                self.request_counts[key] = self.request_counts.get(key, 0) + 1
+                self.send_response(200)
+                self.send_header('Content-Type', mime_type)
+                self.send_header('Content-Length', str(os.path.getsize(path)))
+                self.end_headers()
+                with open(path, 'rb') as f:
+                    while True:
+                        chunk = f.read(64 * 1024)
+                        if not chunk:
+                            break
+                        self.wfile.write(chunk)
+                return
+
+            st = os.stat(path)
+            body = json.dumps({
+                'id': file_id,
+                'name': os.path.basename(path),
+                'mimeType': mime_type,
+                'modifiedTime': datetime.fromtimestamp(st.st_mtime, timezone.utc).isoformat(),
+                'size': str(st.st_size)
+            }).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return DriveStubHandler
+
+
+def start_stub_server(root_dir, port=0):
+    """
+    Jalankan stub server di background thread
+
+    Returns:
+        tuple: (server, api_base) - panggil server.shutdown() setelah selesai
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), _make_handler(root_dir))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    api_base = f"http://127.0.0.1:{server.server_address[1]}/files"
+    return server, api_base
+
+
+if __name__ == '__main__':
+    folder = sys.argv[1] if len(sys.argv) > 1 else '.'
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 8765
+    server = ThreadingHTTPServer(('127.0.0.1', port), _make_handler(folder))
+    print(f"Drive stub serving {folder} at http://127.0.0.1:{port}/files")
+    server.serve_forever()
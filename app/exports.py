@@ -0,0 +1,108 @@
+"""
+Export Peserta
+CSV dibuat bertahap (streaming) dari cursor database, opsional dikompres gzip,
+sehingga memori tetap konstan berapapun jumlah peserta
+"""
+
+import csv
+import zlib
+from io import StringIO
+from .models import db, Peserta
+from .admin_listing import apply_search, apply_status
+
+# Jumlah row yang diambil per fetch dari database
+EXPORT_YIELD_PER = 1000
+# Jumlah row CSV per chunk yang dikirim ke client
+CSV_CHUNK_ROWS = 500
+
+PESERTA_CSV_HEADER = [
+    'No',
+    'Nama',
+    'WhatsApp',
+    'Email',
+    'Alamat',
+    'Nama Bengkel',
+    'Alamat Bengkel',
+    'Status Pekerjaan',
+    'Batch',
+    'Status Pembayaran',
+    'Akses Workshop',
+    'Tanggal Daftar'
+]
+
+PESERTA_CSV_COLUMNS = (
+    Peserta.nama,
+    Peserta.whatsapp,
+    Peserta.email,
+    Peserta.alamat,
+    Peserta.nama_bengkel,
+    Peserta.alamat_bengkel,
+    Peserta.status_pekerjaan,
+    Peserta.batch,
+    Peserta.status_pembayaran,
+    Peserta.akses_workshop,
+    Peserta.tanggal_daftar
+)
+
+
+def peserta_export_query(statuses=None, search=''):
+    """Query kolom peserta (tanpa objek ORM), diambil bertahap dengan yield_per"""
+    query = db.session.query(*PESERTA_CSV_COLUMNS)
+    query = apply_status(apply_search(query, search), statuses)
+    return query.order_by(Peserta.id).execution_options(yield_per=EXPORT_YIELD_PER)
+
+
+def peserta_csv_row(idx, row):
+    return [
+        idx,
+        row.nama,
+        row.whatsapp,
+        row.email or '-',
+        row.alamat or '-',
+        row.nama_bengkel or '-',
+        row.alamat_bengkel or '-',
+        row.status_pekerjaan or '-',
+        row.batch,
+        row.status_pembayaran,
+        'Ya' if row.akses_workshop else 'Tidak',
+        row.tanggal_daftar.strftime('%d-%m-%Y %H:%M') if row.tanggal_daftar else '-'
+    ]
+
+
+def iter_peserta_csv(rows, chunk_rows=CSV_CHUNK_ROWS):
+    """
+    Generator CSV: header dikirim sendiri sebelum query dijalankan (first byte
+    langsung terkirim), lalu potongan berisi chunk_rows baris
+    """
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(PESERTA_CSV_HEADER)
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+
+    for idx, row in enumerate(rows, 1):
+        writer.writerow(peserta_csv_row(idx, row))
+        if idx % chunk_rows == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def gzip_stream(chunks, level=6):
+    """
+    Kompres stream teks menjadi gzip secara bertahap
+
+    Chunk pertama (header CSV) di-flush langsung supaya tidak tertahan di buffer zlib
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for index, chunk in enumerate(chunks):
+        data = compressor.compress(chunk.encode('utf-8'))
+        if index == 0:
+            data += compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,142 @@
+"""
+Import Profile
+Laporan waktu import cold start (python -X importtime) untuk proses worker baru,
+dipakai untuk memastikan dependency berat tidak ikut ter-import saat boot.
+
+    python -m app.import_profile                 # import app.routes + create_app()
+    python -m app.import_profile --runs 5 --top 30
+"""
+
+import os
+import sys
+import re
+import subprocess
+
+# Statement yang di-profile: sama dengan yang dijalankan WSGI worker saat start
+DEFAULT_STATEMENT = 'import app.routes; from app import create_app; create_app()'
+
+# Modul yang seharusnya baru di-import saat pertama dipakai, bukan saat boot
+DEFERRED_MODULES = ['bs4', 'requests', 'googleapiclient', 'PIL']
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+# Waktu wall-clock statement (import + create_app, termasuk cek skema database)
+TIMED_PROGRAM = (
+    "import time as _time\n"
+    "_start = _time.perf_counter()\n"
+    "{statement}\n"
+    "print(f'boot_ms={{(_time.perf_counter() - _start) * 1000:.3f}}')\n"
+)
+
+
+def parse_importtime(stderr):
+    """
+    Returns:
+        list: dict {'module', 'self_us', 'cumulative_us', 'depth'} dalam urutan output
+    """
+    entries = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            entries.append({
+                'module': match.group(4),
+                'self_us': int(match.group(1)),
+                'cumulative_us': int(match.group(2)),
+                'depth': len(match.group(3)) // 2
+            })
+    return entries
+
+
+def profile_once(statement=DEFAULT_STATEMENT, cwd=None):
+    """
+    Jalankan statement di interpreter baru (tanpa cache modul dari proses ini)
+
+    Returns:
+        tuple: (entries importtime, waktu boot ms)
+    """
+    cwd = cwd or os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', TIMED_PROGRAM.format(statement=statement)],
+        cwd=cwd, capture_output=True, text=True,
+        env={**os.environ, 'SCHEDULER_ENABLED': 'False'}
+    )
+    if result.returncode != 0:
+        errors = [line for line in result.stderr.splitlines() if not line.startswith('import time:')]
+        raise RuntimeError(errors[-1] if errors else 'profile failed')
+    boot_ms = float(re.search(r'boot_ms=([\d.]+)', result.stdout).group(1))
+    return parse_importtime(result.stderr), boot_ms
+
+
+def summarize(entries, boot_ms, top=20):
+    """
+    Returns:
+        dict: {'total_ms', 'boot_ms', 'app_modules', 'top_cumulative', 'deferred_loaded'}
+    """
+    roots = [entry for entry in entries if entry['depth'] == 0]
+    total_us = sum(entry['cumulative_us'] for entry in roots)
+    loaded = {entry['module'] for entry in entries}
+
+    app_modules = sorted(
+        (entry for entry in entries if entry['module'] == 'app' or entry['module'].startswith('app.')),
+        key=lambda entry: entry['cumulative_us'], reverse=True
+    )
+    top_cumulative = sorted(roots, key=lambda entry: entry['cumulative_us'], reverse=True)[:top]
+    deferred_loaded = [
+        name for name in DEFERRED_MODULES
+        if any(module == name or module.startswith(f"{name}.") for module in loaded)
+    ]
+    return {
+        'total_ms': total_us / 1000,
+        'boot_ms': boot_ms,
+        'app_modules': app_modules,
+        'top_cumulative': top_cumulative,
+        'deferred_loaded': deferred_loaded
+    }
+
+
+def profile(statement=DEFAULT_STATEMENT, runs=3, top=20):
+    """Median beberapa run (run pertama juga kena cold cache .pyc/disk)"""
+    summaries = sorted(
+        (summarize(*profile_once(statement), top=top) for _ in range(runs)),
+        key=lambda summary: summary['total_ms']
+    )
+    median = summaries[len(summaries) // 2]
+    median['runs_ms'] = sorted(summary['total_ms'] for summary in summaries)
+    median['boot_ms'] = sorted(summary['boot_ms'] for summary in summaries)[len(summaries) // 2]
+    return median
+
+
+def format_report(summary):
+    lines = [
+        f"Total import time (median): {summary['total_ms']:.1f} ms "
+        f"(runs: {', '.join(f'{ms:.1f}' for ms in summary['runs_ms'])})",
+        f"Boot wall time (median): {summary['boot_ms']:.1f} ms",
+        '',
+        'Top-level imports (cumulative ms):'
+    ]
+    lines.extend(f"  {entry['cumulative_us'] / 1000:8.1f}  {entry['module']}" for entry in summary['top_cumulative'])
+    lines.extend(['', 'App modules (cumulative / self ms):'])
+    lines.extend(
+        f"  {entry['cumulative_us'] / 1000:8.1f} / {entry['self_us'] / 1000:6.1f}  {entry['module']}"
+        for entry in summary['app_modules']
+    )
+    lines.append('')
+    if summary['deferred_loaded']:
+        lines.append(f"WARNING: loaded at boot, should be lazy: {', '.join(summary['deferred_loaded'])}")
+    else:
+        lines.append(f"OK: not loaded at boot: {', '.join(DEFERRED_MODULES)}")
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Profil waktu import cold start')
+    parser.add_argument('--statement', default=DEFAULT_STATEMENT, help='kode yang di-profile')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--top', type=int, default=20)
+    args = parser.parse_args()
+
+    summary = profile(args.statement, args.runs, args.top)
+    print(format_report(summary))
+    sys.exit(1 if summary['deferred_loaded'] else 0)
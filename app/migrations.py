@@ -0,0 +1,342 @@
+"""
+Schema Migrations
+Migrasi skema ringan untuk users.db: db.create_all() hanya membuat tabel baru,
+tidak menambah index/kolom di tabel yang sudah ada.
+
+create_app() tidak lagi menjalankan create_all() setiap proses start: sidik
+skema (model + versi migrasi) disimpan di PRAGMA user_version, dan
+ensure_schema() hanya bekerja jika sidiknya berubah (deploy baru / database baru)
+"""
+
+import os
+import sys
+import zlib
+import logging
+from datetime import datetime
+from contextlib import contextmanager
+from sqlalchemy import select, func, or_, tuple_
+from sqlalchemy.exc import OperationalError
+from .models import Peserta, Batch, Jadwal
+from .admin_listing import PAYMENT_STATUSES
+
+logger = logging.getLogger(__name__)
+
+# False = boot tidak pernah mengubah skema, jalankan python -m app.migrations saat deploy
+DB_AUTO_MIGRATE = os.getenv('DB_AUTO_MIGRATE', 'True').lower() == 'true'
+# Batas tunggu lock migrasi (ms): worker lain yang boot bersamaan menunggu migrasi selesai
+MIGRATION_LOCK_TIMEOUT = int(os.getenv('MIGRATION_LOCK_TIMEOUT', '60000'))
+
+MIGRATIONS_TABLE_SQL = (
+    "CREATE TABLE IF NOT EXISTS schema_migrations ("
+    "version INTEGER PRIMARY KEY, "
+    "deskripsi VARCHAR(255) NOT NULL, "
+    "tanggal_dijalankan VARCHAR(40) NOT NULL)"
+)
+
+def column_exists(conn, table, column):
+    return any(row[1] == column for row in conn.exec_driver_sql(f"PRAGMA table_info({table})"))
+
+
+def add_peserta_batch_id(conn):
+    # Database baru sudah punya kolom ini dari create_all()
+    if not column_exists(conn, 'peserta', 'batch_id'):
+        conn.exec_driver_sql("ALTER TABLE peserta ADD COLUMN batch_id INTEGER REFERENCES batch (id)")
+
+
+# (versi, deskripsi, langkah) - langkah berupa string SQL atau callable(conn).
+# Versi hanya boleh bertambah; migrasi yang sudah dirilis jangan diubah.
+MIGRATIONS = [
+    (1, 'Index admin peserta dan jadwal', [
+        "CREATE INDEX IF NOT EXISTS ix_peserta_status_tanggal ON peserta (status_pembayaran, tanggal_daftar)",
+        "CREATE INDEX IF NOT EXISTS ix_peserta_batch ON peserta (batch)",
+        "CREATE INDEX IF NOT EXISTS ix_jadwal_batch_hari_waktu ON jadwal (batch_id, hari, waktu_mulai)",
+        "ANALYZE"
+    ]),
+    (2, 'Foreign key peserta.batch_id dari nama batch', [
+        add_peserta_batch_id,
+        "CREATE INDEX IF NOT EXISTS ix_peserta_batch_id ON peserta (batch_id)",
+        # Backfill: cocokkan nama batch lama dengan Batch.nama
+        "UPDATE peserta SET batch_id = (SELECT batch.id FROM batch WHERE batch.nama = peserta.batch) "
+        "WHERE batch_id IS NULL",
+        "ANALYZE"
+    ]),
+    (3, 'Index urutan daftar peserta admin', [
+        "CREATE INDEX IF NOT EXISTS ix_peserta_status_nama ON peserta (status_pembayaran, nama)",
+        "CREATE INDEX IF NOT EXISTS ix_peserta_tanggal_id ON peserta (tanggal_daftar, id)",
+        "CREATE INDEX IF NOT EXISTS ix_peserta_nama_id ON peserta (nama, id)",
+        "ANALYZE"
+    ]),
+]
+
+
+def get_applied_versions(conn):
+    conn.exec_driver_sql(MIGRATIONS_TABLE_SQL)
+    return {row[0] for row in conn.exec_driver_sql("SELECT version FROM schema_migrations")}
+
+
+@contextmanager
+def migration_lock(engine, timeout=MIGRATION_LOCK_TIMEOUT):
+    """
+    Transaksi BEGIN IMMEDIATE: write lock SQLite diambil di awal, sehingga
+    beberapa worker yang boot bersamaan menjalankan migrasi bergantian
+    (yang lain menunggu sampai timeout ms, lalu membaca ulang status migrasi)
+    """
+    with engine.connect() as conn:
+        busy_timeout = conn.exec_driver_sql("PRAGMA busy_timeout").scalar()
+        conn.exec_driver_sql(f"PRAGMA busy_timeout = {int(timeout)}")
+        try:
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except Exception:
+                conn.rollback()
+                raise
+            conn.commit()
+        finally:
+            conn.exec_driver_sql(f"PRAGMA busy_timeout = {int(busy_timeout)}")
+
+
+def _apply_pending(conn):
+    """Jalankan versi yang belum tercatat; status dibaca di transaksi (ber-lock) pemanggil"""
+    applied = get_applied_versions(conn)
+    executed = []
+    for version, deskripsi, steps in MIGRATIONS:
+        if version in applied:
+            continue
+        for step in steps:
+            if callable(step):
+                step(conn)
+            else:
+                conn.exec_driver_sql(step)
+        conn.exec_driver_sql(
+            "INSERT INTO schema_migrations (version, deskripsi, tanggal_dijalankan) VALUES (?, ?, ?)",
+            (version, deskripsi, datetime.utcnow().isoformat())
+        )
+        executed.append(version)
+        logger.info(f"Migration {version} applied: {deskripsi}")
+    return executed
+
+
+def run_migrations(db):
+    """
+    Jalankan migrasi yang belum pernah dijalankan (di bawah migration_lock)
+    Dipanggil setelah db.create_all()
+
+    Returns:
+        list: versi yang baru dijalankan
+    """
+    with db.engine.connect() as conn:
+        pending = {version for version, _, _ in MIGRATIONS} - get_applied_versions(conn)
+        conn.commit()
+    if not pending:
+        return []
+
+    with migration_lock(db.engine) as conn:
+        return _apply_pending(conn)
+
+
+# === Sidik skema ===
+def schema_fingerprint(db):
+    """
+    Sidik tabel/kolom/index model + versi migrasi terakhir
+
+    Returns:
+        int: 1..2^31-1 (muat di PRAGMA user_version, 0 = database belum pernah disiapkan)
+    """
+    parts = [f"migrations:{max(version for version, _, _ in MIGRATIONS)}"]
+    for table in db.metadata.sorted_tables:
+        parts.append(f"table:{table.name}")
+        parts.extend(f"column:{column.name}:{column.type}" for column in table.columns)
+        parts.extend(sorted(f"index:{index.name}" for index in table.indexes))
+    return zlib.crc32('\n'.join(parts).encode('utf-8')) % 0x7fffffff + 1
+
+
+def get_schema_version(conn):
+    return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def ensure_schema(db, force=False):
+    """
+    create_all() + run_migrations() hanya jika sidik skema di database berbeda
+
+    Boot normal cukup satu PRAGMA user_version (tanpa PRAGMA table_info per tabel).
+    create_all, migrasi dan user_version berjalan dalam satu transaksi
+    migration_lock; worker yang menunggu lock membaca ulang user_version dan
+    tidak mengulang pekerjaan yang sudah selesai.
+
+    Returns:
+        bool: True jika skema baru saja disiapkan
+    """
+    expected = schema_fingerprint(db)
+    with db.engine.connect() as conn:
+        current = get_schema_version(conn)
+    if current == expected and not force:
+        return False
+
+    with migration_lock(db.engine) as conn:
+        current = get_schema_version(conn)
+        if current == expected and not force:
+            return False
+        db.metadata.create_all(bind=conn)
+        executed = _apply_pending(conn)
+        conn.exec_driver_sql(f"PRAGMA user_version = {int(expected)}")
+    logger.info(f"Schema ready (version {current} -> {expected}, migrations {executed or 'none'})")
+    return True
+
+
+def check_schema(db):
+    """Boot tanpa DB_AUTO_MIGRATE: hanya peringatkan jika skema belum di-upgrade"""
+    with db.engine.connect() as conn:
+        current = get_schema_version(conn)
+    if current != schema_fingerprint(db):
+        logger.warning("Database schema is outdated, run: python -m app.migrations")
+        return False
+    return True
+
+
+# === EXPLAIN QUERY PLAN untuk query halaman admin ===
+ADMIN_QUERIES = {
+    'admin_dashboard.belum_bayar': lambda: (
+        select(func.count()).select_from(Peserta).where(Peserta.status_pembayaran == 'Belum')
+    ),
+    'kelola_peserta.status': lambda: (
+        select(Peserta).where(Peserta.status_pembayaran == 'Lunas')
+        .order_by(Peserta.tanggal_daftar.desc(), Peserta.id.desc())
+    ),
+    'kelola_peserta.status_keyset': lambda: (
+        select(Peserta).where(
+            Peserta.status_pembayaran == 'Lunas',
+            tuple_(Peserta.tanggal_daftar, Peserta.id) < (datetime(2025, 1, 1), 100)
+        ).order_by(Peserta.tanggal_daftar.desc(), Peserta.id.desc()).limit(51)
+    ),
+    'kelola_peserta.counts': lambda: (
+        select(Peserta.status_pembayaran, func.count(Peserta.id)).group_by(Peserta.status_pembayaran)
+    ),
+    'kelola_peserta.status_search': lambda: (
+        select(Peserta).where(
+            Peserta.status_pembayaran == 'Menunggu',
+            or_(Peserta.nama.ilike('%budi%'), Peserta.whatsapp.ilike('%budi%'))
+        ).order_by(Peserta.tanggal_daftar.desc(), Peserta.id.desc())
+    ),
+    'kelola_peserta.semua': lambda: (
+        select(Peserta).order_by(Peserta.tanggal_daftar.desc(), Peserta.id.desc()).limit(51)
+    ),
+    'kelola_peserta.semua_keyset': lambda: (
+        select(Peserta).where(tuple_(Peserta.tanggal_daftar, Peserta.id) < (datetime(2025, 1, 1), 100))
+        .order_by(Peserta.tanggal_daftar.desc(), Peserta.id.desc()).limit(51)
+    ),
+    'kelola_peserta.nama': lambda: (
+        select(Peserta).order_by(Peserta.nama.asc(), Peserta.id.asc()).limit(51)
+    ),
+    'kelola_peserta.nama_keyset': lambda: (
+        select(Peserta).where(tuple_(Peserta.nama, Peserta.id) < ('Budi', 100))
+        .order_by(Peserta.nama.desc(), Peserta.id.desc()).limit(51)
+    ),
+    'kelola_peserta.status_nama': lambda: (
+        select(Peserta).where(Peserta.status_pembayaran == 'Lunas')
+        .order_by(Peserta.nama.asc(), Peserta.id.asc()).limit(51)
+    ),
+    'verifikasi_pembayaran.semua': lambda: (
+        select(Peserta).where(Peserta.status_pembayaran.in_(PAYMENT_STATUSES))
+        .order_by(Peserta.tanggal_daftar.desc(), Peserta.id.desc()).limit(51)
+    ),
+    'verifikasi_pembayaran.nama': lambda: (
+        select(Peserta).where(Peserta.status_pembayaran.in_(PAYMENT_STATUSES))
+        .order_by(Peserta.nama.desc(), Peserta.id.desc()).limit(51)
+    ),
+    'toggle_akses_grup.peserta': lambda: (
+        select(Peserta.id).where(Peserta.batch_id == 1)
+    ),
+    'kelola_peserta.joined_grup': lambda: (
+        select(Peserta, Batch).outerjoin(Batch, Peserta.batch_id == Batch.id)
+        .where(Peserta.status_pembayaran == 'Lunas')
+        .order_by(Peserta.tanggal_daftar.desc(), Peserta.id.desc()).limit(51)
+    ),
+    'dashboard.jadwal': lambda: (
+        select(Jadwal).where(Jadwal.batch_id == 1)
+    ),
+}
+
+# Agregat atas semua peserta: boleh membaca seluruh index, asal covering (tanpa baca tabel)
+AGGREGATE_QUERIES = {'kelola_peserta.counts'}
+
+
+def explain_query(conn, stmt):
+    """EXPLAIN QUERY PLAN untuk statement SQLAlchemy, return (list detail, ada LIMIT)"""
+    compiled = stmt.compile(dialect=conn.dialect, compile_kwargs={'literal_binds': True})
+    rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}").fetchall()
+    return [row[-1] for row in rows], ' LIMIT ' in str(compiled)
+
+
+def scan_problem(detail, limited=False, aggregate=False):
+    """
+    Alasan satu langkah plan dianggap gagal, None jika aman
+
+    - "USE TEMP B-TREE" = sort/group di memori, urutan tidak datang dari index
+    - "SCAN" = tidak ada constraint index (beda dengan "SEARCH ... (col=?)");
+      hanya boleh untuk query ber-LIMIT yang berjalan urut di index (berhenti
+      setelah LIMIT row) atau agregat AGGREGATE_QUERIES lewat covering index
+    """
+    if 'USE TEMP B-TREE' in detail:
+        return 'sort without index'
+    if not detail.startswith('SCAN'):
+        return None
+    if limited and 'INDEX' in detail:
+        return None
+    if aggregate and 'COVERING INDEX' in detail:
+        return None
+    return 'unconstrained scan'
+
+
+def has_statistics(conn, table='peserta'):
+    """True jika ANALYZE sudah mengisi statistik tabel (tabel kosong tidak punya statistik)"""
+    try:
+        return conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_stat1 WHERE tbl = ? LIMIT 1", (table,)
+        ).first() is not None
+    except OperationalError:
+        return False
+
+
+def explain_admin_queries(db):
+    """
+    Cek rencana eksekusi setiap query admin
+
+    Returns:
+        list: [{'name', 'plan', 'problems', 'full_scan'}]
+    """
+    results = []
+    with db.engine.connect() as conn:
+        for name, build in ADMIN_QUERIES.items():
+            plan, limited = explain_query(conn, build())
+            problems = [
+                f"{reason}: {detail}" for detail in plan
+                for reason in [scan_problem(detail, limited, name in AGGREGATE_QUERIES)] if reason
+            ]
+            if problems:
+                logger.warning(f"Query {name} is not served by an index: {problems}")
+            results.append({'name': name, 'plan': plan, 'problems': problems, 'full_scan': bool(problems)})
+    return results
+
+
+if __name__ == '__main__':
+    # python -m app.migrations : siapkan skema + migrasi lalu tampilkan query plan admin
+    from . import create_app
+    from .models import db
+
+    app = create_app()
+    with app.app_context():
+        ensure_schema(db, force=True)
+        results = explain_admin_queries(db)
+        for result in results:
+            status = 'FULL SCAN' if result['full_scan'] else 'ok'
+            print(f"[{status}] {result['name']}")
+            for detail in result['plan']:
+                print(f"    {detail}")
+        with db.engine.connect() as conn:
+            analyzed = has_statistics(conn)
+    if not analyzed:
+        # Tanpa statistik SQLite memakai estimasi default, plan belum mewakili data produksi
+        print("\nNo table statistics yet (empty database): plans are not checked")
+        sys.exit(0)
+    sys.exit(1 if any(result['full_scan'] for result in results) else 0)
@@ -1,11 +1,21 @@
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
+from .passwords import hash_password, verify_password, needs_rehash
 from datetime import datetime
 
 db = SQLAlchemy()
 
 class Peserta(db.Model):
     __tablename__ = 'peserta'
+    __table_args__ = (
+        # Filter status di halaman admin, urut tanggal daftar
+        db.Index('ix_peserta_status_tanggal', 'status_pembayaran', 'tanggal_daftar'),
+        db.Index('ix_peserta_status_nama', 'status_pembayaran', 'nama'),
+        # Semua status (tanpa filter), urut tanggal daftar / nama
+        db.Index('ix_peserta_tanggal_id', 'tanggal_daftar', 'id'),
+        db.Index('ix_peserta_nama_id', 'nama', 'id'),
+        # Peserta per grup (toggle akses grup)
+        db.Index('ix_peserta_batch', 'batch'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     nama = db.Column(db.String(100), nullable=False)
     whatsapp = db.Column(db.String(15), unique=True, nullable=False)
@@ -15,21 +25,32 @@ class Peserta(db.Model):
     alamat_bengkel = db.Column(db.String(255), nullable=True)
     status_pekerjaan = db.Column(db.String(50), nullable=True)
     alasan = db.Column(db.Text, nullable=True)
-    batch = db.Column(db.String(50), default="Batch Baru")
+    batch = db.Column(db.String(50), default="Batch Baru")  # nama grup (tampilan), diisi bersama batch_id
+    batch_id = db.Column(db.Integer, db.ForeignKey('batch.id'), nullable=True, index=True)
+    grup = db.relationship('Batch', backref='peserta_list')
     akses_workshop = db.Column(db.Boolean, default=False)
     status_pembayaran = db.Column(db.String(20), default="Belum")  # "Belum", "Lunas", "Ditolak"
     whatsapp_link = db.Column(db.String(255), nullable=True)
     tanggal_daftar = db.Column(db.DateTime, default=datetime.utcnow)
-    password_hash = db.Column(db.String(128), nullable=True)
+    password_hash = db.Column(db.String(255), nullable=True)
     payment_proof = db.Column(db.String(255), nullable=True)
     
+    def assign_batch(self, grup):
+        """Set grup peserta (batch_id + nama), None = belum punya grup"""
+        self.batch_id = grup.id if grup else None
+        if grup:
+            self.batch = grup.nama
+    
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
     
     def check_password(self, password):
         if not self.password_hash:
             return False
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
+    
+    def password_needs_rehash(self):
+        return needs_rehash(self.password_hash)
 
 class Batch(db.Model):
     __tablename__ = 'batch'
@@ -44,16 +65,23 @@ class Admin(db.Model):
     __tablename__ = 'admin'
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(50), unique=True, nullable=False)
-    password_hash = db.Column(db.String(128), nullable=False)
+    password_hash = db.Column(db.String(255), nullable=False)
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
+    
+    def password_needs_rehash(self):
+        return needs_rehash(self.password_hash)
 
 class Jadwal(db.Model):
     __tablename__ = 'jadwal'
+    __table_args__ = (
+        # Jadwal per batch di dashboard (lookup batch_id, hari & jam ikut di index)
+        db.Index('ix_jadwal_batch_hari_waktu', 'batch_id', 'hari', 'waktu_mulai'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     batch_id = db.Column(db.Integer, db.ForeignKey('batch.id'), nullable=False)
     batch = db.relationship('Batch', backref='jadwal_list')
@@ -84,3 +112,67 @@ class Document(db.Model):
     
     def __repr__(self):
         return f'<Document {self.nama}>'
+
+class DriveSyncToken(db.Model):
+    __tablename__ = 'drive_sync_token'
+    id = db.Column(db.Integer, primary_key=True)
+    nama = db.Column(db.String(50), unique=True, nullable=False)  # 'changes'
+    page_token = db.Column(db.String(255), nullable=True)  # startPageToken Drive Changes API
+    tanggal_diupdate = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class DriveSyncFile(db.Model):
+    """Status sinkronisasi file/folder Google Drive (pengganti cache in-memory)"""
+    __tablename__ = 'drive_sync_file'
+    __table_args__ = (
+        db.UniqueConstraint('kategori', 'file_id', name='uq_drive_sync_file_kategori_file_id'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    kategori = db.Column(db.String(100), nullable=False)
+    file_id = db.Column(db.String(100), nullable=False, index=True)
+    nama = db.Column(db.String(255), nullable=False)
+    mime_type = db.Column(db.String(100), nullable=True)
+    folder_path = db.Column(db.String(500), nullable=True)
+    is_folder = db.Column(db.Boolean, default=False)
+    last_modified = db.Column(db.String(40), nullable=True)  # modifiedTime dari Drive (RFC 3339)
+    tanggal_sync = db.Column(db.DateTime, default=datetime.utcnow)
+
+class UserSession(db.Model):
+    """Session server-side; cookie browser hanya berisi sid"""
+    __tablename__ = 'user_session'
+    sid = db.Column(db.String(64), primary_key=True)
+    user_id = db.Column(db.Integer, nullable=True, index=True)  # Peserta.id, None untuk admin/anonim
+    data = db.Column(db.Text, nullable=False)  # JSON
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    tanggal_diupdate = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class UploadBlob(db.Model):
+    """File upload unik per isi (sha256), dirujuk Peserta.payment_proof lewat path"""
+    __tablename__ = 'upload_blob'
+    sha256 = db.Column(db.String(64), primary_key=True)
+    path = db.Column(db.String(255), unique=True, nullable=False)  # relatif ke UPLOAD_FOLDER
+    ukuran = db.Column(db.Integer, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0, index=True)
+    tanggal_dibuat = db.Column(db.DateTime, default=datetime.utcnow)
+    tanggal_diupdate = db.Column(db.DateTime, default=datetime.utcnow)  # perubahan ref_count terakhir
+
+class SchedulerLease(db.Model):
+    """Lease leader scheduler / lock job; hanya berlaku selama expires_at belum lewat"""
+    __tablename__ = 'scheduler_lease'
+    name = db.Column(db.String(100), primary_key=True)
+    owner = db.Column(db.String(100), nullable=False)  # host:pid:acak
+    acquired_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+class SchedulerJob(db.Model):
+    """Status job periodik scheduler (dibagi semua proses worker)"""
+    __tablename__ = 'scheduler_job'
+    name = db.Column(db.String(100), primary_key=True)
+    interval_seconds = db.Column(db.Integer, nullable=False)
+    next_run_at = db.Column(db.DateTime, nullable=False)
+    last_started_at = db.Column(db.DateTime, nullable=True)
+    last_finished_at = db.Column(db.DateTime, nullable=True)
+    last_status = db.Column(db.String(20), nullable=True)  # "running", "ok", "error"
+    last_duration = db.Column(db.Float, nullable=True)  # detik
+    last_error = db.Column(db.Text, nullable=True)
+    last_owner = db.Column(db.String(100), nullable=True)
+    run_count = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,175 @@
+"""
+Password Hashing
+Hash password dengan algoritma & cost yang bisa diatur (format werkzeug),
+rehash otomatis saat login jika method/cost diubah, dan thread pool terbatas
+supaya lonjakan login tidak memakan semua CPU worker
+"""
+
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+
+logger = logging.getLogger(__name__)
+
+# Format werkzeug: 'scrypt:N:r:p' atau 'pbkdf2:sha256:iterasi'
+# Default sama dengan werkzeug (scrypt N=2^15, r=8 -> 32 MB per hash) supaya hash
+# yang sudah ada tidak di-rehash; jalankan benchmark untuk host produksi
+PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+
+# Batas bawah opsional (mis. 'scrypt:16384:8:1'): PASSWORD_HASH_METHOD yang lebih
+# lemah dari ini diabaikan, jadi cost bisa diturunkan tapi tidak di bawah batas
+PASSWORD_HASH_MIN_METHOD = os.getenv('PASSWORD_HASH_MIN_METHOD', '')
+
+# Urutan kekuatan algoritma untuk perbandingan dengan batas bawah
+ALGORITHM_RANK = {'pbkdf2': 1, 'scrypt': 2}
+
+# Maksimal hash yang berjalan bersamaan per proses (hashlib melepas GIL,
+# jadi ini membatasi core yang dipakai, request lain antri)
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', '2'))
+PASSWORD_HASH_TIMEOUT = 30
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=PASSWORD_HASH_WORKERS,
+                    thread_name_prefix='password-hash'
+                )
+    return _executor
+
+
+def _run(func, *args):
+    return _get_executor().submit(func, *args).result(timeout=PASSWORD_HASH_TIMEOUT)
+
+
+def hash_password(password, method=None):
+    """Hash password dengan method yang dikonfigurasi (lewat thread pool)"""
+    return _run(generate_password_hash, password, method or PASSWORD_HASH_METHOD)
+
+
+def verify_password(password_hash, password):
+    """Cek password terhadap hash (lewat thread pool)"""
+    if not password_hash:
+        return False
+    return _run(check_password_hash, password_hash, password)
+
+
+def hash_method(password_hash):
+    """Bagian method dari hash werkzeug, mis. 'scrypt:16384:8:1'"""
+    return (password_hash or '').split('$', 1)[0]
+
+
+def parse_method(method):
+    """
+    Algoritma dan parameter cost dari method werkzeug (default werkzeug diisi)
+
+    Returns:
+        tuple: ('scrypt', (N, r, p)), ('pbkdf2', (iterasi,)) atau (nama, None) jika tidak dikenal
+    """
+    algorithm, *args = method.split(':')
+    try:
+        if algorithm == 'scrypt':
+            return algorithm, tuple(map(int, args)) if args else (2 ** 15, 8, 1)
+        if algorithm == 'pbkdf2':
+            return algorithm, (int(args[1]) if len(args) > 1 else DEFAULT_PBKDF2_ITERATIONS,)
+    except ValueError:
+        pass
+    return algorithm, None
+
+
+def is_weaker(method, floor):
+    """
+    True jika method lebih lemah dari floor: algoritma lebih lemah, atau
+    algoritma sama dengan salah satu parameter cost lebih kecil
+    """
+    algorithm, cost = parse_method(method)
+    floor_algorithm, floor_cost = parse_method(floor)
+    if cost is None or floor_cost is None:
+        return False
+    if algorithm != floor_algorithm:
+        return ALGORITHM_RANK.get(algorithm, 0) < ALGORITHM_RANK.get(floor_algorithm, 0)
+    return any(new < old for new, old in zip(cost, floor_cost))
+
+
+if PASSWORD_HASH_MIN_METHOD and is_weaker(PASSWORD_HASH_METHOD, PASSWORD_HASH_MIN_METHOD):
+    logger.warning(
+        f"PASSWORD_HASH_METHOD {PASSWORD_HASH_METHOD} is below PASSWORD_HASH_MIN_METHOD, "
+        f"using {PASSWORD_HASH_MIN_METHOD}"
+    )
+    PASSWORD_HASH_METHOD = PASSWORD_HASH_MIN_METHOD
+
+
+def needs_rehash(password_hash, method=None):
+    """
+    True jika method/cost hash yang tersimpan berbeda dari konfigurasi
+
+    Berlaku dua arah: cost dinaikkan atau diturunkan, hash di-rehash saat login
+    berikutnya (batas bawah lewat PASSWORD_HASH_MIN_METHOD). Method yang tidak
+    dikenal di konfigurasi -> hash dibiarkan
+    """
+    target, target_cost = parse_method(method or PASSWORD_HASH_METHOD)
+    if target_cost is None:
+        return False
+    return parse_method(hash_method(password_hash)) != (target, target_cost)
+
+
+# === Benchmark ===
+SCRYPT_CANDIDATES = [f'scrypt:{2 ** exp}:8:1' for exp in range(12, 18)]
+PBKDF2_CANDIDATES = [f'pbkdf2:sha256:{n}' for n in (100000, 200000, 300000, 600000, 1000000)]
+
+
+def time_method(method, rounds=3):
+    """Rata-rata waktu (ms) untuk satu hash dengan method tertentu"""
+    generate_password_hash('benchmark-password', method)  # warm up
+    start = time.perf_counter()
+    for _ in range(rounds):
+        generate_password_hash('benchmark-password', method)
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+def benchmark(target_ms=100, algorithm='scrypt', rounds=3):
+    """
+    Ukur cost setiap kandidat di host ini dan pilih yang paling kuat
+    dengan waktu <= target_ms
+
+    Returns:
+        dict: {'recommended', 'results': [(method, ms)]}
+    """
+    candidates = SCRYPT_CANDIDATES if algorithm == 'scrypt' else PBKDF2_CANDIDATES
+    results = []
+    recommended = candidates[0]
+    for method in candidates:
+        ms = time_method(method, rounds)
+        results.append((method, round(ms, 1)))
+        if ms <= target_ms:
+            recommended = method
+        else:
+            # Kandidat berikutnya pasti lebih lambat
+            break
+    return {'recommended': recommended, 'results': results}
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Pilih cost hash password sesuai target latency')
+    parser.add_argument('--target-ms', type=float, default=100)
+    parser.add_argument('--algorithm', choices=['scrypt', 'pbkdf2'], default='scrypt')
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    report = benchmark(args.target_ms, args.algorithm, args.rounds)
+    for method, ms in report['results']:
+        print(f"{method:<28} {ms:>8.1f} ms")
+    print(f"\nPASSWORD_HASH_METHOD={report['recommended']}")
+    print(f"(login dengan {PASSWORD_HASH_WORKERS} worker hash ~ "
+          f"{PASSWORD_HASH_WORKERS * 1000 / max(dict(report['results'])[report['recommended']], 0.1):.0f} login/detik per proses)")
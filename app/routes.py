@@ -1,31 +1,36 @@
 import os
 import json
-import sqlite3
-import requests
-import csv
 import re
-from io import StringIO
 from datetime import datetime
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash, Response, stream_with_context, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, session, g, flash, Response, stream_with_context, jsonify, abort
 from .models import db, Peserta, Batch, Admin, Jadwal, Document
 from .search_indexer import DocumentIndexer, DocumentSearcher
 from .unified_search import UnifiedSearchEngine, DeepIndexer
+from .drive_cache import get_drive_cache, DriveCacheError
+from .drive_api import get_auth_headers
+from .catalog_tree import CATALOG_TREE
+from .admin_listing import (
+    STATUS_FILTERS, PAYMENT_STATUSES, DEFAULT_PAGE_SIZE, PAGE_SIZE_OPTIONS,
+    paginate_peserta, count_by_status
+)
+from .exports import peserta_export_query, iter_peserta_csv, gzip_stream
+from .bulk_ops import BulkOperations, BulkOperationError, PAYMENT_STATUS_VALUES
+from .schedule_cache import SCHEDULE_CACHE
+from .session_store import regenerate_session, sync_user_sessions, revoke_user_sessions
+from .uploads import UploadError
+from .blob_store import store_proof, release_blobs, normalize_blob, maybe_collect_garbage, is_blob_path
+from .derivatives import get_derivative_service, DerivativeError, THUMBNAIL_SIZES, THUMBNAIL_FORMATS, DEFAULT_SIZE
+from .auth import load_principal, current_peserta, login_required, admin_required, invalidate_principals
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
 from werkzeug.utils import secure_filename
 from flask import current_app
 import time
 
 main = Blueprint('main', __name__)
 
-# === Database Dokumen Bengkel ===
-DOKUMEN_DB_PATH = os.path.join(os.path.dirname(__file__), '..', 'static', 'dokumen_bengkel.db')
-
-def get_dokumen_db_connection():
-    """Koneksi ke database dokumen bengkel"""
-    if os.path.exists(DOKUMEN_DB_PATH):
-        conn = sqlite3.connect(DOKUMEN_DB_PATH)
-        conn.row_factory = sqlite3.Row
-        return conn
-    return None
+# Identitas (user_id / admin) dibaca sekali per request ke flask.g, lihat app/auth.py
+main.before_request(load_principal)
 
 # === Konfigurasi kategori dokumen ===
 DOKUMEN_CATEGORIES = {
@@ -87,7 +92,13 @@ def login():
             flash('Password salah!')
             return render_template('user/login.html')
         
+        # Hash lama (algoritma/cost berbeda) diganti saat password diketahui benar
+        if peserta.password_needs_rehash():
+            peserta.set_password(pwd)
+            db.session.commit()
+        
         # Login berhasil
+        regenerate_session()
         session['user_id'] = peserta.id
         session['nama'] = peserta.nama
         session['akses_workshop'] = peserta.akses_workshop
@@ -97,30 +108,16 @@ def login():
 
 # === DASHBOARD USER ===
 @main.route('/dashboard')
+@login_required
 def dashboard():
-    if 'user_id' not in session:
-        return redirect('/login')
-    
-    peserta = Peserta.query.get(session['user_id'])
+    # Snapshot peserta dari cache identitas (tanpa query primary key setiap request)
+    peserta = current_peserta()
     
-    # Ambil jadwal dari database berdasarkan batch peserta
+    # Ambil jadwal batch peserta (di-cache per batch, lihat app/schedule_cache.py)
     weekly_schedule = []
     if peserta:
-        # Cari batch berdasarkan nama batch peserta
-        batch = Batch.query.filter_by(nama=peserta.batch).first()
-        if batch:
-            # Ambil semua jadwal untuk batch ini
-            jadwal_list = Jadwal.query.filter_by(batch_id=batch.id).all()
-            weekly_schedule = [
-                {
-                    'day': j.hari,
-                    'time': j.waktu_mulai,
-                    'topic': j.topik,
-                    'sesi': j.sesi,
-                    'waktu_selesai': j.waktu_selesai
-                }
-                for j in jadwal_list
-            ]
+        if peserta.batch_id:
+            weekly_schedule = list(SCHEDULE_CACHE.get(peserta.batch_id))
         
         # Jika tidak ada jadwal di database, gunakan default
         if not weekly_schedule:
@@ -141,11 +138,9 @@ def allowed_file(filename):
 
 
 @main.route('/dashboard/upload-payment', methods=['POST'])
+@login_required
 def upload_payment():
-    if 'user_id' not in session:
-        return redirect('/login')
-
-    peserta = Peserta.query.get(session['user_id'])
+    peserta = db.session.get(Peserta, g.user_id)
     if not peserta:
         flash('Peserta tidak ditemukan')
         return redirect('/dashboard')
@@ -161,13 +156,32 @@ def upload_payment():
 
     if file and allowed_file(file.filename):
         filename = secure_filename(file.filename)
-        timestamp = int(time.time())
-        saved_name = f"peserta_{peserta.id}_{timestamp}_{filename}"
-        save_path = os.path.join(current_app.config['UPLOAD_FOLDER'], saved_name)
-        file.save(save_path)
-        peserta.payment_proof = saved_name
-        peserta.status_pembayaran = 'Menunggu'
-        db.session.commit()
+        # File sudah di-stream ke UPLOAD_FOLDER/tmp saat request dibaca; isi yang sama
+        # dengan blob yang sudah ada tidak disimpan ulang (lihat app/blob_store.py)
+        try:
+            stored = store_proof(file, filename, current_app.config['UPLOAD_FOLDER'])
+            release_blobs([peserta.payment_proof])
+            peserta.payment_proof = stored['path']
+            peserta.status_pembayaran = 'Menunggu'
+            db.session.commit()
+        except UploadError as e:
+            db.session.rollback()
+            flash(str(e))
+            return redirect('/dashboard')
+        except Exception:
+            db.session.rollback()
+            raise
+        invalidate_principals([peserta.id])
+        if stored['created']:
+            # Normalisasi/kompres gambar (disimpan sebagai blob baru) lalu buat thumbnail,
+            # semuanya di worker background
+            normalize_blob(
+                current_app._get_current_object(), stored,
+                then=get_derivative_service(current_app).warm
+            )
+        if not current_app.config['SCHEDULER_ENABLED']:
+            # Tanpa scheduler, GC blob dipicu dari upload (paling sering sekali per interval)
+            maybe_collect_garbage(current_app._get_current_object())
         flash('Bukti transfer berhasil diunggah. Status: Menunggu verifikasi.')
         return redirect('/dashboard')
     else:
@@ -176,28 +190,25 @@ def upload_payment():
 
 
 @main.route('/dashboard/profile', methods=['GET', 'POST'])
+@login_required
 def profile():
-    if 'user_id' not in session:
-        return redirect('/login')
-
-    peserta = Peserta.query.get(session['user_id'])
     if request.method == 'POST':
+        peserta = db.session.get(Peserta, g.user_id)
         peserta.nama_bengkel = request.form.get('nama_bengkel', peserta.nama_bengkel)
         peserta.alamat_bengkel = request.form.get('alamat_bengkel', peserta.alamat_bengkel)
         peserta.alamat = request.form.get('alamat', peserta.alamat)
         db.session.commit()
+        invalidate_principals([peserta.id])
         flash('Profil berhasil diperbarui')
         return redirect('/dashboard')
 
-    return render_template('user/profile.html', peserta=peserta)
+    return render_template('user/profile.html', peserta=current_peserta())
 
 
 @main.route('/dashboard/change-password', methods=['POST'])
+@login_required
 def change_password():
-    if 'user_id' not in session:
-        return redirect('/login')
-
-    peserta = Peserta.query.get(session['user_id'])
+    peserta = db.session.get(Peserta, g.user_id)
     current = request.form.get('current_password', '').strip()
     new = request.form.get('new_password', '').strip()
     confirm = request.form.get('confirm_password', '').strip()
@@ -221,10 +232,8 @@ def change_password():
 
 # === DOKUMEN BENGKEL ===
 @main.route('/documents')
+@login_required
 def documents():
-    if 'user_id' not in session:
-        return redirect('/login')
-    
     # Kategori dokumen yang tersedia
     categories = {
         'EBOOKS': {
@@ -258,53 +267,36 @@ def documents():
 
 # === LIHAT FOLDER DOKUMEN ===
 @main.route('/documents/folder/<folder_id>')
+@login_required
 def view_dokumen_folder(folder_id):
-    if 'user_id' not in session:
-        return redirect('/login')
-    
-    conn = get_dokumen_db_connection()
-    if not conn:
+    # Pohon katalog di memori (dimuat ulang otomatis jika file sumber berubah)
+    tree = CATALOG_TREE.get()
+    if not len(tree):
         flash('Database dokumen tidak ditemukan')
         return redirect('/documents')
     
     try:
-        # Ambil nama folder
-        folder_row = conn.execute(
-            "SELECT name FROM files WHERE id = ? AND is_directory = 1", (folder_id,)
-        ).fetchone()
-        folder_name = folder_row['name'] if folder_row else 'Folder'
-        
-        # Ambil isi folder
-        items = conn.execute(
-            "SELECT id, name, is_directory, mime_type FROM files WHERE parent_id = ? ORDER BY is_directory DESC, name",
-            (folder_id,)
-        ).fetchall()
-        
-        # Hitung file count
-        file_count = conn.execute(
-            "SELECT COUNT(*) as cnt FROM files WHERE parent_id = ? AND is_directory = 0",
-            (folder_id,)
-        ).fetchone()['cnt']
+        folder = tree.get(folder_id)
+        folder_name = folder.name if folder and folder.is_directory else 'Folder'
+        items, file_count = tree.list_folder(folder_id)
         
         return render_template('user/dokumen_folder.html', 
                              folder_id=folder_id,
                              folder_name=folder_name,
+                             folder_size=folder.size if folder else None,
+                             breadcrumbs=tree.breadcrumbs(folder_id),
                              items=items,
                              file_count=file_count)
     except Exception as e:
         flash(f'Error: {str(e)}')
         return redirect('/documents')
-    finally:
-        conn.close()
 
 
 # === PREVIEW/DOWNLOAD DOKUMEN ===
 @main.route('/arsip-bengkel/<path:file_path>')
+@login_required
 def view_arsip_bengkel(file_path):
     """Melayani file HTML dari arsip bengkel dengan konten yang dibersihkan"""
-    if 'user_id' not in session:
-        return redirect('/login')
-    
     # Validasi path untuk mencegah directory traversal
     if '..' in file_path or file_path.startswith('/'):
         return "Invalid file path", 400
@@ -368,11 +360,9 @@ def view_arsip_bengkel(file_path):
 
 # Route untuk serve image files dari arsip bengkel
 @main.route('/arsip-bengkel-image/<path:file_path>')
+@login_required
 def serve_arsip_bengkel_image(file_path):
     """Melayani image files dari arsip bengkel"""
-    if 'user_id' not in session:
-        return redirect('/login')
-    
     # Validasi path
     if '..' in file_path or file_path.startswith('/'):
         return "Invalid file path", 400
@@ -397,21 +387,17 @@ def serve_arsip_bengkel_image(file_path):
         return f"Error: {str(e)}", 500
 
 
+@login_required
 def view_dokumen_file(file_id):
-    if 'user_id' not in session:
-        return redirect('/login')
-    
-    conn = get_dokumen_db_connection()
-    if not conn:
+    tree = CATALOG_TREE.get()
+    if not len(tree):
         flash('Database dokumen tidak ditemukan')
         return redirect('/documents')
     
     try:
-        file_info = conn.execute(
-            "SELECT * FROM files WHERE id = ? AND is_directory = 0", (file_id,)
-        ).fetchone()
+        file_info = tree.get(file_id)
         
-        if not file_info:
+        if not file_info or file_info.is_directory:
             flash('File tidak ditemukan')
             return redirect('/documents')
         
@@ -419,63 +405,56 @@ def view_dokumen_file(file_id):
     except Exception as e:
         flash(f'Error: {str(e)}')
         return redirect('/documents')
-    finally:
-        conn.close()
 
 
 # === PROXY DOWNLOAD FILE DARI GOOGLE DRIVE ===
+def get_drive_auth_headers():
+    """Header Authorization untuk Drive API (kosong jika tidak ada credentials)"""
+    creds_path = os.path.join(os.path.dirname(__file__), '..', 'app/templates/user/dokumen bengkel', 'credentials.json')
+    if not os.path.exists(creds_path):
+        return {}
+    try:
+        # Credentials di-cache, token hanya di-refresh jika kadaluarsa
+        return get_auth_headers(creds_path)
+    except:
+        return {}
+
+
 @main.route('/documents/download/<file_id>')
+@login_required
 def download_dokumen(file_id):
-    """Proxy untuk download file dari Google Drive menggunakan service account"""
-    if 'user_id' not in session:
-        return redirect('/login')
+    """Proxy untuk download file dari Google Drive, dengan cache disk di instance/"""
+    # Cek apakah file ada di katalog (tanpa query database)
+    tree = CATALOG_TREE.get()
+    if len(tree) and file_id not in tree:
+        return "File not found", 404
     
-    # Cek apakah file ada di database
-    conn = get_dokumen_db_connection()
-    if conn:
-        file_info = conn.execute(
-            "SELECT * FROM files WHERE id = ?", (file_id,)
-        ).fetchone()
-        conn.close()
-        if not file_info:
-            return "File not found", 404
-    
-    # Coba ambil dari Google Drive langsung
     try:
-        drive_url = f'https://www.googleapis.com/drive/v3/files/{file_id}?alt=media'
+        from flask import send_file
         
-        # Jika ada credentials.json, gunakan service account
-        creds_path = os.path.join(os.path.dirname(__file__), '..', 'app/templates/user/dokumen bengkel', 'credentials.json')
-        if os.path.exists(creds_path):
-            try:
-                from google.oauth2 import service_account
-                from google.auth.transport.requests import Request as AuthRequest
-                
-                creds = service_account.Credentials.from_service_account_file(
-                    creds_path, 
-                    scopes=['https://www.googleapis.com/auth/drive.readonly']
-                )
-                creds.refresh(AuthRequest())
-                headers = {'Authorization': f'Bearer {creds.token}'}
-            except:
-                headers = {}
-        else:
-            headers = {}
+        headers = get_drive_auth_headers()
+        cache = get_drive_cache(current_app)
         
-        # Download dari Google Drive
-        response = requests.get(drive_url, headers=headers, stream=True, timeout=60)
+        # modifiedTime jadi bagian dari key cache, jadi file yang diubah di Drive otomatis diunduh ulang
+        meta = cache.get_metadata(file_id, headers)
+        content_type = meta.get('mimeType') or 'application/octet-stream'
         
-        if response.status_code == 200:
-            def generate():
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        yield chunk
-            
-            content_type = response.headers.get('Content-Type', 'application/octet-stream')
-            return Response(stream_with_context(generate()), content_type=content_type)
-        else:
-            return f"Failed to download (status {response.status_code})", 502
+        kind, source = cache.open(file_id, meta.get('modifiedTime'), headers, meta.get('size'))
+        if kind == 'hit':
+            # send_file memakai wsgi.file_wrapper (sendfile) jika server mendukung;
+            # pin entry dilepas setelah response selesai dikirim
+            try:
+                response = send_file(source, mimetype=content_type, conditional=True)
+            except Exception:
+                cache.release(source)
+                raise
+            response.call_on_close(lambda: cache.release(source))
+            return response
+        
+        return Response(stream_with_context(source), content_type=content_type)
     
+    except DriveCacheError as e:
+        return str(e), e.status_code
     except Exception as e:
         return f"Error: {str(e)}", 500
 
@@ -497,6 +476,10 @@ def admin_do_login():
     admin = Admin.query.filter_by(username=username).first()
     
     if admin and admin.check_password(password):
+        if admin.password_needs_rehash():
+            admin.set_password(password)
+            db.session.commit()
+        regenerate_session()
         session['admin'] = True
         return redirect('/admin/dashboard')
     else:
@@ -505,10 +488,8 @@ def admin_do_login():
 
 # === ADMIN: DASHBOARD ===
 @main.route('/admin/dashboard')
+@admin_required
 def admin_dashboard():
-    if not session.get('admin'):
-        return redirect('/admin')
-    
     total_peserta = Peserta.query.count()
     belum_bayar = Peserta.query.filter_by(status_pembayaran='Belum').count()
     batches = Batch.query.all()
@@ -521,136 +502,78 @@ def admin_dashboard():
 
 # === ADMIN: KELOLA INDEKS DOKUMEN ===
 @main.route('/admin/kelola-indeks')
+@admin_required
 def admin_kelola_indeks():
     """Halaman untuk mengelola indeks dokumen"""
-    if not session.get('admin'):
-        return redirect('/admin')
-    
     return render_template('admin/kelola_indeks.html')
 
 
 # === ADMIN: KELOLA PESERTA ===
 @main.route('/admin/peserta')
+@admin_required
 def kelola_peserta():
-    if not session.get('admin'):
-        return redirect('/admin')
-    
     status = request.args.get('status', 'semua')
     search = request.args.get('search', '').strip()
     
-    query = Peserta.query
-    
-    # Filter by payment status
-    if status == 'belum':
-        query = query.filter_by(status_pembayaran='Belum')
-    elif status == 'menunggu':
-        query = query.filter_by(status_pembayaran='Menunggu')
-    elif status == 'lunas':
-        query = query.filter_by(status_pembayaran='Lunas')
-    elif status == 'ditolak':
-        query = query.filter_by(status_pembayaran='Ditolak')
-    
-    # Search by name or phone
-    if search:
-        query = query.filter(
-            (Peserta.nama.ilike(f'%{search}%')) |
-            (Peserta.whatsapp.ilike(f'%{search}%'))
-        )
-    
-    peserta_list = query.all()
-    total = Peserta.query.count()
-    
-    return render_template('admin/kelola_peserta.html', peserta=peserta_list, status_filter=status, search=search, total=total)
+    # Filter by payment status (semua = tanpa filter)
+    statuses = [STATUS_FILTERS[status]] if status in STATUS_FILTERS else None
+    
+    page = paginate_peserta(
+        statuses=statuses,
+        search=search,
+        sort=request.args.get('sort', 'tanggal'),
+        order=request.args.get('order', 'desc'),
+        after=request.args.get('after'),
+        before=request.args.get('before'),
+        per_page=request.args.get('per_page', DEFAULT_PAGE_SIZE)
+    )
+    counts = count_by_status(search)
+    
+    return render_template('admin/kelola_peserta.html',
+                          peserta=page['items'],
+                          page=page,
+                          counts=counts,
+                          page_size_options=PAGE_SIZE_OPTIONS,
+                          status_filter=status,
+                          search=search,
+                          total=counts['total'],
+                          batches=Batch.query.order_by(Batch.nama).all(),
+                          payment_statuses=PAYMENT_STATUS_VALUES)
 
 # === ADMIN: DOWNLOAD PESERTA ===
 @main.route('/admin/peserta/download/csv')
+@admin_required
 def download_peserta_csv():
-    if not session.get('admin'):
-        return redirect('/admin')
-    
     status = request.args.get('status', 'semua')
     search = request.args.get('search', '').strip()
+    use_gzip = request.args.get('gzip') == '1'
     
-    query = Peserta.query
-    
-    # Filter by payment status
-    if status == 'belum':
-        query = query.filter_by(status_pembayaran='Belum')
-    elif status == 'menunggu':
-        query = query.filter_by(status_pembayaran='Menunggu')
-    elif status == 'lunas':
-        query = query.filter_by(status_pembayaran='Lunas')
-    elif status == 'ditolak':
-        query = query.filter_by(status_pembayaran='Ditolak')
-    
-    # Search by name or phone
-    if search:
-        query = query.filter(
-            (Peserta.nama.ilike(f'%{search}%')) |
-            (Peserta.whatsapp.ilike(f'%{search}%'))
-        )
+    # Filter by payment status & search (sama dengan halaman kelola peserta)
+    statuses = [STATUS_FILTERS[status]] if status in STATUS_FILTERS else None
     
-    peserta_list = query.all()
-    
-    # Create CSV
-    output = StringIO()
-    writer = csv.writer(output)
-    
-    # Header
-    writer.writerow([
-        'No',
-        'Nama',
-        'WhatsApp',
-        'Email',
-        'Alamat',
-        'Nama Bengkel',
-        'Alamat Bengkel',
-        'Status Pekerjaan',
-        'Batch',
-        'Status Pembayaran',
-        'Akses Workshop',
-        'Tanggal Daftar'
-    ])
-    
-    # Data
-    for idx, peserta in enumerate(peserta_list, 1):
-        writer.writerow([
-            idx,
-            peserta.nama,
-            peserta.whatsapp,
-            peserta.email or '-',
-            peserta.alamat or '-',
-            peserta.nama_bengkel or '-',
-            peserta.alamat_bengkel or '-',
-            peserta.status_pekerjaan or '-',
-            peserta.batch,
-            peserta.status_pembayaran,
-            'Ya' if peserta.akses_workshop else 'Tidak',
-            peserta.tanggal_daftar.strftime('%d-%m-%Y %H:%M') if peserta.tanggal_daftar else '-'
-        ])
+    # Row diambil bertahap dari cursor dan CSV dikirim per potongan
+    chunks = iter_peserta_csv(peserta_export_query(statuses, search))
     
     # Generate filename with timestamp
     filename = f"peserta_{status}_{datetime.now().strftime('%d-%m-%Y_%H-%M-%S')}.csv"
     
-    # Return as downloadable file
-    response = Response(output.getvalue(), mimetype='text/csv')
+    if use_gzip:
+        response = Response(stream_with_context(gzip_stream(chunks)), mimetype='application/gzip')
+        filename += '.gz'
+    else:
+        response = Response(stream_with_context(chunks), mimetype='text/csv')
     response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
     return response
 
 @main.route('/admin/peserta/<int:id>')
-
+@admin_required
 def peserta_detail(id):
-    if not session.get('admin'):
-        return redirect('/admin')
-    
-    peserta = Peserta.query.get_or_404(id)
+    peserta = Peserta.query.options(joinedload(Peserta.grup)).filter_by(id=id).first_or_404()
     return render_template('admin/peserta_detail.html', peserta=peserta)
 
 @main.route('/admin/peserta/<int:id>/edit', methods=['GET', 'POST'])
+@admin_required
 def edit_peserta(id):
-    if not session.get('admin'):
-        return redirect('/admin')
-    
     peserta = Peserta.query.get_or_404(id)
     
     if request.method == 'POST':
@@ -662,11 +585,14 @@ def edit_peserta(id):
         peserta.alamat_bengkel = request.form.get('alamat_bengkel', peserta.alamat_bengkel)
         peserta.status_pekerjaan = request.form.get('status_pekerjaan', peserta.status_pekerjaan)
         peserta.alasan = request.form.get('alasan', peserta.alasan)
-        peserta.batch = request.form.get('batch', peserta.batch)
+        batch_id = request.form.get('batch_id', type=int)
+        if batch_id:
+            peserta.assign_batch(Batch.query.get(batch_id))
         peserta.status_pembayaran = request.form.get('status_pembayaran', peserta.status_pembayaran)
         peserta.akses_workshop = 'akses_workshop' in request.form
         
         db.session.commit()
+        sync_user_sessions([peserta.id], nama=peserta.nama, akses_workshop=peserta.akses_workshop)
         flash(f'Data peserta {peserta.nama} berhasil diperbarui!')
         return redirect(f'/admin/peserta/{id}')
     
@@ -674,97 +600,207 @@ def edit_peserta(id):
     return render_template('admin/peserta_edit.html', peserta=peserta, batches=batches)
 
 @main.route('/admin/peserta/<int:id>/toggle-akses', methods=['POST'])
+@admin_required
 def toggle_akses(id):
-    if not session.get('admin'):
-        return redirect('/admin')
-    
     peserta = Peserta.query.get_or_404(id)
     peserta.akses_workshop = not peserta.akses_workshop
     db.session.commit()
+    sync_user_sessions([peserta.id], akses_workshop=peserta.akses_workshop)
     flash(f"Akses workshop {peserta.nama} diubah menjadi {'Aktif' if peserta.akses_workshop else 'Tidak Aktif'}")
     return redirect(f'/admin/peserta/{id}')
 
 @main.route('/admin/peserta/<int:id>/hapus', methods=['POST'])
+@admin_required
 def hapus_peserta(id):
-    if not session.get('admin'):
-        return redirect('/admin')
-    
     peserta = Peserta.query.get_or_404(id)
     nama = peserta.nama
+    release_blobs([peserta.payment_proof])
     db.session.delete(peserta)
     db.session.commit()
+    revoke_user_sessions([id])
     flash(f'Peserta {nama} berhasil dihapus!')
     return redirect('/admin/peserta')
 
 
 # === ADMIN: GRUP DIKLAT (rename dari batch) ===
 @main.route('/admin/grup')
+@admin_required
 def kelola_grup():
-    if not session.get('admin'):
-        return redirect('/admin')
     grups = Batch.query.all()
-    return render_template('admin/grup_list.html', grups=grups)
+    # Jumlah peserta per grup dalam satu GROUP BY batch_id
+    peserta_counts = dict(
+        db.session.query(Peserta.batch_id, func.count(Peserta.id))
+        .filter(Peserta.batch_id.isnot(None))
+        .group_by(Peserta.batch_id)
+        .all()
+    )
+    return render_template('admin/grup_list.html', grups=grups, peserta_counts=peserta_counts)
 
 
 @main.route('/admin/grup/<int:id>/toggle-akses', methods=['POST'])
+@admin_required
 def toggle_akses_grup(id):
-    if not session.get('admin'):
-        return redirect('/admin')
-    grup = Batch.query.get_or_404(id)
-    grup.akses_workshop_default = not grup.akses_workshop_default
-    db.session.commit()
-    # Apply group access setting to all peserta in this grup
-    peserta_list = Peserta.query.filter_by(batch=grup.nama).all()
-    for p in peserta_list:
-        p.akses_workshop = grup.akses_workshop_default
-    db.session.commit()
-    flash(f"Akses workshop untuk grup '{grup.nama}' diubah menjadi {'Aktif' if grup.akses_workshop_default else 'Non-Aktif'} dan diterapkan ke peserta grup.")
+    # Toggle default grup + UPDATE semua peserta grup dalam satu transaksi
+    try:
+        result = BulkOperations.set_group_access(id)
+    except BulkOperationError:
+        abort(404)
+    flash(f"Akses workshop untuk grup '{result['batch']}' diubah menjadi {'Aktif' if result['akses_workshop'] else 'Non-Aktif'} dan diterapkan ke {result['peserta_updated']} peserta grup.")
     return redirect('/admin/dashboard')
 
+
+# === ADMIN: AKSI MASSAL PESERTA ===
+@main.route('/admin/peserta/bulk', methods=['POST'])
+@admin_required
+def bulk_peserta():
+    action = request.form.get('action')
+    ids = request.form.getlist('ids')
+    
+    try:
+        if action == 'status':
+            result = BulkOperations.set_payment_status(ids, request.form.get('status'))
+            flash(f"Status pembayaran {result['peserta_updated']} peserta diubah menjadi {result['status']}")
+        elif action == 'batch':
+            result = BulkOperations.reassign_batch(ids, request.form.get('batch_id', type=int))
+            flash(f"{result['peserta_updated']} peserta dipindahkan ke grup '{result['batch']}'")
+        elif action in ('akses_on', 'akses_off'):
+            result = BulkOperations.set_access(ids, action == 'akses_on')
+            flash(f"Akses workshop {result['peserta_updated']} peserta diubah menjadi {'Aktif' if result['akses_workshop'] else 'Tidak Aktif'}")
+        else:
+            flash('Aksi tidak valid!')
+    except BulkOperationError as e:
+        flash(str(e))
+    
+    return redirect(request.referrer or '/admin/peserta')
+
 # === ADMIN: VERIFIKASI PEMBAYARAN ===
 @main.route('/admin/pembayaran')
+@admin_required
 def verifikasi_pembayaran():
-    if not session.get('admin'):
-        return redirect('/admin')
-    
     status = request.args.get('status', 'menunggu')
     
-    query = Peserta.query
-    if status == 'menunggu':
-        query = query.filter_by(status_pembayaran='Menunggu')
-    elif status == 'lunas':
-        query = query.filter_by(status_pembayaran='Lunas')
-    elif status == 'ditolak':
-        query = query.filter_by(status_pembayaran='Ditolak')
+    if status in STATUS_FILTERS and STATUS_FILTERS[status] in PAYMENT_STATUSES:
+        statuses = [STATUS_FILTERS[status]]
     else:
-        query = query.filter(Peserta.status_pembayaran.in_(['Menunggu', 'Lunas', 'Ditolak']))
+        statuses = PAYMENT_STATUSES
+    
+    page = paginate_peserta(
+        statuses=statuses,
+        sort=request.args.get('sort', 'tanggal'),
+        order=request.args.get('order', 'desc'),
+        after=request.args.get('after'),
+        before=request.args.get('before'),
+        per_page=request.args.get('per_page', DEFAULT_PAGE_SIZE)
+    )
+    counts = count_by_status(statuses=PAYMENT_STATUSES)
     
-    peserta_list = query.all()
-    return render_template('admin/verifikasi_pembayaran.html', peserta=peserta_list, status_filter=status)
+    return render_template('admin/verifikasi_pembayaran.html',
+                          peserta=page['items'],
+                          page=page,
+                          counts=counts,
+                          page_size_options=PAGE_SIZE_OPTIONS,
+                          status_filter=status)
 
 @main.route('/admin/peserta/<int:id>/verifikasi', methods=['POST'])
+@admin_required
 def verifikasi_status(id):
-    if not session.get('admin'):
-        return redirect('/admin')
-    
     peserta = Peserta.query.get_or_404(id)
     status = request.form.get('status', 'Menunggu')
     
     if status in ['Belum', 'Menunggu', 'Lunas', 'Ditolak']:
         peserta.status_pembayaran = status
         db.session.commit()
+        invalidate_principals([peserta.id])
         flash(f'Status pembayaran {peserta.nama} diubah menjadi {status}')
     else:
         flash('Status tidak valid!')
     
     return redirect('/admin/pembayaran')
 
+@main.route('/admin/pembayaran/bukti/<path:proof>')
+@admin_required
+def lihat_bukti_pembayaran(proof):
+    """File bukti transfer (path relatif di UPLOAD_FOLDER, termasuk folder shard)"""
+    from flask import send_from_directory
+    return send_from_directory(current_app.config['UPLOAD_FOLDER'], proof)
+
+# Nama file blob = sha256 isinya dan blob tidak pernah ditulis ulang (normalisasi
+# disimpan sebagai blob baru, lihat blob_store.rekey_blob), jadi thumbnail untuk
+# URL blob yang sama tidak pernah berubah. File lama di luar blob store di-revalidate lewat ETag.
+THUMBNAIL_MAX_AGE = 365 * 24 * 3600
+
+@main.route('/admin/pembayaran/thumb/<path:proof>')
+@admin_required
+def thumbnail_bukti_pembayaran(proof):
+    """Thumbnail bukti transfer (WebP jika browser mendukung, selain itu JPEG)"""
+    from flask import send_file
+    from werkzeug.security import safe_join
+    
+    source = safe_join(current_app.config['UPLOAD_FOLDER'], proof)
+    if source is None or not os.path.isfile(source):
+        abort(404)
+    
+    size = request.args.get('s', DEFAULT_SIZE)
+    if size not in THUMBNAIL_SIZES:
+        abort(400)
+    fmt = 'webp' if request.accept_mimetypes['image/webp'] else 'jpeg'
+    
+    try:
+        path, digest = get_derivative_service(current_app).get(source, size, fmt)
+    except DerivativeError as e:
+        current_app.logger.warning(f"Thumbnail unavailable for {proof}: {str(e)}")
+        abort(404)
+    
+    # ETag dari hash isi file saat ini; immutable hanya jika nama blob cocok dengan isinya
+    immutable = is_blob_path(proof) and os.path.basename(proof).startswith(f"{digest}.")
+    response = send_file(
+        path,
+        mimetype=THUMBNAIL_FORMATS[fmt][1],
+        max_age=THUMBNAIL_MAX_AGE if immutable else 0,
+        etag=f"{digest}-{size}-{fmt}",
+        conditional=True
+    )
+    response.cache_control.public = False
+    response.cache_control.private = True
+    if immutable:
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    response.vary.add('Accept')
+    return response
+
+@main.route('/admin/pembayaran/bulk', methods=['POST'])
+@admin_required(api=True)
+def verifikasi_pembayaran_bulk():
+    """
+    Verifikasi banyak pembayaran dalam satu request (JSON)
+    
+    Body JSON:
+    {
+        'items': [{'id': 1, 'status': 'Lunas'}, ...]
+    }
+    atau
+    {
+        'ids': [1, 2, 3],
+        'status': 'Lunas'
+    }
+    """
+    data = request.get_json(silent=True) or {}
+    items = data.get('items')
+    if items is None and isinstance(data.get('ids'), list):
+        items = [{'id': peserta_id, 'status': data.get('status')} for peserta_id in data['ids']]
+    
+    try:
+        result = BulkOperations.verify_payments(items)
+    except BulkOperationError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    return jsonify({'success': True, **result})
+
 # === ADMIN: BUAT GRUP DIKLAT BARU ===
 @main.route('/admin/grup/buat', methods=['GET', 'POST'])
+@admin_required
 def buat_grup():
-    if not session.get('admin'):
-        return redirect('/admin')
-    
     if request.method == 'POST':
         batch = Batch(
             nama=request.form['nama'],
@@ -833,20 +869,17 @@ def register():
 
 # === ADMIN: JADWAL DIKLAT ===
 @main.route('/admin/jadwal')
+@admin_required
 def admin_jadwal_list():
-    if not session.get('admin'):
-        return redirect('/admin')
-    
     batches = Batch.query.all()
-    jadwal_list = Jadwal.query.all()
+    # Nama batch dimuat lewat JOIN, bukan satu query per jadwal
+    jadwal_list = Jadwal.query.options(joinedload(Jadwal.batch)).all()
     
     return render_template('admin/jadwal_list.html', batches=batches, jadwal=jadwal_list)
 
 @main.route('/admin/jadwal/create', methods=['GET', 'POST'])
+@admin_required
 def admin_jadwal_create():
-    if not session.get('admin'):
-        return redirect('/admin')
-    
     batches = Batch.query.all()
     
     if request.method == 'POST':
@@ -874,6 +907,7 @@ def admin_jadwal_create():
         
         db.session.add(jadwal)
         db.session.commit()
+        SCHEDULE_CACHE.invalidate(jadwal.batch_id)
         
         flash('Jadwal berhasil dibuat!')
         return redirect('/admin/jadwal')
@@ -881,14 +915,13 @@ def admin_jadwal_create():
     return render_template('admin/jadwal_form.html', batches=batches, form_title='Buat Jadwal Baru')
 
 @main.route('/admin/jadwal/<int:id>/edit', methods=['GET', 'POST'])
+@admin_required
 def admin_jadwal_edit(id):
-    if not session.get('admin'):
-        return redirect('/admin')
-    
     jadwal = Jadwal.query.get_or_404(id)
     batches = Batch.query.all()
     
     if request.method == 'POST':
+        old_batch_id = jadwal.batch_id
         jadwal.batch_id = request.form.get('batch_id')
         jadwal.hari = request.form.get('hari')
         jadwal.waktu_mulai = request.form.get('waktu_mulai')
@@ -898,6 +931,7 @@ def admin_jadwal_edit(id):
         jadwal.keterangan = request.form.get('keterangan')
         
         db.session.commit()
+        SCHEDULE_CACHE.invalidate(old_batch_id, jadwal.batch_id)
         
         flash('Jadwal berhasil diubah!')
         return redirect('/admin/jadwal')
@@ -908,13 +942,13 @@ def admin_jadwal_edit(id):
                          form_title='Edit Jadwal')
 
 @main.route('/admin/jadwal/<int:id>/delete', methods=['POST'])
+@admin_required
 def admin_jadwal_delete(id):
-    if not session.get('admin'):
-        return redirect('/admin')
-    
     jadwal = Jadwal.query.get_or_404(id)
+    batch_id = jadwal.batch_id
     db.session.delete(jadwal)
     db.session.commit()
+    SCHEDULE_CACHE.invalidate(batch_id)
     
     flash('Jadwal berhasil dihapus!')
     return redirect('/admin/jadwal')
@@ -922,20 +956,16 @@ def admin_jadwal_delete(id):
 
 # === ARSIP BENGKEL (Workshop Archive) ===
 @main.route('/arsip_bengkel')
+@login_required
 def arsip_bengkel():
     """Redirect ke halaman documents dengan tab arsip bengkel"""
-    if 'user_id' not in session:
-        return redirect('/login')
-    
     return redirect('/documents')
 
 
 @main.route('/arsip/<path:filepath>')
+@login_required
 def serve_arsip(filepath):
     """Melayani file dari folder arsip bengkel"""
-    if 'user_id' not in session:
-        return redirect('/login')
-    
     try:
         # Decode URL-encoded path
         import urllib.parse
@@ -1011,11 +1041,9 @@ def serve_arsip(filepath):
 
 # === SEARCH DOKUMEN BENGKEL ===
 @main.route('/api/search-dokumen', methods=['GET'])
+@login_required(api=True)
 def api_search_dokumen():
     """API endpoint untuk search dokumen"""
-    if 'user_id' not in session:
-        return jsonify({'error': 'Unauthorized'}), 401
-    
     query = request.args.get('q', '').strip()
     kategori = request.args.get('kategori', 'Semua')
     tipe_file = request.args.get('tipe', None)
@@ -1056,12 +1084,10 @@ def api_search_dokumen():
 
 
 @main.route('/search-dokumen')
+@login_required
 def search_dokumen():
     """Halaman search dokumen"""
-    if 'user_id' not in session:
-        return redirect('/login')
-    
-    peserta = Peserta.query.get(session['user_id'])
+    peserta = current_peserta()
     categories = DocumentSearcher.get_all_categories()
     stats = DocumentSearcher.get_category_stats()
     
@@ -1074,11 +1100,9 @@ def search_dokumen():
 
 
 @main.route('/api/dokumen/<int:doc_id>')
+@login_required(api=True)
 def api_dokumen_detail(doc_id):
     """API untuk detail dokumen"""
-    if 'user_id' not in session:
-        return jsonify({'error': 'Unauthorized'}), 401
-    
     doc = Document.query.get(doc_id)
     if not doc:
         return jsonify({'error': 'Dokumen tidak ditemukan'}), 404
@@ -1096,11 +1120,9 @@ def api_dokumen_detail(doc_id):
 
 
 @main.route('/api/search-suggestions')
+@login_required(api=True)
 def api_search_suggestions():
     """API untuk autocomplete suggestions"""
-    if 'user_id' not in session:
-        return jsonify({'error': 'Unauthorized'}), 401
-    
     partial = request.args.get('q', '').strip()
     
     if not partial or len(partial) < 2:
@@ -1111,11 +1133,9 @@ def api_search_suggestions():
 
 
 @main.route('/api/dokumen-categories')
+@login_required(api=True)
 def api_dokumen_categories():
     """API untuk daftar kategori"""
-    if 'user_id' not in session:
-        return jsonify({'error': 'Unauthorized'}), 401
-    
     categories = DocumentSearcher.get_all_categories()
     stats = DocumentSearcher.get_category_stats()
     
@@ -1130,17 +1150,10 @@ def api_dokumen_categories():
 
 
 @main.route('/api/index-dokumen', methods=['POST'])
+@login_required(api=True)
 def api_index_dokumen():
     """API untuk menjalankan indexing (hanya untuk admin)"""
-    # Simple auth check - dalam production gunakan role check yang lebih ketat
-    if 'user_id' not in session:
-        return jsonify({'error': 'Unauthorized'}), 401
-    
-    peserta = Peserta.query.get(session['user_id'])
-    admin = Admin.query.filter_by(username=session.get('admin_username')).first()
-    
-    # Untuk testing, allow any user. Dalam production, ganti dengan proper admin check
-    
+    # Untuk testing, allow any user. Dalam production, ganti dengan @admin_required
     try:
         indexer = DocumentIndexer()
         
@@ -1274,11 +1287,9 @@ def api_unified_search_advanced():
 
 # === UNIFIED SEARCH PAGE ===
 @main.route('/search')
+@login_required
 def search():
     """Halaman unified search untuk Dokumen Pembelajaran dan Arsip Bengkel"""
-    if 'user_id' not in session:
-        return redirect('/login')
-    
     # Get search query dari params
     query = request.args.get('q', '')
     search_type = request.args.get('type', 'all')
@@ -0,0 +1,105 @@
+"""
+Schedule Cache
+Jadwal mingguan per batch yang sudah jadi (list dict untuk dashboard),
+di-cache di memori dan di-invalidate saat admin mengubah jadwal
+"""
+
+import os
+import time
+import logging
+import threading
+from .models import db, Jadwal
+
+logger = logging.getLogger(__name__)
+
+# Batas umur cache (detik) sebagai pengaman jika ada beberapa proses worker:
+# invalidasi eksplisit hanya berlaku di proses yang menerima request admin
+SCHEDULE_CACHE_TTL = int(os.getenv('SCHEDULE_CACHE_TTL', '300'))
+
+HARI_ORDER = {
+    'Senin': 0,
+    'Selasa': 1,
+    'Rabu': 2,
+    'Kamis': 3,
+    'Jumat': 4,
+    'Sabtu': 5,
+    'Minggu': 6
+}
+
+
+def load_schedule(batch_id):
+    """Jadwal satu batch dalam satu query (index jadwal.batch_id), urut hari & jam"""
+    rows = (
+        db.session.query(Jadwal.hari, Jadwal.waktu_mulai, Jadwal.waktu_selesai, Jadwal.topik, Jadwal.sesi)
+        .filter(Jadwal.batch_id == batch_id)
+        .all()
+    )
+    rows.sort(key=lambda j: (HARI_ORDER.get(j.hari, len(HARI_ORDER)), j.waktu_mulai))
+    return tuple(
+        {
+            'day': j.hari,
+            'time': j.waktu_mulai,
+            'topic': j.topik,
+            'sesi': j.sesi,
+            'waktu_selesai': j.waktu_selesai
+        }
+        for j in rows
+    )
+
+
+class ScheduleCache:
+    """
+    Cache jadwal per batch_id
+
+    - Semua peserta satu batch memakai hasil yang sama
+    - Satu loader per batch saat miss (peserta lain menunggu hasilnya)
+    - invalidate() dipanggil dari route admin jadwal
+    """
+
+    def __init__(self, ttl=SCHEDULE_CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}  # batch_id -> (expires_at, schedule)
+        self._loading = {}  # batch_id -> Lock
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, batch_id):
+        """Jadwal batch (tuple dict, jangan diubah)"""
+        now = time.monotonic()
+        entry = self._entries.get(batch_id)
+        if entry is not None and entry[0] > now:
+            self.hits += 1
+            return entry[1]
+
+        with self._lock:
+            loader_lock = self._loading.setdefault(batch_id, threading.Lock())
+
+        with loader_lock:
+            # Request lain mungkin sudah mengisi cache selama kita menunggu
+            entry = self._entries.get(batch_id)
+            if entry is not None and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+
+            self.misses += 1
+            schedule = load_schedule(batch_id)
+            self._entries[batch_id] = (time.monotonic() + self.ttl, schedule)
+            return schedule
+
+    def invalidate(self, *batch_ids):
+        """Hapus cache batch tertentu, tanpa argumen = hapus semua"""
+        if not batch_ids:
+            self._entries.clear()
+            return
+
+        ids = {int(batch_id) for batch_id in batch_ids if batch_id is not None}
+        for batch_id in ids:
+            self._entries.pop(batch_id, None)
+        logger.info(f"Schedule cache invalidated for batch {sorted(ids)}")
+
+    def get_stats(self):
+        return {'batches': len(self._entries), 'hits': self.hits, 'misses': self.misses, 'ttl': self.ttl}
+
+
+SCHEDULE_CACHE = ScheduleCache()
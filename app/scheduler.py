@@ -0,0 +1,480 @@
+"""
+Scheduler
+Job periodik (Drive sync, reindex, GC upload, purge session, warm cache) yang
+aman untuk banyak proses worker: satu proses menjadi leader lewat lease di
+tabel scheduler_lease, dan jadwal + status terakhir setiap job disimpan di
+tabel scheduler_job sehingga job jalan sekali per interval untuk seluruh cluster.
+"""
+
+import os
+import time
+import uuid
+import random
+import socket
+import logging
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import select, update, delete, case
+from sqlalchemy.dialects.sqlite import insert
+from .models import db, SchedulerLease, SchedulerJob
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_ENABLED = os.getenv('SCHEDULER_ENABLED', 'False').lower() == 'true'
+# Jeda loop scheduler (detik); lease leader harus jauh lebih lama dari tick
+SCHEDULER_TICK = int(os.getenv('SCHEDULER_TICK', '15'))
+SCHEDULER_LEASE_TTL = int(os.getenv('SCHEDULER_LEASE_TTL', '60'))
+SCHEDULER_WORKERS = int(os.getenv('SCHEDULER_WORKERS', '2'))
+# Jitter jadwal: 0.1 = tambahan acak 0-10% dari interval job
+SCHEDULER_JITTER = float(os.getenv('SCHEDULER_JITTER', '0.1'))
+
+LEADER_LEASE = 'scheduler-leader'
+JOB_LEASE_PREFIX = 'job:'
+MAX_ERROR_LENGTH = 2000
+
+
+def _interval(name, default):
+    return int(os.getenv(f'SCHEDULER_{name.upper()}_INTERVAL', str(default)))
+
+
+# === Lease ===
+def acquire_lease(name, owner, ttl):
+    """
+    Ambil atau perpanjang lease (atomik di SQLite)
+
+    Berhasil jika lease belum ada, sudah kadaluarsa, atau memang milik owner.
+
+    Returns:
+        bool: True jika owner memegang lease sampai now + ttl
+    """
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=ttl)
+    try:
+        result = db.session.execute(
+            update(SchedulerLease)
+            .where(
+                SchedulerLease.name == name,
+                (SchedulerLease.owner == owner) | (SchedulerLease.expires_at < now)
+            )
+            .values(
+                owner=owner,
+                expires_at=expires_at,
+                acquired_at=case((SchedulerLease.owner == owner, SchedulerLease.acquired_at), else_=now)
+            )
+            .execution_options(synchronize_session=False)
+        )
+        acquired = result.rowcount == 1
+        if not acquired:
+            result = db.session.execute(
+                insert(SchedulerLease)
+                .values(name=name, owner=owner, acquired_at=now, expires_at=expires_at)
+                .on_conflict_do_nothing(index_elements=[SchedulerLease.name])
+            )
+            acquired = result.rowcount == 1
+        db.session.commit()
+        return acquired
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def renew_lease(name, owner, ttl):
+    """
+    Perpanjang lease yang masih dipegang owner (tidak mengambil alih / membuat baru)
+
+    Returns:
+        bool: False jika lease sudah dilepas atau diambil owner lain
+    """
+    try:
+        result = db.session.execute(
+            update(SchedulerLease)
+            .where(SchedulerLease.name == name, SchedulerLease.owner == owner)
+            .values(expires_at=datetime.utcnow() + timedelta(seconds=ttl))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return result.rowcount == 1
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def release_lease(name, owner):
+    try:
+        db.session.execute(
+            delete(SchedulerLease).where(SchedulerLease.name == name, SchedulerLease.owner == owner)
+        )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+# === Job ===
+class Job:
+    """
+    Job periodik
+
+    Args:
+        name (str): nama unik (key di scheduler_job)
+        func (callable): func(app), dijalankan di dalam app context
+        interval (int): detik antar run
+        scope (str): 'cluster' = hanya leader, sekali per interval untuk semua proses;
+                     'process' = setiap proses (mis. warm cache in-memory)
+    """
+
+    def __init__(self, name, func, interval, scope='cluster', jitter=SCHEDULER_JITTER):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.scope = scope
+        self.jitter = jitter
+
+    def next_run(self, now):
+        return now + timedelta(seconds=self.interval * (1 + random.uniform(0, self.jitter)))
+
+
+class Scheduler:
+    """
+    Loop scheduler per proses
+
+    - Setiap tick: jalankan job 'process' yang jatuh tempo, ambil/perpanjang
+      lease leader, lalu (jika leader) jalankan job 'cluster' yang jatuh tempo
+    - next_run_at di-set saat job mulai, jadi leader berikutnya tidak
+      menjalankan ulang job yang sudah jalan di interval ini
+    - Job yang masih berjalan tidak dijalankan lagi (cek lokal + lease job:<nama>
+      yang diperpanjang selama job berjalan, berlaku antar proses)
+    """
+
+    def __init__(self, app, tick=SCHEDULER_TICK, lease_ttl=SCHEDULER_LEASE_TTL, workers=SCHEDULER_WORKERS):
+        self.app = app
+        self.tick_seconds = tick
+        self.lease_ttl = lease_ttl
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.jobs = {}
+        self.is_leader = False
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='scheduler-job')
+        self._running = {}  # nama job -> Future
+        self._local_next = {}  # job 'process': nama -> monotonic
+        self._stop = threading.Event()
+        self._thread = None
+
+    def register(self, job):
+        if job.interval <= 0:
+            logger.info(f"Scheduler job {job.name} disabled")
+            return
+        self.jobs[job.name] = job
+
+    # --- loop ---
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name='scheduler', daemon=True)
+        self._thread.start()
+        logger.info(f"Scheduler started ({self.owner}) with jobs: {', '.join(sorted(self.jobs))}")
+
+    def stop(self):
+        self._stop.set()
+        with self.app.app_context():
+            if self.is_leader:
+                release_lease(LEADER_LEASE, self.owner)
+                self.is_leader = False
+
+    def _loop(self):
+        # Jeda awal acak supaya proses yang start bersamaan tidak berebut di detik yang sama
+        self._stop.wait(random.uniform(0, self.tick_seconds))
+        while not self._stop.is_set():
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error(f"Scheduler tick failed: {str(e)}")
+            self._stop.wait(self.tick_seconds * random.uniform(0.8, 1.2))
+
+    def tick(self):
+        with self.app.app_context():
+            try:
+                self._run_process_jobs()
+
+                was_leader = self.is_leader
+                self.is_leader = acquire_lease(LEADER_LEASE, self.owner, self.lease_ttl)
+                if self.is_leader != was_leader:
+                    logger.info(f"Scheduler {self.owner} {'is now' if self.is_leader else 'is no longer'} leader")
+
+                # Lease job yang masih berjalan diperpanjang (leader atau bukan)
+                for name, future in list(self._running.items()):
+                    if future.done():
+                        del self._running[name]
+                    elif self.jobs[name].scope == 'cluster':
+                        acquire_lease(JOB_LEASE_PREFIX + name, self.owner, self.lease_ttl)
+
+                if self.is_leader:
+                    self._run_cluster_jobs()
+            finally:
+                db.session.remove()
+
+    # --- job per proses ---
+    def _run_process_jobs(self):
+        now = time.monotonic()
+        for job in self.jobs.values():
+            if job.scope != 'process' or job.name in self._running:
+                continue
+            due = self._local_next.get(job.name)
+            if due is not None and due > now:
+                continue
+            self._local_next[job.name] = now + job.interval * (1 + random.uniform(0, job.jitter))
+            self._running[job.name] = self._executor.submit(self._execute_local, job)
+
+    def _execute_local(self, job):
+        start = time.perf_counter()
+        with self.app.app_context():
+            try:
+                job.func(self.app)
+                logger.debug(f"Local job {job.name} finished in {time.perf_counter() - start:.2f}s")
+            except Exception as e:
+                logger.error(f"Local job {job.name} failed: {str(e)}")
+            finally:
+                db.session.remove()
+
+    # --- job cluster ---
+    def _ensure_job_rows(self, now):
+        for job in self.jobs.values():
+            if job.scope != 'cluster':
+                continue
+            # Run pertama disebar acak dalam satu interval
+            first_run = now + timedelta(seconds=random.uniform(0, job.interval * job.jitter))
+            db.session.execute(
+                insert(SchedulerJob)
+                .values(name=job.name, interval_seconds=job.interval, next_run_at=first_run, run_count=0)
+                .on_conflict_do_update(
+                    index_elements=[SchedulerJob.name],
+                    set_={'interval_seconds': job.interval}
+                )
+            )
+        db.session.commit()
+
+    def _run_cluster_jobs(self):
+        now = datetime.utcnow()
+        self._ensure_job_rows(now)
+
+        due = db.session.execute(
+            select(SchedulerJob.name).where(SchedulerJob.next_run_at <= now)
+        ).scalars().all()
+        for name in due:
+            job = self.jobs.get(name)
+            if job is None or job.scope != 'cluster' or name in self._running:
+                continue
+            if not acquire_lease(JOB_LEASE_PREFIX + name, self.owner, self.lease_ttl):
+                logger.info(f"Job {name} still running elsewhere, skipped")
+                continue
+
+            db.session.execute(
+                update(SchedulerJob)
+                .where(SchedulerJob.name == name)
+                .values(
+                    last_started_at=now,
+                    last_status='running',
+                    last_owner=self.owner,
+                    next_run_at=job.next_run(now)
+                )
+            )
+            db.session.commit()
+            self._running[name] = self._executor.submit(self._execute, job)
+
+    def _execute(self, job):
+        start = time.perf_counter()
+        status, error = 'ok', None
+        with self.app.app_context():
+            try:
+                job.func(self.app)
+            except Exception as e:
+                status, error = 'error', str(e)[:MAX_ERROR_LENGTH]
+                logger.error(f"Job {job.name} failed: {str(e)}")
+                db.session.rollback()
+
+            duration = round(time.perf_counter() - start, 3)
+            try:
+                db.session.execute(
+                    update(SchedulerJob)
+                    .where(SchedulerJob.name == job.name)
+                    .values(
+                        last_finished_at=datetime.utcnow(),
+                        last_status=status,
+                        last_duration=duration,
+                        last_error=error,
+                        run_count=SchedulerJob.run_count + 1
+                    )
+                )
+                db.session.commit()
+                release_lease(JOB_LEASE_PREFIX + job.name, self.owner)
+            finally:
+                db.session.remove()
+        logger.info(f"Job {job.name} finished: {status} in {duration}s")
+        return status
+
+    def _heartbeat(self, name, stop):
+        """Perpanjang lease job:<nama> setiap lease_ttl/3 detik sampai stop di-set"""
+        while not stop.wait(self.lease_ttl / 3):
+            with self.app.app_context():
+                try:
+                    if not renew_lease(JOB_LEASE_PREFIX + name, self.owner, self.lease_ttl):
+                        logger.warning(f"Job {name} lease lost while running")
+                        return
+                except Exception as e:
+                    logger.error(f"Job {name} lease renewal failed: {str(e)}")
+                finally:
+                    db.session.remove()
+
+    def run_job(self, name):
+        """
+        Jalankan satu job sekarang (untuk CLI / cron), tetap memakai lease job
+
+        Tanpa loop tick, lease diperpanjang oleh thread heartbeat selama job berjalan
+        """
+        job = self.jobs[name]
+        if job.scope != 'cluster':
+            self._execute_local(job)
+            return 'ok'
+
+        with self.app.app_context():
+            if not acquire_lease(JOB_LEASE_PREFIX + name, self.owner, self.lease_ttl):
+                return 'locked'
+            now = datetime.utcnow()
+            self._ensure_job_rows(now)
+            db.session.execute(
+                update(SchedulerJob)
+                .where(SchedulerJob.name == name)
+                .values(last_started_at=now, last_status='running', last_owner=self.owner,
+                        next_run_at=job.next_run(now))
+            )
+            db.session.commit()
+
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(name, stop),
+                                     name=f'lease-{name}', daemon=True)
+        heartbeat.start()
+        try:
+            return self._execute(job)
+        finally:
+            stop.set()
+            heartbeat.join()
+
+
+# === Job bawaan ===
+def drive_sync_job(app):
+    from .tasks import sync_google_drive_changes
+    sync_google_drive_changes()
+
+
+def reindex_job(app):
+    from .unified_search import DeepIndexer
+    count = DeepIndexer.index_drive_sync_state()
+    logger.info(f"Reindexed {count} Drive documents")
+
+
+def upload_gc_job(app):
+    from .blob_store import collect_garbage
+    collect_garbage(app.config['UPLOAD_FOLDER'])
+
+
+def session_purge_job(app):
+    store = getattr(app.session_interface, 'store', None)
+    backend = getattr(store, 'backend', store)
+    if hasattr(backend, 'purge_expired'):
+        backend.purge_expired()
+
+
+def cache_warm_job(app):
+    """Isi cache in-memory proses ini (pohon katalog, jadwal semua batch)"""
+    from .catalog_tree import CATALOG_TREE
+    from .schedule_cache import SCHEDULE_CACHE
+    from .models import Jadwal
+
+    CATALOG_TREE.get()
+    batch_ids = db.session.execute(select(Jadwal.batch_id).distinct()).scalars()
+    for batch_id in batch_ids:
+        if batch_id is not None:
+            SCHEDULE_CACHE.get(batch_id)
+
+
+def default_jobs():
+    from .blob_store import UPLOAD_GC_INTERVAL
+    from .schedule_cache import SCHEDULE_CACHE_TTL
+
+    return [
+        Job('drive_sync', drive_sync_job, _interval('drive_sync', 300)),
+        Job('reindex', reindex_job, _interval('reindex', 24 * 3600)),
+        Job('upload_gc', upload_gc_job, _interval('upload_gc', UPLOAD_GC_INTERVAL)),
+        Job('session_purge', session_purge_job, _interval('session_purge', 3600)),
+        # Sebelum cache jadwal kadaluarsa, supaya request peserta tidak kena miss
+        Job('cache_warm', cache_warm_job, _interval('cache_warm', max(SCHEDULE_CACHE_TTL - 60, 30)), scope='process')
+    ]
+
+
+def create_scheduler(app, jobs=None):
+    scheduler = Scheduler(app)
+    for job in jobs if jobs is not None else default_jobs():
+        scheduler.register(job)
+    return scheduler
+
+
+def start_scheduler(app):
+    """Jalankan scheduler di thread background proses ini (sekali per app)"""
+    scheduler = app.extensions.get('scheduler')
+    if scheduler is None:
+        scheduler = create_scheduler(app)
+        app.extensions['scheduler'] = scheduler
+        scheduler.start()
+    return scheduler
+
+
+def get_scheduler_status():
+    """Leader dan status terakhir setiap job (butuh app context)"""
+    lease = db.session.get(SchedulerLease, LEADER_LEASE)
+    jobs = db.session.execute(select(SchedulerJob).order_by(SchedulerJob.name)).scalars().all()
+    return {
+        'leader': lease.owner if lease and lease.expires_at > datetime.utcnow() else None,
+        'jobs': [
+            {
+                'name': job.name,
+                'interval_seconds': job.interval_seconds,
+                'next_run_at': job.next_run_at.isoformat() if job.next_run_at else None,
+                'last_started_at': job.last_started_at.isoformat() if job.last_started_at else None,
+                'last_status': job.last_status,
+                'last_duration': job.last_duration,
+                'last_error': job.last_error,
+                'last_owner': job.last_owner,
+                'run_count': job.run_count
+            }
+            for job in jobs
+        ]
+    }
+
+
+if __name__ == '__main__':
+    import json
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Scheduler job periodik')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('status', help='tampilkan leader dan status job')
+    sub.add_parser('run', help='jalankan loop scheduler di foreground (always-on task)')
+    run_job = sub.add_parser('run-job', help='jalankan satu job sekarang (cron / scheduled task)')
+    run_job.add_argument('name')
+    args = parser.parse_args()
+
+    from . import create_app
+    app = create_app()
+
+    if args.command == 'status':
+        with app.app_context():
+            print(json.dumps(get_scheduler_status(), indent=2))
+    elif args.command == 'run-job':
+        print(create_scheduler(app).run_job(args.name))
+    else:
+        scheduler = start_scheduler(app)
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            scheduler.stop()
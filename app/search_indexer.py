@@ -2,7 +2,6 @@ import os
 import json
 import re
 from pathlib import Path
-from bs4 import BeautifulSoup
 from .models import db, Document
 from datetime import datetime
 
@@ -67,6 +66,8 @@ class DocumentIndexer:
             with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
                 content = f.read()
             
+            # bs4 berat (~40ms): hanya dibutuhkan saat indexing, bukan saat boot
+            from bs4 import BeautifulSoup
             soup = BeautifulSoup(content, 'html.parser')
             
             # Extract title
@@ -184,8 +185,8 @@ class DocumentIndexer:
         return 'Lainnya'
     
     def clear_index(self):
-        """Hapus semua dokumen yang sudah diindex"""
-        Document.query.delete()
+        """Hapus semua dokumen arsip yang sudah diindex (dokumen Drive dikelola sync worker)"""
+        Document.query.filter_by(is_arsip=True).delete()
         db.session.commit()
         return True
 
@@ -0,0 +1,347 @@
+"""
+Session Store
+Session Flask di server (SQLite + LRU in-memory di depannya); cookie browser
+hanya berisi session id acak. Perubahan dari admin (akses, nama, hapus peserta)
+langsung diterapkan ke session peserta yang sedang login.
+"""
+
+import os
+import re
+import json
+import time
+import secrets
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from flask import current_app, session
+from flask.sessions import SessionInterface, SessionMixin
+from sqlalchemy import select, insert, update, delete, func
+from werkzeug.datastructures import CallbackDict
+from .models import db, UserSession
+from .auth import invalidate_principals
+
+logger = logging.getLogger(__name__)
+
+# 'sqlite' (default), 'memory' (satu proses, untuk development) atau 'cookie' (bawaan Flask)
+SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'sqlite')
+SESSION_CACHE_SIZE = int(os.getenv('SESSION_CACHE_SIZE', '10000'))
+# Umur entry LRU (detik): batas keterlambatan invalidasi di proses worker lain
+SESSION_CACHE_TTL = int(os.getenv('SESSION_CACHE_TTL', '10'))
+SESSION_PURGE_INTERVAL = 3600
+
+SID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{43}$')
+ID_CHUNK_SIZE = 500
+
+
+def new_sid():
+    return secrets.token_urlsafe(32)
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    """Isi session; perubahan ditandai modified supaya hanya ditulis jika perlu"""
+
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+            self.accessed = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.accessed = False
+        self.previous_sid = None
+
+    def regenerate(self):
+        """Ganti sid (dipakai saat login, mencegah session fixation)"""
+        if self.sid and not self.new:
+            self.previous_sid = self.sid
+        self.sid = None
+        self.modified = True
+
+
+# === Backend ===
+class MemorySessionStore:
+    """Session di memori proses (hilang saat restart, tidak dibagi antar worker)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}  # sid -> (expires_at, user_id, data)
+
+    def load(self, sid):
+        with self._lock:
+            entry = self._data.get(sid)
+        if entry is None or entry[0] <= datetime.utcnow():
+            return None
+        return dict(entry[2])
+
+    def save(self, sid, data, expires_at, user_id=None):
+        with self._lock:
+            self._data[sid] = (expires_at, user_id, dict(data))
+
+    def delete(self, sid):
+        with self._lock:
+            self._data.pop(sid, None)
+
+    def update_users(self, user_ids, values):
+        user_ids = set(user_ids)
+        with self._lock:
+            for sid, (expires_at, user_id, data) in list(self._data.items()):
+                if user_id in user_ids:
+                    self._data[sid] = (expires_at, user_id, {**data, **values})
+
+    def delete_users(self, user_ids):
+        user_ids = set(user_ids)
+        with self._lock:
+            for sid in [sid for sid, entry in self._data.items() if entry[1] in user_ids]:
+                del self._data[sid]
+
+
+class SqliteSessionStore:
+    """Session di tabel user_session (users.db), dibagi semua proses worker"""
+
+    def __init__(self, database=db):
+        self.db = database
+        self.table = UserSession.__table__
+        self._last_purge = 0.0
+
+    def load(self, sid):
+        with self.db.engine.connect() as conn:
+            row = conn.execute(
+                select(self.table.c.data).where(
+                    self.table.c.sid == sid,
+                    self.table.c.expires_at > datetime.utcnow()
+                )
+            ).first()
+        if row is None:
+            return None
+        try:
+            return json.loads(row.data)
+        except ValueError:
+            return None
+
+    def save(self, sid, data, expires_at, user_id=None):
+        values = {
+            'data': json.dumps(data),
+            'user_id': user_id,
+            'expires_at': expires_at,
+            'tanggal_diupdate': datetime.utcnow()
+        }
+        with self.db.engine.begin() as conn:
+            result = conn.execute(update(self.table).where(self.table.c.sid == sid).values(**values))
+            if result.rowcount == 0:
+                conn.execute(insert(self.table).values(sid=sid, **values))
+        self._maybe_purge()
+
+    def delete(self, sid):
+        with self.db.engine.begin() as conn:
+            conn.execute(delete(self.table).where(self.table.c.sid == sid))
+
+    def update_users(self, user_ids, values):
+        """Ubah key session semua peserta user_ids dengan satu UPDATE json_set per potongan"""
+        args = []
+        for key, value in values.items():
+            args.extend([f'$.{key}', func.json(json.dumps(value))])
+        user_ids = sorted(set(user_ids))
+        with self.db.engine.begin() as conn:
+            for start in range(0, len(user_ids), ID_CHUNK_SIZE):
+                conn.execute(
+                    update(self.table)
+                    .where(self.table.c.user_id.in_(user_ids[start:start + ID_CHUNK_SIZE]))
+                    .values(data=func.json_set(self.table.c.data, *args))
+                )
+
+    def delete_users(self, user_ids):
+        user_ids = sorted(set(user_ids))
+        with self.db.engine.begin() as conn:
+            for start in range(0, len(user_ids), ID_CHUNK_SIZE):
+                conn.execute(
+                    delete(self.table).where(self.table.c.user_id.in_(user_ids[start:start + ID_CHUNK_SIZE]))
+                )
+
+    def purge_expired(self):
+        with self.db.engine.begin() as conn:
+            result = conn.execute(delete(self.table).where(self.table.c.expires_at <= datetime.utcnow()))
+        if result.rowcount:
+            logger.info(f"Purged {result.rowcount} expired sessions")
+        return result.rowcount
+
+    def _maybe_purge(self):
+        now = time.monotonic()
+        if now - self._last_purge >= SESSION_PURGE_INTERVAL:
+            self._last_purge = now
+            self.purge_expired()
+
+
+class LruSessionStore:
+    """
+    LRU in-memory di depan backend lain
+
+    - load() hanya ke backend jika sid tidak ada di LRU atau sudah lewat ttl
+    - save() write-through ke backend
+    - update_users()/delete_users() langsung membuang entry LRU peserta terkait
+    """
+
+    def __init__(self, backend, maxsize=SESSION_CACHE_SIZE, ttl=SESSION_CACHE_TTL):
+        self.backend = backend
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()  # sid -> (cached_until, user_id, data)
+        self.hits = 0
+        self.misses = 0
+
+    def _put(self, sid, user_id, data):
+        with self._lock:
+            self._cache[sid] = (time.monotonic() + self.ttl, user_id, dict(data))
+            self._cache.move_to_end(sid)
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+
+    def load(self, sid):
+        with self._lock:
+            entry = self._cache.get(sid)
+            if entry is not None and entry[0] > time.monotonic():
+                self._cache.move_to_end(sid)
+                self.hits += 1
+                return dict(entry[2])
+
+        self.misses += 1
+        data = self.backend.load(sid)
+        if data is not None:
+            self._put(sid, data.get('user_id'), data)
+        return data
+
+    def save(self, sid, data, expires_at, user_id=None):
+        self.backend.save(sid, data, expires_at, user_id)
+        self._put(sid, user_id, data)
+
+    def delete(self, sid):
+        with self._lock:
+            self._cache.pop(sid, None)
+        self.backend.delete(sid)
+
+    def _evict_users(self, user_ids):
+        user_ids = set(user_ids)
+        with self._lock:
+            for sid in [sid for sid, entry in self._cache.items() if entry[1] in user_ids]:
+                del self._cache[sid]
+
+    def update_users(self, user_ids, values):
+        self.backend.update_users(user_ids, values)
+        self._evict_users(user_ids)
+
+    def delete_users(self, user_ids):
+        self.backend.delete_users(user_ids)
+        self._evict_users(user_ids)
+
+    def get_stats(self):
+        return {'cached': len(self._cache), 'hits': self.hits, 'misses': self.misses}
+
+
+# === Flask session interface ===
+class ServerSessionInterface(SessionInterface):
+    """Cookie = sid acak; isi session disimpan di store"""
+
+    def __init__(self, store):
+        self.store = store
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid and SID_PATTERN.match(sid):
+            data = self.store.load(sid)
+            if data is not None:
+                return ServerSession(data, sid=sid)
+        return ServerSession(new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        if session.previous_sid:
+            self.store.delete(session.previous_sid)
+            session.previous_sid = None
+
+        if not session:
+            if session.modified:
+                if session.sid and not session.new:
+                    self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path, secure=secure,
+                                       samesite=samesite, httponly=httponly)
+                response.vary.add('Cookie')
+            return
+
+        # Tulis ke store hanya jika isi session berubah
+        if not session.modified and session.sid:
+            return
+
+        if not session.sid:
+            session.sid = new_sid()
+        expires_at = datetime.utcnow() + app.permanent_session_lifetime
+        self.store.save(session.sid, dict(session), expires_at, session.get('user_id'))
+
+        response.set_cookie(
+            name,
+            session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=httponly,
+            domain=domain,
+            path=path,
+            secure=secure,
+            samesite=samesite
+        )
+        response.vary.add('Cookie')
+
+
+def init_session_store(app):
+    """Pasang session server-side sesuai SESSION_BACKEND"""
+    backend = app.config.setdefault('SESSION_BACKEND', SESSION_BACKEND)
+    if backend == 'cookie':
+        return None
+    if backend == 'memory':
+        store = MemorySessionStore()
+    elif backend == 'sqlite':
+        store = LruSessionStore(SqliteSessionStore(db))
+    else:
+        raise ValueError(f"Unknown SESSION_BACKEND: {backend}")
+
+    app.session_interface = ServerSessionInterface(store)
+    logger.info(f"Server-side sessions enabled ({backend})")
+    return store
+
+
+def _get_store():
+    interface = current_app.session_interface
+    return interface.store if isinstance(interface, ServerSessionInterface) else None
+
+
+def sync_user_sessions(user_ids, **values):
+    """Terapkan perubahan data peserta ke session yang sedang login (mis. akses_workshop)"""
+    store = _get_store()
+    user_ids = list(user_ids)
+    invalidate_principals(user_ids)
+    if store is not None and user_ids and values:
+        store.update_users(user_ids, values)
+
+
+def regenerate_session():
+    """Sid baru setelah login (hanya untuk session server-side)"""
+    if isinstance(session, ServerSession):
+        session.regenerate()
+
+
+def revoke_user_sessions(user_ids):
+    """Logout paksa semua session peserta user_ids"""
+    store = _get_store()
+    user_ids = list(user_ids)
+    invalidate_principals(user_ids)
+    if store is not None and user_ids:
+        store.delete_users(user_ids)
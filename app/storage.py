@@ -0,0 +1,84 @@
+"""
+Storage Configuration
+Pengaturan koneksi SQLite untuk database utama (users.db): WAL dan PRAGMA tuning
+"""
+
+import os
+import logging
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# Default bisa diubah lewat environment variable dengan nama yang sama
+SQLITE_DEFAULTS = {
+    'SQLITE_JOURNAL_MODE': 'WAL',        # pembaca tidak diblok oleh penulis
+    'SQLITE_SYNCHRONOUS': 'NORMAL',      # aman untuk WAL, fsync lebih sedikit
+    'SQLITE_CACHE_SIZE': -20000,         # negatif = KiB (~20 MB per koneksi)
+    'SQLITE_MMAP_SIZE': 128 * 1024 * 1024,
+    'SQLITE_TEMP_STORE': 'MEMORY',
+    'SQLITE_BUSY_TIMEOUT': 5000          # ms, tunggu lock daripada "database is locked"
+}
+
+
+def load_sqlite_config(app):
+    """Isi app.config dengan pengaturan SQLite (environment > default)"""
+    for key, default in SQLITE_DEFAULTS.items():
+        value = os.getenv(key)
+        if value is None:
+            app.config.setdefault(key, default)
+        elif isinstance(default, int):
+            app.config[key] = int(value)
+        else:
+            app.config[key] = value
+
+    # Timeout driver sqlite3 (detik) disamakan dengan busy_timeout
+    options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    connect_args = options.setdefault('connect_args', {})
+    connect_args.setdefault('timeout', app.config['SQLITE_BUSY_TIMEOUT'] / 1000)
+
+
+def sqlite_pragmas(config):
+    """Daftar PRAGMA yang dijalankan di setiap koneksi baru"""
+    return [
+        f"PRAGMA journal_mode={config['SQLITE_JOURNAL_MODE']}",
+        f"PRAGMA synchronous={config['SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA cache_size={int(config['SQLITE_CACHE_SIZE'])}",
+        f"PRAGMA mmap_size={int(config['SQLITE_MMAP_SIZE'])}",
+        f"PRAGMA temp_store={config['SQLITE_TEMP_STORE']}",
+        f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT'])}"
+    ]
+
+
+def configure_sqlite(app, db):
+    """
+    Pasang PRAGMA ke setiap koneksi pool SQLAlchemy
+    Harus dipanggil di dalam app context, sebelum query pertama
+    """
+    engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return
+
+    pragmas = sqlite_pragmas(app.config)
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+    # Koneksi yang mungkin sudah terbuka sebelum listener dipasang
+    engine.dispose()
+    logger.info(f"SQLite configured: {', '.join(p.split(' ', 1)[1] for p in pragmas)}")
+
+
+def get_sqlite_settings(db):
+    """Nilai PRAGMA yang aktif saat ini (untuk monitoring)"""
+    with db.engine.connect() as conn:
+        return {
+            name: conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+            for name in ('journal_mode', 'synchronous', 'cache_size',
+                         'mmap_size', 'temp_store', 'busy_timeout')
+        }
@@ -6,11 +6,11 @@ Sinkronisasi file dari Google Drive secara otomatis
 import os
 import time
 import logging
-import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from app.models import db
+from app.drive_api import DriveClient, build_drive_service, METRICS as DRIVE_API_METRICS
+from app.models import db, DriveSyncToken, DriveSyncFile
+from app.unified_search import DeepIndexer
 
 # Setup logging
 logging.basicConfig(
@@ -19,8 +19,6 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-SCOPES = ['https://www.googleapis.com/auth/drive.readonly']
-
 # Folder ID mapping dari RECOMMENDATIONS.md
 FOLDER_IDS = {
     "EBOOKS": "12ffd7GqHAiy3J62Vu65LbVt6-ultog5Z",
@@ -29,8 +27,21 @@ FOLDER_IDS = {
     "Service Manual 2": "1_SsZ7SkaZxvXUZ6RUAA_o7WR_GAtgEwT"
 }
 
-# Cache untuk tracking file yang sudah disinkronisasi
-FILE_SYNC_CACHE = {}
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+
+# pageSize maksimum yang diizinkan files.list
+DRIVE_MAX_PAGE_SIZE = 1000
+
+# Jumlah listing folder yang berjalan bersamaan
+SYNC_MAX_WORKERS = int(os.getenv('DRIVE_SYNC_WORKERS', '4'))
+
+# Metrik sync terakhir (per folder)
+SYNC_METRICS = {
+    'mode': None,
+    'started_at': None,
+    'duration_seconds': None,
+    'folders': []
+}
 
 def get_drive_service():
     """Inisialisasi Google Drive service dengan credentials"""
@@ -46,151 +57,649 @@ def get_drive_service():
             logger.warning(f"credentials.json not found at {creds_path}")
             return None
         
-        creds = service_account.Credentials.from_service_account_file(
-            creds_path, 
-            scopes=SCOPES
-        )
-        
-        return build('drive', 'v3', credentials=creds)
+        # Credentials dan discovery document di-cache di app/drive_api.py
+        return build_drive_service(creds_path)
     
     except Exception as e:
         logger.error(f"Failed to initialize Drive service: {str(e)}")
         return None
 
-def sync_google_drive_files():
+class DriveFolderLister:
     """
-    Sinkronisasi file dari Google Drive ke database
-    Jalankan setiap 5 menit
+    Listing rekursif folder Google Drive
+
+    - Mengikuti nextPageToken sampai habis dengan pageSize maksimum
+    - Subfolder ikut di-list (rekursif)
+    - Listing folder dijalankan paralel dengan worker pool terbatas
+    - Client Drive dibuat lewat service_factory (satu per thread, karena
+      httplib2 tidak thread-safe) sehingga bisa diganti client palsu untuk testing
+    - Request lewat DriveClient: budget, retry saat rate limit, dan metrik
+    """
+    
+    FILE_FIELDS = 'id, name, mimeType, modifiedTime, webViewLink, size, parents'
+    
+    def __init__(self, service_factory=None, max_workers=SYNC_MAX_WORKERS, page_size=DRIVE_MAX_PAGE_SIZE):
+        self.client = DriveClient(service_factory or get_drive_service)
+        self.max_workers = max_workers
+        self.page_size = page_size
+        self.metrics = []
+        self.failed = set()
+    
+    def list_folder(self, folder_id):
+        """
+        List isi satu folder (semua halaman)
+        
+        Returns:
+            tuple: (files, subfolders, pages)
+        """
+        service = self.client.service()
+        files = []
+        subfolders = []
+        pages = 0
+        page_token = None
+        
+        while True:
+            results = self.client.execute('files.list', service.files().list(
+                q=f"'{folder_id}' in parents and trashed=false",
+                spaces='drive',
+                fields=f'nextPageToken, files({self.FILE_FIELDS})',
+                pageSize=self.page_size,
+                pageToken=page_token,
+                supportsAllDrives=True,
+                includeItemsFromAllDrives=True
+            ))
+            pages += 1
+            
+            for item in results.get('files', []):
+                if item.get('mimeType') == FOLDER_MIME_TYPE:
+                    subfolders.append(item)
+                else:
+                    files.append(item)
+            
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                break
+        
+        return files, subfolders, pages
+    
+    def _timed_list(self, category, folder_id, path):
+        start = time.perf_counter()
+        files, subfolders, pages = self.list_folder(folder_id)
+        metric = {
+            'category': category,
+            'folder_id': folder_id,
+            'path': path,
+            'files': len(files),
+            'subfolders': len(subfolders),
+            'pages': pages,
+            'seconds': round(time.perf_counter() - start, 3)
+        }
+        return files, subfolders, metric
+    
+    def list_all(self, folders):
+        """
+        List semua file di folder root beserta subfolder-nya
+        
+        Args:
+            folders (dict): {category: folder_id}
+        
+        Returns:
+            dict: {category: [file, ...]} - setiap file diberi key 'folder_path'.
+            Subfolder yang ditemukan disimpan di self.subfolders ({category: [folder, ...]}),
+            kategori yang listing-nya gagal di self.failed
+        """
+        results = {category: [] for category in folders}
+        failed = set()
+        self.metrics = []
+        self.subfolders = {category: [] for category in folders}
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = {
+                executor.submit(self._timed_list, category, folder_id, category): category
+                for category, folder_id in folders.items()
+            }
+            
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    category = pending.pop(future)
+                    try:
+                        files, subfolders, metric = future.result()
+                    except Exception as e:
+                        logger.error(f"Error listing {category}: {str(e)}")
+                        failed.add(category)
+                        continue
+                    
+                    self.metrics.append(metric)
+                    for file in files:
+                        file['folder_path'] = metric['path']
+                    results[category].extend(files)
+                    
+                    for folder in subfolders:
+                        folder['folder_path'] = metric['path']
+                        self.subfolders[category].append(folder)
+                        path = f"{metric['path']}/{folder['name']}"
+                        pending[executor.submit(self._timed_list, category, folder['id'], path)] = category
+        
+        # Kategori dengan listing yang gagal tidak dikembalikan, supaya
+        # file-nya tidak dianggap terhapus
+        for category in failed:
+            results.pop(category, None)
+            self.subfolders.pop(category, None)
+        self.failed = failed
+        
+        return results
+
+
+def _sync_values(file, is_folder=False):
+    return {
+        'nama': file['name'],
+        'mime_type': file.get('mimeType'),
+        'folder_path': file.get('folder_path'),
+        'is_folder': is_folder,
+        'last_modified': file.get('modifiedTime'),
+        'tanggal_sync': datetime.utcnow()
+    }
+
+
+def _new_document_changes():
+    """Penampung perubahan yang akan ditulis ke tabel Document setelah sync"""
+    return {'upsert': [], 'remove': []}
+
+
+def _write_documents(documents):
+    """Tulis perubahan sync ke Document (indeks pencarian dokumen pembelajaran)"""
+    upserts = list(documents['upsert'])
+    queued = {file['id'] for _, file in upserts}
+    # File yang hilang dari satu kategori tapi masih ada di kategori lain: Document
+    # tidak dihapus, melainkan ditulis ulang dari baris yang tersisa
+    for row in DeepIndexer.synced_drive_files(documents['remove']):
+        if row.file_id not in queued:
+            queued.add(row.file_id)
+            upserts.append((row.kategori, DeepIndexer.drive_file_from_row(row)))
+    removed = DeepIndexer.remove_drive_documents(documents['remove'])
+    upserted = DeepIndexer.upsert_drive_documents(upserts)
+    logger.info(f"Search index updated - Upserted: {upserted}, Removed: {removed}")
+
+
+def _diff_category(category, remote_files, remote_folders, documents):
+    """
+    Bandingkan hasil listing Drive dengan status sync di database (set-based)
+    File baru/berubah/terhapus dicatat di documents untuk indeks pencarian
+    
+    Returns:
+        tuple: (added, updated, deleted)
+    """
+    local = {
+        row.file_id: row
+        for row in DriveSyncFile.query.filter_by(kategori=category).all()
+    }
+    remote = {f['id']: (f, False) for f in remote_files}
+    remote.update({f['id']: (f, True) for f in remote_folders})
+    
+    new_ids = remote.keys() - local.keys()
+    removed_ids = local.keys() - remote.keys()
+    common_ids = remote.keys() & local.keys()
+    
+    added = updated = 0
+    for file_id in new_ids:
+        file, is_folder = remote[file_id]
+        db.session.add(DriveSyncFile(kategori=category, file_id=file_id, **_sync_values(file, is_folder)))
+        if not is_folder:
+            logger.info(f"[NEW] {category}: {file['name']}")
+            added += 1
+            documents['upsert'].append((category, file))
+    
+    for file_id in common_ids:
+        file, is_folder = remote[file_id]
+        row = local[file_id]
+        if row.last_modified != file.get('modifiedTime') or row.folder_path != file.get('folder_path'):
+            for key, value in _sync_values(file, is_folder).items():
+                setattr(row, key, value)
+            if not is_folder:
+                logger.info(f"[UPDATED] {category}: {file['name']}")
+                updated += 1
+                documents['upsert'].append((category, file))
+    
+    deleted = 0
+    for file_id in removed_ids:
+        row = local[file_id]
+        if not row.is_folder:
+            logger.info(f"[DELETED] {category}: {row.nama}")
+            deleted += 1
+            documents['remove'].append(file_id)
+        db.session.delete(row)
+    
+    db.session.commit()
+    return added, updated, deleted
+
+
+def sync_google_drive_files(service_factory=None, max_workers=SYNC_MAX_WORKERS):
+    """
+    Sinkronisasi file dari Google Drive ke database (full listing)
+    Jalankan setiap 5 menit, di dalam app context
+    
+    Args:
+        service_factory: callable yang mengembalikan client Drive
+            (default: get_drive_service, bisa diganti client palsu)
+        max_workers: jumlah listing folder paralel
+    
+    Returns:
+        bool: True jika semua kategori berhasil di-sync. False jika ada kategori
+        yang gagal (page token changes tidak boleh disimpan, perubahan di
+        kategori itu belum tercatat)
     """
     try:
-        drive_service = get_drive_service()
+        lister = DriveFolderLister(service_factory, max_workers=max_workers)
         
-        if not drive_service:
+        try:
+            lister.client.service()
+        except RuntimeError:
             logger.warning("Google Drive service not available - skipping sync")
-            return
+            return False
         
         logger.info("Starting Google Drive sync...")
+        started = time.perf_counter()
+        SYNC_METRICS['started_at'] = datetime.utcnow().isoformat()
+        SYNC_METRICS['mode'] = 'full'
         
         sync_count = 0
+        update_count = 0
         delete_count = 0
         
-        for category, folder_id in FOLDER_IDS.items():
+        listing = lister.list_all(FOLDER_IDS)
+        failed = set(lister.failed)
+        documents = _new_document_changes()
+        
+        for category, files in listing.items():
             try:
-                # Query semua file di folder
-                query = f"'{folder_id}' in parents and trashed=false"
-                results = drive_service.files().list(
-                    q=query,
-                    spaces='drive',
-                    fields='files(id, name, mimeType, modifiedTime, webViewLink)',
-                    pageSize=100
-                ).execute()
-                
-                files = results.get('files', [])
                 logger.info(f"Found {len(files)} files in {category}")
-                
-                # Process setiap file
-                for file in files:
-                    file_id = file['id']
-                    file_name = file['name']
-                    file_mime = file['mimeType']
-                    modified_time = file['modifiedTime']
-                    
-                    # Cek apakah file sudah di-cache
-                    cache_key = f"{category}:{file_id}"
-                    
-                    if cache_key not in FILE_SYNC_CACHE:
-                        # File baru
-                        FILE_SYNC_CACHE[cache_key] = {
-                            'name': file_name,
-                            'last_modified': modified_time,
-                            'sync_time': datetime.utcnow().isoformat()
-                        }
-                        
-                        logger.info(f"[NEW] {category}: {file_name}")
-                        sync_count += 1
-                        
-                        # TODO: Simpan ke database jika perlu
-                        # save_file_to_db(file, category)
-                    
-                    else:
-                        # File sudah ada, cek apakah ada update
-                        cached = FILE_SYNC_CACHE[cache_key]
-                        if cached['last_modified'] != modified_time:
-                            logger.info(f"[UPDATED] {category}: {file_name}")
-                            cached['last_modified'] = modified_time
-                            cached['sync_time'] = datetime.utcnow().isoformat()
-                            # TODO: Update di database
-                
-                # Cek file yang sudah dihapus
-                removed_files = [
-                    key for key in FILE_SYNC_CACHE.keys()
-                    if key.startswith(f"{category}:")
-                    and key not in [f"{category}:{f['id']}" for f in files]
-                ]
-                
-                for removed_key in removed_files:
-                    file_name = FILE_SYNC_CACHE[removed_key]['name']
-                    del FILE_SYNC_CACHE[removed_key]
-                    logger.info(f"[DELETED] {category}: {file_name}")
-                    delete_count += 1
-                    # TODO: Hapus dari database
+                category_documents = _new_document_changes()
+                added, updated, deleted = _diff_category(
+                    category, files, lister.subfolders[category], category_documents
+                )
+                documents['upsert'].extend(category_documents['upsert'])
+                documents['remove'].extend(category_documents['remove'])
+                sync_count += added
+                update_count += updated
+                delete_count += deleted
             
             except Exception as e:
+                db.session.rollback()
                 logger.error(f"Error syncing {category}: {str(e)}")
+                failed.add(category)
                 continue
         
+        _write_documents(documents)
+        
+        SYNC_METRICS['duration_seconds'] = round(time.perf_counter() - started, 3)
+        SYNC_METRICS['folders'] = lister.metrics
+        
         logger.info(
             f"Sync completed - Added: {sync_count}, "
+            f"Updated: {update_count}, "
             f"Deleted: {delete_count}, "
-            f"Total cached: {len(FILE_SYNC_CACHE)}"
+            f"Folders: {len(lister.metrics)}, "
+            f"Duration: {SYNC_METRICS['duration_seconds']}s"
         )
+        if failed:
+            logger.warning(f"Sync incomplete, failed categories: {', '.join(sorted(failed))}")
+            return False
+        return True
     
     except Exception as e:
         logger.error(f"Google Drive sync failed: {str(e)}")
+        return False
+
+
+# ========== DELTA SYNC (Drive Changes API) ==========
+
+CHANGES_TOKEN_NAME = 'changes'
+
+CHANGE_FIELDS = (
+    'nextPageToken, newStartPageToken, '
+    'changes(changeType, fileId, removed, '
+    'file(id, name, mimeType, modifiedTime, webViewLink, size, parents, trashed))'
+)
+
+
+def _load_page_token():
+    state = DriveSyncToken.query.filter_by(nama=CHANGES_TOKEN_NAME).first()
+    return state.page_token if state else None
+
+
+def _save_page_token(page_token):
+    state = DriveSyncToken.query.filter_by(nama=CHANGES_TOKEN_NAME).first()
+    if not state:
+        state = DriveSyncToken(nama=CHANGES_TOKEN_NAME)
+        db.session.add(state)
+    state.page_token = page_token
+    db.session.commit()
 
-def start_background_sync_worker():
+
+def _is_invalid_token_error(error):
+    """Token changes kadaluarsa/tidak valid -> Drive mengembalikan 400 atau 404"""
+    from googleapiclient.errors import HttpError
+
+    status = getattr(getattr(error, 'resp', None), 'status', None)
+    return isinstance(error, HttpError) and int(status or 0) in (400, 404)
+
+
+def _parent_folder(file):
+    """
+    Cari folder induk (root kategori atau subfolder yang sudah tersinkron)
+    
+    Returns:
+        tuple: (kategori, folder_path) atau (None, None) jika di luar tree
+    """
+    parents = file.get('parents') or []
+    for category, folder_id in FOLDER_IDS.items():
+        if folder_id in parents:
+            return category, category
+    
+    if parents:
+        row = DriveSyncFile.query.filter(
+            DriveSyncFile.file_id.in_(parents),
+            DriveSyncFile.is_folder == True
+        ).first()
+        if row:
+            return row.kategori, f"{row.folder_path}/{row.nama}"
+    
+    return None, None
+
+
+def _upsert_sync_file(category, file, documents, is_folder=False):
+    """
+    Simpan satu file/folder hasil changes.list ke status sync
+    
+    Returns:
+        str: 'new', 'updated', atau None jika tidak ada perubahan
+    """
+    row = DriveSyncFile.query.filter_by(kategori=category, file_id=file['id']).first()
+    if not row:
+        db.session.add(DriveSyncFile(kategori=category, file_id=file['id'], **_sync_values(file, is_folder)))
+        if not is_folder:
+            logger.info(f"[NEW] {category}: {file['name']}")
+            documents['upsert'].append((category, file))
+        return 'new'
+    
+    if (row.last_modified != file.get('modifiedTime') or row.folder_path != file.get('folder_path')
+            or row.nama != file['name']):
+        old_path = f"{row.folder_path}/{row.nama}"
+        for key, value in _sync_values(file, is_folder).items():
+            setattr(row, key, value)
+        if is_folder and old_path != f"{row.folder_path}/{row.nama}":
+            _move_folder_contents(category, old_path, f"{row.folder_path}/{row.nama}", documents)
+        if not is_folder:
+            logger.info(f"[UPDATED] {category}: {file['name']}")
+            documents['upsert'].append((category, file))
+        return 'updated'
+    
+    return None
+
+
+def _move_folder_contents(category, old_path, new_path, documents):
+    """
+    Folder di-rename/dipindah: ganti prefix folder_path semua isinya (file dan
+    subfolder, semua level) beserta Document-nya, dalam transaksi yang sama
+    
+    Returns:
+        int: jumlah baris yang dipindah
     """
-    Jalankan sync worker di background thread
-    Sinkronisasi setiap 5 menit
+    children = DriveSyncFile.query.filter(
+        DriveSyncFile.kategori == category,
+        (DriveSyncFile.folder_path == old_path)
+        | DriveSyncFile.folder_path.startswith(f"{old_path}/", autoescape=True)
+    ).all()
+    files = []
+    moved = {}
+    for child in children:
+        child.folder_path = new_path + child.folder_path[len(old_path):]
+        if not child.is_folder:
+            moved[child.file_id] = child.folder_path
+            files.append((category, DeepIndexer.drive_file_from_row(child)))
+    DeepIndexer.update_drive_document_paths(files)
+    # Upsert yang sudah dicatat sebelumnya di run ini jangan menulis path lama
+    for _, file in documents['upsert']:
+        if file['id'] in moved:
+            file['folder_path'] = moved[file['id']]
+    logger.info(f"[MOVED] {category}: {old_path} -> {new_path} ({len(children)} items)")
+    return len(children)
+
+
+def _delete_sync_row(row, documents):
     """
-    def worker():
-        logger.info("Background sync worker started")
+    Hapus file/folder dari status sync (folder ikut menghapus isinya)
+    
+    Returns:
+        int: jumlah file (bukan folder) yang dihapus
+    """
+    deleted = 0
+    if row.is_folder:
+        path = f"{row.folder_path}/{row.nama}"
+        children = DriveSyncFile.query.filter(
+            DriveSyncFile.kategori == row.kategori,
+            (DriveSyncFile.folder_path == path)
+            | DriveSyncFile.folder_path.startswith(f"{path}/", autoescape=True)
+        ).all()
+        for child in children:
+            if not child.is_folder:
+                logger.info(f"[DELETED] {child.kategori}: {child.nama}")
+                deleted += 1
+                documents['remove'].append(child.file_id)
+            db.session.delete(child)
+    else:
+        logger.info(f"[DELETED] {row.kategori}: {row.nama}")
+        deleted += 1
+        documents['remove'].append(row.file_id)
+    
+    db.session.delete(row)
+    return deleted
+
+
+def _full_sync_with_new_token(client, service_factory, max_workers):
+    """Ambil startPageToken baru, lalu full listing sebagai baseline"""
+    # Token diambil sebelum listing supaya perubahan selama listing tidak terlewat
+    start_token = client.execute(
+        'changes.getStartPageToken',
+        client.service().changes().getStartPageToken(supportsAllDrives=True)
+    )['startPageToken']
+    # Ada kategori gagal -> token tidak disimpan, run berikutnya full sync lagi
+    if sync_google_drive_files(service_factory, max_workers=max_workers):
+        _save_page_token(start_token)
+
+
+def sync_google_drive_changes(service_factory=None, max_workers=SYNC_MAX_WORKERS):
+    """
+    Sinkronisasi inkremental memakai Drive changes.list
+    
+    Hanya perubahan sejak page token terakhir yang diambil. Full listing
+    hanya dijalankan jika belum ada token, token tidak valid, atau tabel
+    status sync masih kosong.
+    Harus dijalankan di dalam app context (token disimpan di database).
+    """
+    try:
+        service_factory = service_factory or get_drive_service
+        client = DriveClient(service_factory)
+        try:
+            service = client.service()
+        except RuntimeError:
+            logger.warning("Google Drive service not available - skipping sync")
+            return
         
-        while True:
-            try:
-                sync_google_drive_files()
-            except Exception as e:
-                logger.error(f"Error in sync worker: {str(e)}")
+        page_token = _load_page_token()
+        if not page_token or not DriveSyncFile.query.first():
+            logger.info("No change token / sync state - running full sync")
+            _full_sync_with_new_token(client, service_factory, max_workers)
+            return
+        
+        started = time.perf_counter()
+        changes = []
+        new_start_token = None
+        api_calls = 0
+        
+        try:
+            while page_token:
+                results = client.execute('changes.list', service.changes().list(
+                    pageToken=page_token,
+                    spaces='drive',
+                    fields=CHANGE_FIELDS,
+                    pageSize=DRIVE_MAX_PAGE_SIZE,
+                    includeRemoved=True,
+                    supportsAllDrives=True,
+                    includeItemsFromAllDrives=True
+                ))
+                api_calls += 1
+                changes.extend(results.get('changes', []))
+                new_start_token = results.get('newStartPageToken')
+                page_token = results.get('nextPageToken')
+        except Exception as e:
+            if not _is_invalid_token_error(e):
+                raise
+            logger.warning(f"Change token invalid ({str(e)}) - falling back to full sync")
+            _full_sync_with_new_token(client, service_factory, max_workers)
+            return
+        
+        # Change tanpa metadata lengkap (mis. tanpa parents) dilengkapi lewat batch request
+        incomplete = [
+            change['fileId'] for change in changes
+            if change.get('changeType', 'file') == 'file'
+            and not change.get('removed')
+            and 'parents' not in (change.get('file') or {})
+        ]
+        if incomplete:
+            metadata = client.batch_get_metadata(incomplete, fields=DriveFolderLister.FILE_FIELDS + ', trashed')
+            api_calls += (len(incomplete) + 99) // 100
+            missing = set(incomplete) - set(metadata)
+            if missing:
+                # Gagal ambil metadata != file dihapus: tanpa parents file akan dianggap
+                # keluar tree. Token lama dipakai lagi, run berikutnya mencoba ulang
+                logger.warning(
+                    f"Metadata fetch failed for {len(missing)} changed files "
+                    f"({', '.join(sorted(missing)[:5])}), keeping old page token"
+                )
+                return
+            for change in changes:
+                if change['fileId'] in metadata:
+                    change['file'] = metadata[change['fileId']]
+        
+        added = updated = deleted = 0
+        new_folders = {}
+        documents = _new_document_changes()
+        
+        for change in changes:
+            if change.get('changeType', 'file') != 'file':
+                continue
+            
+            file_id = change['fileId']
+            file = dict(change.get('file') or {})
+            category = folder_path = None
+            if not change.get('removed') and not file.get('trashed'):
+                category, folder_path = _parent_folder(file)
+            is_folder = file.get('mimeType') == FOLDER_MIME_TYPE
+            
+            # File dihapus, di-trash, atau dipindah keluar tree/kategori
+            for row in DriveSyncFile.query.filter_by(file_id=file_id).all():
+                if row.kategori != category:
+                    deleted += _delete_sync_row(row, documents)
+            
+            if not category:
+                continue
             
-            # Sleep 5 menit
-            time.sleep(300)
+            file['folder_path'] = folder_path
+            result = _upsert_sync_file(category, file, documents, is_folder)
+            if is_folder:
+                # Folder baru masuk ke tree: isinya perlu di-list
+                if result == 'new':
+                    new_folders[file_id] = (category, f"{folder_path}/{file['name']}")
+            elif result == 'new':
+                added += 1
+            elif result == 'updated':
+                updated += 1
+            
+            # Flush supaya lookup folder induk pada change berikutnya melihat baris ini
+            db.session.flush()
+        
+        # List isi folder yang baru masuk ke tree
+        incomplete_folders = []
+        for folder_id, (category, path) in new_folders.items():
+            lister = DriveFolderLister(service_factory, max_workers=max_workers)
+            listing = lister.list_all({path: folder_id})
+            incomplete_folders.extend(lister.failed)
+            for folder in lister.subfolders.get(path, []):
+                _upsert_sync_file(category, folder, documents, is_folder=True)
+            for file in listing.get(path, []):
+                if _upsert_sync_file(category, file, documents) == 'new':
+                    added += 1
+        
+        if incomplete_folders:
+            # Batalkan semua perubahan dan pakai token lama: run berikutnya memproses
+            # ulang change yang sama, termasuk listing folder baru yang gagal
+            db.session.rollback()
+            logger.warning(f"Listing failed for new folders {incomplete_folders}, keeping old page token")
+            return
+        
+        if new_start_token:
+            _save_page_token(new_start_token)
+        db.session.commit()
+        _write_documents(documents)
+        
+        SYNC_METRICS['started_at'] = datetime.utcnow().isoformat()
+        SYNC_METRICS['mode'] = 'changes'
+        SYNC_METRICS['duration_seconds'] = round(time.perf_counter() - started, 3)
+        SYNC_METRICS['api_calls'] = api_calls
+        SYNC_METRICS['changes'] = len(changes)
+        
+        logger.info(
+            f"Delta sync completed - Changes: {len(changes)}, "
+            f"Added: {added}, Updated: {updated}, Deleted: {deleted}, "
+            f"API calls: {api_calls}, "
+            f"Duration: {SYNC_METRICS['duration_seconds']}s"
+        )
     
-    # Jalankan sebagai daemon thread
-    thread = threading.Thread(target=worker, daemon=True)
-    thread.start()
-    logger.info("Background sync worker thread started")
+    except Exception as e:
+        logger.error(f"Google Drive delta sync failed: {str(e)}")
+        db.session.rollback()
+
+
+def start_background_sync_worker(app):
+    """
+    Jalankan sync inkremental (Changes API) secara periodik
+
+    Sekarang lewat scheduler (app/scheduler.py): job drive_sync hanya jalan
+    di satu proses leader, walaupun fungsi ini dipanggil di setiap worker.
+    """
+    from app.scheduler import start_scheduler
+    return start_scheduler(app)
 
 def get_sync_status():
     """
-    Get status sinkronisasi untuk monitoring
+    Get status sinkronisasi untuk monitoring (butuh app context)
     """
+    from sqlalchemy import func
+    per_category = db.session.query(
+        DriveSyncFile.kategori,
+        func.count(DriveSyncFile.id)
+    ).filter(DriveSyncFile.is_folder == False).group_by(DriveSyncFile.kategori).all()
+    
+    by_category = {cat: count for cat, count in per_category}
     return {
         'status': 'healthy',
-        'cached_files': len(FILE_SYNC_CACHE),
-        'cache_details': FILE_SYNC_CACHE,
+        'cached_files': sum(by_category.values()),
+        'cache_details': by_category,
+        'metrics': SYNC_METRICS,
+        'drive_api': DRIVE_API_METRICS.snapshot(),
         'last_check': datetime.utcnow().isoformat()
     }
 
 # ========== UNTUK PRODUCTION: SCHEDULED TASK ==========
 # 
-# Gunakan di PythonAnywhere Tasks atau Celery
-# 
-# from app import create_app
-# from app.tasks import sync_google_drive_files
+# Set SCHEDULER_ENABLED=True (job jalan di worker web dari run.py, satu leader;
+# CLI python -m app.* tidak pernah menjalankan scheduler), atau
+# tanpa thread di worker web, dari PythonAnywhere Tasks:
 # 
-# if __name__ == '__main__':
-#     app = create_app()
-#     with app.app_context():
-#         sync_google_drive_files()
+#   python -m app.scheduler run-job drive_sync    (scheduled task)
+#   python -m app.scheduler run                   (always-on task)
+#   python -m app.scheduler status
 #
 # ====================================================
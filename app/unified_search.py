@@ -6,7 +6,8 @@ Menyediakan deep search dengan full-text dan metadata matching
 import os
 import json
 import re
-from .models import db, Document, Peserta
+from datetime import datetime
+from .models import db, Document, Peserta, DriveSyncFile
 from sqlalchemy import or_, func, and_
 
 
@@ -326,14 +327,189 @@ class UnifiedSearchEngine:
 class DeepIndexer:
     """
     Indexer mendalam untuk dokumen pembelajaran dari berbagai sumber
-    Dapat dikembangkan untuk mengindex dari Google Drive, database, dll
+    Dokumen Google Drive ditulis oleh sync worker (app/tasks.py)
     """
     
+    # Jumlah baris per transaksi saat bulk upsert/hapus
+    BATCH_SIZE = 500
+    
+    @staticmethod
+    def drive_filepath(file_id):
+        """filepath unik Document untuk file Google Drive"""
+        return f'gdrive:{file_id}'
+    
+    @staticmethod
+    def drive_file_from_row(row):
+        """file_dict (format Drive API) dari baris status sync DriveSyncFile"""
+        return {
+            'id': row.file_id,
+            'name': row.nama,
+            'mimeType': row.mime_type,
+            'folder_path': row.folder_path
+        }
+    
+    @staticmethod
+    def _drive_document_values(category, file):
+        """Mapping metadata file Drive ke kolom Document"""
+        name = file['name']
+        folder_path = file.get('folder_path') or category
+        extension = os.path.splitext(name)[1].lstrip('.').lower()
+        tipe_file = extension or (file.get('mimeType') or 'file').split('/')[-1].split('.')[-1]
+        size = file.get('size')
+        tags = [category.lower()] + [
+            part.lower() for part in folder_path.split('/')[1:] if part
+        ]
+        
+        values = {
+            'nama': name[:255],
+            'kategori': category,
+            'deskripsi': folder_path,
+            'filepath': DeepIndexer.drive_filepath(file['id']),
+            'tipe_file': tipe_file[:50],
+            'is_arsip': False,
+            'is_json': False,
+            'konten_search': f"{name} {folder_path.replace('/', ' ')}"[:2000],
+            'tags': ','.join(tags)[:500],
+            'tanggal_diupdate': datetime.utcnow()
+        }
+        # Status sync tidak menyimpan ukuran - jangan timpa ukuran yang sudah ada
+        if size:
+            values['ukuran_kb'] = int(size) / 1024
+        return values
+    
+    @staticmethod
+    def upsert_drive_documents(items):
+        """
+        Bulk insert/update metadata file Drive ke Document (is_arsip=False)
+        
+        Args:
+            items (list): [(kategori, file_dict), ...] - file_dict dari Drive API
+        
+        Returns:
+            int: jumlah dokumen yang ditulis
+        """
+        # File yang sama bisa muncul lebih dari sekali, ambil yang terakhir
+        values = {}
+        for category, file in items:
+            row = DeepIndexer._drive_document_values(category, file)
+            values[row['filepath']] = row
+        
+        rows = list(values.values())
+        for start in range(0, len(rows), DeepIndexer.BATCH_SIZE):
+            batch = rows[start:start + DeepIndexer.BATCH_SIZE]
+            existing = dict(
+                db.session.query(Document.filepath, Document.id).filter(
+                    Document.filepath.in_([row['filepath'] for row in batch])
+                ).all()
+            )
+            
+            inserts = [row for row in batch if row['filepath'] not in existing]
+            updates = [
+                dict(row, id=existing[row['filepath']])
+                for row in batch if row['filepath'] in existing
+            ]
+            
+            if inserts:
+                db.session.bulk_insert_mappings(Document, inserts)
+            if updates:
+                db.session.bulk_update_mappings(Document, updates)
+            db.session.commit()
+        
+        return len(rows)
+    
+    @staticmethod
+    def update_drive_document_paths(items):
+        """
+        Perbarui folder (deskripsi, tags, konten_search) dokumen Drive yang sudah ada
+
+        Tidak commit: dipanggil di dalam transaksi sync saat folder di-rename/dipindah,
+        sehingga status sync dan Document berubah bersamaan
+
+        Args:
+            items (list): [(kategori, file_dict), ...] dengan folder_path baru
+
+        Returns:
+            int: jumlah dokumen yang diperbarui
+        """
+        updated = 0
+        for category, file in items:
+            values = DeepIndexer._drive_document_values(category, file)
+            updated += Document.query.filter_by(filepath=values.pop('filepath')).update(
+                values, synchronize_session=False
+            )
+        return updated
+
+    @staticmethod
+    def synced_drive_files(file_ids):
+        """
+        Baris status sync (file, bukan folder) yang masih ada untuk file_ids
+
+        Returns:
+            list: DriveSyncFile - satu file bisa tersinkron di lebih dari satu kategori
+        """
+        file_ids = list(set(file_ids))
+        rows = []
+        for start in range(0, len(file_ids), DeepIndexer.BATCH_SIZE):
+            rows.extend(DriveSyncFile.query.filter(
+                DriveSyncFile.file_id.in_(file_ids[start:start + DeepIndexer.BATCH_SIZE]),
+                DriveSyncFile.is_folder == False
+            ).all())
+        return rows
+
+    @staticmethod
+    def remove_drive_documents(file_ids):
+        """
+        Hapus dokumen Drive yang sudah tidak ada dari Document
+
+        Document dikunci per file_id (gdrive:{file_id}) sedangkan status sync per
+        (kategori, file_id): dokumen hanya dihapus jika tidak ada lagi baris
+        status sync untuk file_id tersebut di kategori mana pun
+        
+        Returns:
+            int: jumlah dokumen yang dihapus
+        """
+        file_ids = set(file_ids)
+        file_ids -= {row.file_id for row in DeepIndexer.synced_drive_files(file_ids)}
+        filepaths = [DeepIndexer.drive_filepath(file_id) for file_id in file_ids]
+        removed = 0
+        for start in range(0, len(filepaths), DeepIndexer.BATCH_SIZE):
+            batch = filepaths[start:start + DeepIndexer.BATCH_SIZE]
+            removed += Document.query.filter(
+                Document.filepath.in_(batch)
+            ).delete(synchronize_session=False)
+            db.session.commit()
+        
+        return removed
+    
+    @staticmethod
+    def index_drive_sync_state():
+        """
+        Index ulang semua file Drive dari tabel status sync (drive_sync_file)
+        
+        Returns:
+            int: jumlah dokumen yang diindex
+        """
+        rows = DriveSyncFile.query.filter_by(is_folder=False).all()
+        items = [(row.kategori, DeepIndexer.drive_file_from_row(row)) for row in rows]
+        
+        # Hapus dokumen Drive yang tidak lagi ada di status sync
+        synced = {DeepIndexer.drive_filepath(row.file_id) for row in rows}
+        stale = [
+            filepath[len('gdrive:'):]
+            for (filepath,) in db.session.query(Document.filepath).filter(
+                Document.filepath.like('gdrive:%')
+            ).all()
+            if filepath not in synced
+        ]
+        DeepIndexer.remove_drive_documents(stale)
+        
+        return DeepIndexer.upsert_drive_documents(items)
+    
     @staticmethod
     def index_learning_documents_metadata():
         """
         Index metadata dokumen pembelajaran
-        Ini adalah placeholder - dalam implementasi real bisa dari Google Drive API
+        Baris kategori + semua file Drive yang sudah tersinkron
         """
         # Kategori pembelajaran dari DOKUMEN_CATEGORIES di routes.py
         learning_categories = {
@@ -378,4 +554,4 @@ class DeepIndexer:
                 db.session.add(doc)
         
         db.session.commit()
-        return len(learning_categories)
+        return len(learning_categories) + DeepIndexer.index_drive_sync_state()
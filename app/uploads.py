@@ -0,0 +1,292 @@
+"""
+Upload Pipeline
+Bukti transfer di-stream dari request langsung ke file sementara (per chunk,
+sambil di-hash), lalu dipindah atomik ke blob store (app/blob_store.py). Normalisasi gambar
+(rotasi EXIF, resize & kompres ulang foto HP yang besar) berjalan di worker
+background supaya request upload tidak menunggu; hasilnya ditulis ke file baru,
+file sumber tidak pernah diubah.
+"""
+
+import io
+import os
+import time
+import queue
+import hashlib
+import logging
+import tempfile
+import threading
+from flask import Request
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_TMP_DIR = 'tmp'
+CHUNK_SIZE = 64 * 1024
+
+# Sisi terpanjang gambar setelah normalisasi (pixel) dan kualitas JPEG
+UPLOAD_MAX_IMAGE_EDGE = int(os.getenv('UPLOAD_MAX_IMAGE_EDGE', '2000'))
+UPLOAD_JPEG_QUALITY = int(os.getenv('UPLOAD_JPEG_QUALITY', '85'))
+UPLOAD_PROCESS_WORKERS = int(os.getenv('UPLOAD_PROCESS_WORKERS', '1'))
+
+# Signature awal file -> tipe (isi file harus cocok dengan ekstensi)
+FILE_SIGNATURES = [
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpeg'),
+    (b'%PDF-', 'pdf')
+]
+
+EXTENSION_TYPES = {
+    'png': 'png',
+    'jpg': 'jpeg',
+    'jpeg': 'jpeg',
+    'pdf': 'pdf'
+}
+
+
+class UploadError(ValueError):
+    """File upload ditolak"""
+    pass
+
+
+class UploadTempFile(io.FileIO):
+    """
+    File sementara di folder upload yang menghitung sha256 & ukuran saat ditulis
+
+    Dihapus otomatis saat ditutup kecuali sudah dipindah dengan commit_to()
+    """
+
+    def __init__(self, tmp_dir):
+        os.makedirs(tmp_dir, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(dir=tmp_dir, suffix='.part')
+        super().__init__(fd, 'r+b')
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.committed = False
+
+    def write(self, data):
+        # FileIO.write bisa menulis sebagian; parser multipart werkzeug mengabaikan
+        # nilai kembaliannya, jadi ulangi sampai semua byte tertulis
+        view = memoryview(data).cast('B')
+        written = 0
+        while written < len(view):
+            written += super().write(view[written:])
+        self.sha256.update(view)
+        self.size += written
+        return written
+
+    def hexdigest(self):
+        return self.sha256.hexdigest()
+
+    def commit_to(self, path):
+        """Flush + fsync lalu rename atomik ke path tujuan"""
+        self.flush()
+        os.fsync(self.fileno())
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(self.path, path)
+        self.committed = True
+
+    def close(self):
+        if self.closed:
+            return
+        super().close()
+        if not self.committed:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+
+class UploadRequest(Request):
+    """Request Flask yang menulis file upload langsung ke UPLOAD_FOLDER/tmp"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        from flask import current_app
+        return UploadTempFile(os.path.join(current_app.config['UPLOAD_FOLDER'], UPLOAD_TMP_DIR))
+
+
+def detect_type(head):
+    for signature, file_type in FILE_SIGNATURES:
+        if head.startswith(signature):
+            return file_type
+    return None
+
+
+def spool_upload(file, filename, upload_folder):
+    """
+    File sementara (sudah di-hash) dari FileStorage, isinya divalidasi
+
+    Args:
+        file: FileStorage dari request.files
+        filename (str): nama file asli (untuk cek ekstensi)
+        upload_folder (str): UPLOAD_FOLDER
+
+    Returns:
+        tuple: (UploadTempFile, tipe file) - pemanggil wajib close() / commit_to()
+    """
+    stream = file.stream
+    if not isinstance(stream, UploadTempFile):
+        # Request biasa (mis. test client): salin per chunk ke file sementara
+        temp = UploadTempFile(os.path.join(upload_folder, UPLOAD_TMP_DIR))
+        for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+            temp.write(chunk)
+        stream = temp
+
+    stream.seek(0)
+    file_type = detect_type(stream.read(16))
+    expected = EXTENSION_TYPES.get(filename.rsplit('.', 1)[-1].lower())
+    if file_type is None or file_type != expected:
+        stream.close()
+        raise UploadError('Isi file tidak sesuai format png/jpg/pdf')
+    return stream, file_type
+
+
+# === Normalisasi gambar ===
+def normalize_image(path, max_edge=UPLOAD_MAX_IMAGE_EDGE, quality=UPLOAD_JPEG_QUALITY):
+    """
+    Terapkan rotasi EXIF, perkecil jika sisi terpanjang > max_edge dan kompres ulang
+
+    Hasil ditulis ke file .part di folder yang sama (path tidak diubah) dan hanya
+    dipertahankan jika hasilnya di-resize/dirotasi atau lebih kecil.
+
+    Returns:
+        dict: {'path', 'before', 'after', 'replaced', 'output'} - output = path
+        file hasil (None jika tidak replaced), pemanggil wajib memindah/menghapusnya
+    """
+    from PIL import Image, ImageOps
+
+    before = os.path.getsize(path)
+    with Image.open(path) as image:
+        image_format = image.format
+        # Orientation EXIF selain 1 = foto HP yang perlu diputar
+        transformed = image.getexif().get(0x0112, 1) != 1
+        normalized = ImageOps.exif_transpose(image)
+        if max(normalized.size) > max_edge:
+            normalized.thumbnail((max_edge, max_edge), Image.LANCZOS)
+            transformed = True
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                if image_format == 'JPEG':
+                    normalized.convert('RGB').save(out, 'JPEG', quality=quality, optimize=True, progressive=True)
+                else:
+                    normalized.save(out, image_format, optimize=True)
+            after = os.path.getsize(tmp_path)
+            replaced = transformed or after < before
+            if not replaced:
+                os.remove(tmp_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    return {
+        'path': path,
+        'before': before,
+        'after': after if replaced else before,
+        'replaced': replaced,
+        'output': tmp_path if replaced else None
+    }
+
+
+def process_upload(path, file_type):
+    """Job background untuk satu upload"""
+    if file_type in ('png', 'jpeg'):
+        return normalize_image(path)
+    return {'path': path, 'replaced': False, 'output': None}
+
+
+class UploadProcessor:
+    """
+    Antrian job upload di proses ini (thread worker dibuat saat job pertama)
+
+    Job bersifat idempoten (normalisasi ulang file yang sama aman), jadi
+    kehilangan antrian saat proses restart hanya berarti file tidak dikompres.
+    """
+
+    def __init__(self, workers=UPLOAD_PROCESS_WORKERS):
+        self.workers = workers
+        self._queue = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+        self.metrics = {
+            'processed': 0,
+            'failed': 0,
+            'skipped': 0,
+            'bytes_saved': 0,
+            'tasks': 0,
+            'last_error': None
+        }
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._threads:
+                return
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'upload-processor-{index}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, path, file_type, then=None):
+        """
+        Jadwalkan normalisasi
+
+        then(result) dipanggil setelah file selesai diproses dan bertanggung jawab
+        atas result['output'] (mis. blob store menyimpannya dengan hash baru).
+        Tanpa then, hasil normalisasi langsung menggantikan file di path.
+        """
+        self._ensure_started()
+        self._queue.put(('upload', (path, file_type, then)))
+
+    def submit_task(self, func, *args):
+        """Jadwalkan fungsi lain (mis. garbage collection blob) di antrian yang sama"""
+        self._ensure_started()
+        self._queue.put(('task', (func, args)))
+
+    def _run(self):
+        while True:
+            kind, payload = self._queue.get()
+            try:
+                if kind == 'upload':
+                    self._process(*payload)
+                else:
+                    func, args = payload
+                    func(*args)
+                    self.metrics['tasks'] += 1
+            except Exception as e:
+                self.metrics['failed'] += 1
+                self.metrics['last_error'] = str(e)
+                logger.error(f"Upload job failed ({kind}): {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    def _process(self, path, file_type, then):
+        start = time.perf_counter()
+        try:
+            result = process_upload(path, file_type)
+        except ImportError:
+            # Pillow tidak terpasang: file disimpan apa adanya
+            self.metrics['skipped'] += 1
+            logger.warning("Pillow not installed, skipping image normalization")
+            return
+
+        self.metrics['processed'] += 1
+        if result.get('replaced'):
+            self.metrics['bytes_saved'] += result['before'] - result['after']
+            logger.info(
+                f"Normalized {path}: {result['before']} -> {result['after']} bytes "
+                f"in {time.perf_counter() - start:.2f}s"
+            )
+        if then is not None:
+            then(result)
+        elif result.get('output'):
+            os.replace(result['output'], path)
+
+    def join(self):
+        """Tunggu semua job selesai (untuk script/maintenance)"""
+        self._queue.join()
+
+    def get_stats(self):
+        return {**self.metrics, 'pending': self._queue.qsize(), 'workers': len(self._threads)}
+
+
+UPLOAD_PROCESSOR = UploadProcessor()
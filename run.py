@@ -1,7 +1,8 @@
 import os
 from app import create_app
 
-app = create_app()
+# Entry point web (juga dipakai pythonanywhere_wsgi.py): scheduler boleh jalan di sini
+app = create_app(run_scheduler=True)
 
 if __name__ == '__main__':
     # Get configuration from environment
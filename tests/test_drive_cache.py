@@ -0,0 +1,112 @@
+"""
+Test cache download Drive terhadap stub server lokal (app/drive_stub.py)
+
+    python -m pytest tests/test_drive_cache.py
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from app import drive_cache
+from app.drive_cache import DriveDownloadCache
+from app.drive_stub import start_stub_server
+
+FILE_SIZE = 512 * 1024
+
+
+class DriveDownloadCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.drive_dir = os.path.join(self.tmp, 'drive')
+        os.makedirs(self.drive_dir)
+        self.contents = {}
+        for file_id in ('doc1.pdf', 'doc2.pdf', 'doc3.pdf'):
+            data = os.urandom(FILE_SIZE)
+            with open(os.path.join(self.drive_dir, file_id), 'wb') as f:
+                f.write(data)
+            self.contents[file_id] = data
+
+        self.server, api_base = start_stub_server(self.drive_dir)
+        self.cache = DriveDownloadCache(os.path.join(self.tmp, 'cache'), 4 * FILE_SIZE, api_base)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def media_requests(self, file_id):
+        return self.server.RequestHandlerClass.request_counts.get(('media', file_id), 0)
+
+    def fetch(self, file_id, release=True):
+        """Ambil isi file lewat cache, return (kind, bytes)"""
+        meta = self.cache.get_metadata(file_id)
+        kind, source = self.cache.open(file_id, meta['modifiedTime'], size=meta['size'])
+        if kind == 'hit':
+            with open(source, 'rb') as f:
+                data = f.read()
+            if release:
+                self.cache.release(source)
+            return kind, data
+        return kind, b''.join(source)
+
+    def test_miss_then_hit(self):
+        kind, data = self.fetch('doc1.pdf')
+        self.assertEqual(kind, 'stream')
+        self.assertEqual(data, self.contents['doc1.pdf'])
+
+        kind, data = self.fetch('doc1.pdf')
+        self.assertEqual(kind, 'hit')
+        self.assertEqual(data, self.contents['doc1.pdf'])
+        self.assertEqual(self.media_requests('doc1.pdf'), 1)
+        self.assertEqual(self.cache.get_stats()['pinned'], 0)
+
+    def test_concurrent_misses_download_once(self):
+        barrier = threading.Barrier(8)
+        results = []
+
+        def worker():
+            barrier.wait()
+            results.append(self.fetch('doc2.pdf'))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), 8)
+        self.assertTrue(all(data == self.contents['doc2.pdf'] for _, data in results))
+        self.assertEqual(self.media_requests('doc2.pdf'), 1)
+
+    def test_evict_skips_pinned_entry(self):
+        self.cache.max_bytes = FILE_SIZE
+        self.fetch('doc1.pdf')
+        meta = self.cache.get_metadata('doc1.pdf')
+        kind, path = self.cache.open('doc1.pdf', meta['modifiedTime'])
+        self.assertEqual(kind, 'hit')
+
+        # doc3 melewati kapasitas: doc1 (lebih lama, tapi sedang dikirim) tetap ada
+        os.utime(path, (0, 0))
+        self.fetch('doc3.pdf')
+        self.cache.evict()
+        self.assertTrue(os.path.exists(path))
+
+        self.cache.release(path)
+        self.cache.max_bytes = 0
+        self.cache.evict()
+        self.assertFalse(os.path.exists(path))
+
+    def test_metadata_cache_is_bounded(self):
+        with mock.patch.object(drive_cache, 'METADATA_MAX_ENTRIES', 2):
+            for file_id in ('doc1.pdf', 'doc2.pdf', 'doc3.pdf'):
+                self.cache.get_metadata(file_id)
+        self.assertEqual(list(self.cache._metadata), ['doc2.pdf', 'doc3.pdf'])
+
+
+if __name__ == '__main__':
+    unittest.main()